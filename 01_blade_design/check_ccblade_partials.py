@@ -0,0 +1,65 @@
+import os
+import sys
+import numpy as np
+# mf_utils is shared by the case studies at the top level of the repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+from models.prod_functions import CCBlade
+import openmdao.api as om
+from openmdao.utils.assert_utils import assert_check_partials
+
+
+twist_dv = {'values' : np.array([0.55, 0.5, 0.45, 0.4]),
+    'idx_start' : 2}
+# PCHIP has a kink where neighboring control points are equal, so avoid the exported gains of 1.0
+chord_dv = {'values' : np.array([1.05, 1.1, 0.9]),
+    'idx_start' : 2}
+
+desvars = {
+    "blade.opt_var.twist_opt_gain": twist_dv,
+    "blade.opt_var.chord_opt_gain": chord_dv,
+}
+
+class CCBladeComp(om.ExplicitComponent):
+    def initialize(self):
+        self.options.declare('desvars')
+        
+    def setup(self):
+        desvars = self.options["desvars"]
+        for key in desvars:
+            trimmed_key = key.split('.')[-1]
+            self.add_input(trimmed_key, val=desvars[key]['values'])
+            self.declare_partials(['CP', 'power'], trimmed_key)
+        
+        self.add_output('CP', val=0.)
+        self.add_output('power', val=0., units='W')
+        self.model = CCBlade(desvars)
+
+    def model_inputs(self, inputs):
+        desvars = self.options["desvars"]
+        model_inputs = {}
+        for key in desvars:
+            trimmed_key = key.split('.')[-1]
+            model_inputs[key] = inputs[trimmed_key]
+        return model_inputs
+
+    def compute(self, inputs, outputs):
+        model_outputs = self.model.compute(self.model_inputs(inputs))
+        outputs['CP'] = model_outputs['CP']
+        outputs['power'] = model_outputs['power']
+
+    def compute_partials(self, inputs, partials):
+        model_partials = self.model.compute_partials(self.model_inputs(inputs))
+        for of in ['CP', 'power']:
+            for key in model_partials[of]:
+                trimmed_key = key.split('.')[-1]
+                partials[of, trimmed_key] = model_partials[of][key]
+
+
+p = om.Problem(model=om.Group())
+p.model.add_subsystem('CCBlade', CCBladeComp(desvars=desvars), promotes=['*'])
+p.setup(force_alloc_complex=False)
+p.run_model()
+
+# Compare the analytic partials to central finite differences of the full model
+data = p.check_partials(method='fd', form='central', step=1.e-6, compact_print=True)
+assert_check_partials(data, atol=1.e-3, rtol=1.e-4)
@@ -0,0 +1,23 @@
+import os
+import sys
+import numpy as np
+# mf_utils is shared by the case studies at the top level of the repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+from models.prod_functions import FullCCBlade
+
+
+twist_dv = {'values' : np.array([0.55, 0.55, 0.55, 0.55]),
+    'idx_start' : 2}
+chord_dv = {'values' : np.ones(3),
+    'idx_start' : 2}
+
+desvars = {
+    "blade.opt_var.twist_opt_gain": twist_dv,
+    "blade.opt_var.chord_opt_gain": chord_dv,
+}
+
+# Run the full WISDEM stack once at the initial design, then save the
+# CCBlade inputs used by the standalone CCBlade model
+model = FullCCBlade(desvars, None)
+model.compute({key: desvars[key]['values'] for key in desvars})
+model.export_ccblade_store()
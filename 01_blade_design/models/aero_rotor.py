@@ -0,0 +1,162 @@
+"""
+Aero-only WISDEM problem used by the AeroCCBlade model.
+
+The problem parses the ontology yaml and the blade parameterization exactly
+like the full WISDEM stack, but only adds the RotorSE subsystems that the
+blade study reads: CCBlade at the rated point, the regulated power curve and
+AEP, and the stall check. RotorElasticity, RotorStructure, blade costs,
+DriveSE, TowerSE, BOS and plant finance are never built.
+
+The subsystem names match the full stack (`ccblade`, `rp`, `stall_check`),
+so the same output names work for both. The connections mirror the ones the
+WISDEM glue code makes for these subsystems.
+"""
+import openmdao.api as om
+from wisdem.glue_code.gc_WT_DataStruc import WindTurbineOntologyOpenMDAO
+from wisdem.glue_code.gc_WT_InitModel import yaml2openmdao
+from wisdem.ccblade.ccblade_component import CCBladeTwist
+from wisdem.rotorse.rotor_power import RotorPower, NoStallConstraint
+from wisdem.commonse.turbine_class import TurbineClass
+from weis.glue_code.gc_LoadInputs import WindTurbineOntologyPythonWEIS
+from weis.glue_code.gc_PoseOptimization import PoseOptimizationWEIS
+
+
+class AeroRotor(om.Group):
+    # Openmdao group with the turbine geometry and the aerodynamic rotor analyses only
+
+    def initialize(self):
+        self.options.declare("modeling_options")
+        self.options.declare("opt_options")
+
+    def setup(self):
+        modeling_options = self.options["modeling_options"]
+        opt_options = self.options["opt_options"]
+        rotorse_options = modeling_options["WISDEM"]["RotorSE"]
+
+        self.add_subsystem(
+            "wt_init",
+            WindTurbineOntologyOpenMDAO(modeling_options=modeling_options, opt_options=opt_options),
+            promotes=["*"],
+        )
+
+        ivc = om.IndepVarComp()
+        ivc.add_discrete_output("hubloss", val=rotorse_options["hubloss"])
+        ivc.add_discrete_output("tiploss", val=rotorse_options["tiploss"])
+        ivc.add_discrete_output("wakerotation", val=rotorse_options["wakerotation"])
+        ivc.add_discrete_output("usecd", val=rotorse_options["usecd"])
+        ivc.add_discrete_output("nSector", val=rotorse_options["n_sector"])
+        self.add_subsystem("aero_ivc", ivc, promotes=["*"])
+
+        promoteCC = [
+            "chord",
+            "theta",
+            "r",
+            "Rtip",
+            "Rhub",
+            "hub_height",
+            "precone",
+            "tilt",
+            "precurve",
+            "presweep",
+            "airfoils_aoa",
+            "airfoils_Re",
+            "airfoils_cl",
+            "airfoils_cd",
+            "airfoils_cm",
+            "nBlades",
+            ("rho", "rho_air"),
+            ("mu", "mu_air"),
+            "shearExp",
+            "hubloss",
+            "tiploss",
+            "wakerotation",
+            "usecd",
+            "nSector",
+            "yaw",
+        ]
+
+        self.add_subsystem(
+            "ccblade",
+            CCBladeTwist(modeling_options=modeling_options, opt_options=opt_options),
+            promotes=promoteCC + ["pitch", "tsr", "precurveTip", "presweepTip"],
+        )
+        self.add_subsystem("wt_class", TurbineClass())
+        self.add_subsystem(
+            "rp",
+            RotorPower(modeling_options=modeling_options),
+            promotes=promoteCC + ["precurveTip", "presweepTip", ("tsr_operational", "tsr"), ("control_pitch", "pitch")],
+        )
+        self.add_subsystem(
+            "stall_check",
+            NoStallConstraint(modeling_options=modeling_options),
+            promotes=["s", "airfoils_aoa", "airfoils_cl", "airfoils_cd", "airfoils_cm"],
+        )
+
+        # Connections to ccblade
+        self.connect("blade.pa.chord_param", "chord")
+        self.connect("blade.pa.twist_param", "ccblade.theta_in")
+        self.connect("blade.opt_var.s_opt_chord", "ccblade.s_opt_chord")
+        self.connect("blade.opt_var.s_opt_twist", "ccblade.s_opt_theta")
+        self.connect("blade.outer_shape_bem.s", "s")
+        self.connect("blade.high_level_blade_props.r_blade", "r")
+        self.connect("blade.high_level_blade_props.rotor_radius", "Rtip")
+        self.connect("hub.radius", "Rhub")
+        self.connect("blade.interp_airfoils.r_thick_interp", "ccblade.rthick")
+        self.connect("airfoils.aoa", "airfoils_aoa")
+        self.connect("airfoils.Re", "airfoils_Re")
+        self.connect("af_3d.cl_corrected", "airfoils_cl")
+        self.connect("af_3d.cd_corrected", "airfoils_cd")
+        self.connect("af_3d.cm_corrected", "airfoils_cm")
+        if rotorse_options.get("inn_af", False):
+            self.connect("blade.run_inn_af.aoa_inn", "ccblade.aoa_op")
+        self.connect("high_level_tower_props.hub_height", "hub_height")
+        self.connect("hub.cone", "precone")
+        self.connect("nacelle.uptilt", "tilt")
+        self.connect("blade.high_level_blade_props.prebend", "precurve")
+        self.connect("blade.high_level_blade_props.prebendTip", "precurveTip")
+        self.connect("blade.high_level_blade_props.presweep", "presweep")
+        self.connect("blade.high_level_blade_props.presweepTip", "presweepTip")
+        if modeling_options["flags"]["control"]:
+            self.connect("control.rated_pitch", "pitch")
+        self.connect("control.rated_TSR", "tsr")
+        self.connect("env.rho_air", "rho_air")
+        self.connect("env.mu_air", "mu_air")
+        self.connect("env.shear_exp", "shearExp")
+        self.connect("configuration.n_blades", "nBlades")
+        self.connect("configuration.ws_class", "wt_class.turbine_class")
+
+        # Connections to RotorPower. Without DriveSE the power curve uses the
+        # default generator efficiency, as the full stack does with DriveSE off.
+        self.connect("control.V_in", "rp.v_min")
+        self.connect("control.V_out", "rp.v_max")
+        self.connect("configuration.rated_power", "rp.rated_power")
+        self.connect("control.minOmega", "rp.omega_min")
+        self.connect("control.maxOmega", "rp.omega_max")
+        self.connect("control.max_TS", "rp.control_maxTS")
+        self.connect("configuration.gearbox_type", "rp.drivetrainType")
+        self.connect("nacelle.gearbox_efficiency", "rp.powercurve.gearbox_efficiency")
+        self.connect("env.weibull_k", "rp.cdf.k")
+        self.connect("configuration.turb_class", "rp.gust.turbulence_class")
+        self.connect("wt_class.V_mean", "rp.cdf.xbar")
+        self.connect("wt_class.V_mean", "rp.gust.V_mean")
+
+        # Connections to the stall check
+        self.connect("rp.powercurve.aoa_regII", "stall_check.aoa_along_span")
+
+
+def build_aero_problem(fname_wt_input, fname_modeling_options, fname_analysis_options):
+    """
+    Load the yaml files, set up an `AeroRotor` problem and fill in the
+    initial design. The returned problem has not been run yet.
+    """
+    wt_initial = WindTurbineOntologyPythonWEIS(fname_wt_input, fname_modeling_options, fname_analysis_options)
+    wt_init, modeling_options, opt_options = wt_initial.get_input_data()
+    myopt = PoseOptimizationWEIS(wt_init, modeling_options, opt_options)
+
+    wt_opt = om.Problem(model=AeroRotor(modeling_options=modeling_options, opt_options=opt_options))
+    wt_opt.setup()
+
+    wt_opt = yaml2openmdao(wt_opt, modeling_options, wt_init, opt_options)
+    wt_opt = myopt.set_initial(wt_opt, wt_init)
+
+    return wt_opt
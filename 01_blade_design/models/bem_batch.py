@@ -0,0 +1,262 @@
+"""
+BEM solve of `wisdem.ccblade.ccblade.CCBlade` vectorized over designs.
+
+CCBlade solves the BEM residual of Ning (2014) with `brentq`, one spanwise
+station and one azimuthal sector at a time, and one design per call. For the
+standalone CCBlade model only the chord and twist change between designs, so
+the inflow at every station and the weights of the torque integration are
+the same for all of them. Here the residual of every station, sector and
+design is solved at once, taking the steps of `brentq` elementwise in the
+brackets CCBlade uses, so a batch costs about as many airfoil polar
+evaluations as a single design.
+
+The residual, induction factors and relative wind follow `_bem.f90` of
+CCBlade, including the Buhl correction in the momentum/empirical region and
+the propeller brake region. Like CCBlade with the default `iterRe=1`, the
+polars are evaluated at the Reynolds number without induction.
+"""
+import warnings
+import numpy as np
+
+
+def induction_factors(r, chord, Rhub, Rtip, phi, cl, cd, B, Vx, Vy, usecd=True, hubloss=True, tiploss=True, wakerotation=True):
+    """
+    Residual of the BEM equations and the axial and tangential induction
+    factors, elementwise over broadcastable arrays.
+    """
+    sigma_p = B / 2.0 / np.pi * chord / r
+    sphi = np.sin(phi)
+    cphi = np.cos(phi)
+
+    if usecd:
+        cn = cl * cphi + cd * sphi
+        ct = cl * sphi - cd * cphi
+    else:
+        cn = cl * cphi
+        ct = cl * sphi
+
+    # Prandtl's tip and hub loss factors
+    F = 1.0
+    if tiploss:
+        F = F * 2.0 / np.pi * np.arccos(np.exp(-B / 2.0 * (Rtip - r) / (r * sphi)))
+    if hubloss:
+        F = F * 2.0 / np.pi * np.arccos(np.exp(-B / 2.0 * (r - Rhub) / (Rhub * sphi)))
+
+    k = sigma_p * cn / 4.0 / F / sphi / sphi
+    kp = sigma_p * ct / 4.0 / F / sphi / cphi
+
+    # Momentum state, Glauert correction with Buhl's empirical fit above k = 2/3
+    a_momentum = np.where(k == -1.0, 0.0, k / (1.0 + k))
+    g1 = 2.0 * F * k - (10.0 / 9 - F)
+    g2 = np.maximum(2.0 * F * k - (4.0 / 3 - F) * F, 0.0)
+    g3 = 2.0 * F * k - (25.0 / 9 - 2 * F)
+    a_buhl = np.where(np.abs(g3) < 1e-6, 1.0 - 1.0 / 2.0 / np.sqrt(g2), (g1 - np.sqrt(g2)) / g3)
+    a = np.where(k <= 2.0 / 3.0, a_momentum, a_buhl)
+
+    # Propeller brake region
+    a = np.where(phi > 0.0, a, np.where(k > 1.0, k / (k - 1.0), 0.0))
+
+    if wakerotation:
+        ap = kp / (1.0 - kp)
+    else:
+        ap = np.zeros_like(kp)
+        kp = np.zeros_like(kp)
+
+    lambda_r = Vy / Vx
+    fzero = np.where(
+        phi > 0.0,
+        sphi / (1.0 - a) - cphi / lambda_r * (1.0 - kp),
+        sphi * (1.0 - k) - cphi / lambda_r * (1.0 - kp),
+    )
+
+    return fzero, a, ap
+
+
+def relative_wind(phi, a, ap, Vx, Vy, pitch, chord, theta, rho, mu):
+    """
+    Angle of attack (rad), relative velocity and chord Reynolds number.
+    """
+    alpha = phi - (theta + pitch)
+    W = np.sqrt((Vx * (1.0 - a)) ** 2 + (Vy * (1.0 + ap)) ** 2)
+    Re = rho * W * chord / mu
+    return alpha, W, Re
+
+
+def bracketed_root(f, xa, xb, fa, fb, xtol=2e-12, rtol=4 * np.finfo(float).eps, maxiter=100):
+    """
+    Roots of the elementwise function `f` in the brackets [xa, xb], where `fa`
+    and `fb` have opposite signs or are zero. Every element takes the steps of
+    `scipy.optimize.brentq` with the same tolerances, so where a bracket holds
+    several roots, the one CCBlade finds is returned.
+    """
+    xpre, xcur = np.array(xa, dtype=float), np.array(xb, dtype=float)
+    fpre, fcur = np.array(fa, dtype=float), np.array(fb, dtype=float)
+    xblk = np.zeros_like(xcur)
+    fblk = np.zeros_like(xcur)
+    spre = np.zeros_like(xcur)
+    scur = np.zeros_like(xcur)
+
+    root = np.where(fpre == 0, xpre, xcur)
+    done = (fpre == 0) | (fcur == 0)
+
+    for _ in range(maxiter):
+        if done.all():
+            break
+
+        # Keep the bracket in xcur and xblk, with xcur the better estimate
+        new_bracket = (fpre != 0) & (fcur != 0) & (np.signbit(fpre) != np.signbit(fcur))
+        xblk = np.where(new_bracket, xpre, xblk)
+        fblk = np.where(new_bracket, fpre, fblk)
+        spre = np.where(new_bracket, xcur - xpre, spre)
+        scur = np.where(new_bracket, xcur - xpre, scur)
+
+        swap = np.abs(fblk) < np.abs(fcur)
+        xpre, xcur, xblk = np.where(swap, xcur, xpre), np.where(swap, xblk, xcur), np.where(swap, xcur, xblk)
+        fpre, fcur, fblk = np.where(swap, fcur, fpre), np.where(swap, fblk, fcur), np.where(swap, fcur, fblk)
+
+        delta = (xtol + rtol * np.abs(xcur)) / 2
+        sbis = (xblk - xcur) / 2
+        converged = ~done & ((fcur == 0) | (np.abs(sbis) < delta))
+        root = np.where(converged, xcur, root)
+        done = done | converged
+        if done.all():
+            break
+
+        # Secant or inverse quadratic step where it is short enough, bisection otherwise
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dpre = (fpre - fcur) / (xpre - xcur)
+            dblk = (fblk - fcur) / (xblk - xcur)
+            stry = np.where(
+                xpre == xblk,
+                -fcur * (xcur - xpre) / (fcur - fpre),
+                -fcur * (fblk * dblk - fpre * dpre) / (dblk * dpre * (fblk - fpre)),
+            )
+        interpolate = (np.abs(spre) > delta) & (np.abs(fcur) < np.abs(fpre))
+        good = interpolate & (2 * np.abs(stry) < np.minimum(np.abs(spre), 3 * np.abs(sbis) - delta))
+        spre, scur = np.where(good, scur, sbis), np.where(good, stry, sbis)
+
+        xpre, fpre = xcur, fcur
+        xcur = np.where(np.abs(scur) > delta, xcur + scur, xcur + np.where(sbis > 0, delta, -delta))
+        xcur = np.where(done, root, xcur)
+        fcur = np.where(done, 0.0, f(xcur))
+    else:
+        root = np.where(done, root, xcur)
+
+    return root
+
+
+class BatchBEM(object):
+    """
+    Power of a CCBlade rotor for many chord and twist distributions at one
+    operating point.
+
+    `rotor` is the `CCBlade` object of any design, which gives the geometry,
+    the airfoils and the BEM options. `Vx` and `Vy` are the inflow components
+    of shape (n_sector, n_span) from `_bem.windcomponents`, and `dQ_dTp` the
+    weights of the tangential loads in the torque of one blade from
+    `_bem.thrusttorque`, which is linear in the loads.
+    """
+
+    def __init__(self, rotor, Uinf, Omega, pitch, Vx, Vy, dQ_dTp):
+        self.rotor = rotor
+        self.Uinf = Uinf
+        self.Omega = Omega
+        self.pitch = np.deg2rad(pitch)
+        self.r = np.asarray(rotor.r)[:, np.newaxis]
+        self.Vx = np.asarray(Vx)[:, :, np.newaxis]
+        self.Vy = np.asarray(Vy)[:, :, np.newaxis]
+        self.dQ_dTp = np.asarray(dQ_dTp)
+        self.active = (self.Vx != 0.0) & (self.Vy != 0.0)
+
+    def polars(self, alpha, Re):
+        # The splines of each station's airfoil, elementwise over sectors and designs
+        cl = np.zeros_like(alpha)
+        cd = np.zeros_like(alpha)
+        for i, af in enumerate(self.rotor.af):
+            cl[:, i] = af.cl_spline.ev(alpha[:, i].ravel(), Re[:, i].ravel()).reshape(alpha[:, i].shape)
+            cd[:, i] = af.cd_spline.ev(alpha[:, i].ravel(), Re[:, i].ravel()).reshape(alpha[:, i].shape)
+        return cl, cd
+
+    def residual(self, phi, chord, theta):
+        rotor = self.rotor
+        alpha, W, Re = relative_wind(phi, 0.0, 0.0, self.Vx, self.Vy, self.pitch, chord, theta, rotor.rho, rotor.mu)
+        cl, cd = self.polars(alpha, Re)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fzero, a, ap = induction_factors(
+                self.r, chord, rotor.Rhub, rotor.Rtip, phi, cl, cd, rotor.B, self.Vx, self.Vy, **rotor.bemoptions
+            )
+        return np.where(self.active, fzero, 0.0), a, ap, cl, cd
+
+    def solve(self, chord, theta):
+        """
+        Inflow angle (rad) of shape (n_sector, n_span, n_designs), for chord (m)
+        and twist (rad) of shape (n_span, n_designs).
+        """
+        shape = np.broadcast(self.Vx, chord).shape
+        f = lambda phi: self.residual(phi, chord, theta)[0]
+        epsilon = 1e-6
+
+        # The brackets of CCBlade, in order of preference
+        lower = np.full(shape, epsilon)
+        upper = np.full(shape, np.pi / 2)
+        f_lower = f(lower)
+        f_upper = f(upper)
+        swap = f_lower * f_upper > 0
+        if swap.any():
+            f_neg_lower = f(np.full(shape, -np.pi / 4))
+            f_neg_upper = f(np.full(shape, -epsilon))
+            brake = swap & (f_neg_lower < 0) & (f_neg_upper > 0)
+            high = swap & ~brake
+            f_high = f(np.full(shape, np.pi - epsilon))
+
+            lower = np.where(brake, -np.pi / 4, np.where(high, np.pi / 2, lower))
+            upper = np.where(brake, -epsilon, np.where(high, np.pi - epsilon, upper))
+            f_lower, f_upper = (
+                np.where(brake, f_neg_lower, np.where(high, f_upper, f_lower)),
+                np.where(brake, f_neg_upper, np.where(high, f_high, f_upper)),
+            )
+
+        # CCBlade falls back to phi = 0 where brentq finds no sign change
+        failed = f_lower * f_upper > 0
+        if failed.any():
+            warnings.warn("error.  check input values.")
+        f_lower = np.where(failed, 0.0, f_lower)
+
+        phi = bracketed_root(f, lower, upper, f_lower, f_upper)
+        return np.where(failed, 0.0, phi)
+
+    def loads(self, chord, theta):
+        """
+        Normal and tangential loads per unit length (N/m), of shape
+        (n_sector, n_span, n_designs).
+        """
+        chord = np.asarray(chord, dtype=float)
+        theta = np.asarray(theta, dtype=float)
+        rotor = self.rotor
+        phi = self.solve(chord, theta)
+
+        _, a, ap, cl, cd = self.residual(phi, chord, theta)
+        alpha, W, Re = relative_wind(phi, a, ap, self.Vx, self.Vy, self.pitch, chord, theta, rotor.rho, rotor.mu)
+        cn = cl * np.cos(phi) + cd * np.sin(phi)
+        ct = cl * np.sin(phi) - cd * np.cos(phi)
+        q = 0.5 * rotor.rho * W ** 2
+        Np = np.where(self.active, cn * q * chord, 0.0)
+        Tp = np.where(self.active, ct * q * chord, 0.0)
+        return Np, Tp
+
+    def evaluate(self, chord, theta):
+        """
+        Power coefficient and power (W) for chord (m) and twist (rad) of shape
+        (n_span, n_designs), like `CCBlade.evaluate` with coefficients.
+        """
+        rotor = self.rotor
+        Np, Tp = self.loads(chord, theta)
+
+        # Torque of all blades, averaged over the sectors
+        Q = rotor.B * np.einsum("ijk,j->k", Tp, self.dQ_dTp) / Tp.shape[0]
+        P = Q * self.Omega * np.pi / 30.0
+
+        q = 0.5 * rotor.rho * self.Uinf ** 2
+        A = np.pi * rotor.rotorR ** 2
+        CP = P / (q * A * self.Uinf)
+        return CP, P
@@ -0,0 +1,154 @@
+"""
+Spanwise blade parameterization for the standalone CCBlade model.
+
+WISDEM maps the chord and twist control points to the spanwise stations with
+a PCHIP spline. The control point locations and the stations don't change
+between designs, so the Hermite basis at every station is computed once here.
+Each evaluation then only computes the PCHIP slopes at the control points,
+which is a handful of array operations for one design or a whole batch.
+The results match `scipy.interpolate.PchipInterpolator`.
+"""
+import numpy as np
+
+
+class PchipBasis(object):
+    """
+    PCHIP interpolation from fixed control point locations `s_opt` to fixed
+    stations `s`, both nondimensional along the span.
+    """
+
+    def __init__(self, s_opt, s):
+        self.s_opt = np.array(s_opt, dtype=float)
+        self.s = np.array(s, dtype=float)
+        n_opt = len(self.s_opt)
+
+        self.h = np.diff(self.s_opt)
+
+        # Interval of each station and the Hermite basis functions there
+        self.idx = np.clip(np.searchsorted(self.s_opt, self.s, side="right") - 1, 0, n_opt - 2)
+        h_span = self.h[self.idx]
+        t = (self.s - self.s_opt[self.idx]) / h_span
+        self.h00 = 2 * t ** 3 - 3 * t ** 2 + 1
+        self.h10 = (t ** 3 - 2 * t ** 2 + t) * h_span
+        self.h01 = -2 * t ** 3 + 3 * t ** 2
+        self.h11 = (t ** 3 - t ** 2) * h_span
+
+        # Weights of the harmonic mean used for the interior slopes
+        self.w1 = 2 * self.h[1:] + self.h[:-1]
+        self.w2 = self.h[1:] + 2 * self.h[:-1]
+
+        # Segment slopes are linear in the control point values
+        self.dm_dy = np.zeros((n_opt - 1, n_opt))
+        self.dm_dy[np.arange(n_opt - 1), np.arange(n_opt - 1)] = -1.0 / self.h
+        self.dm_dy[np.arange(n_opt - 1), np.arange(1, n_opt)] = 1.0 / self.h
+
+    def broadcast(self, array, y):
+        return array.reshape((-1,) + (1,) * (y.ndim - 1))
+
+    def slopes(self, y):
+        """
+        PCHIP slopes at the control points for values `y` of shape (n_opt,)
+        or (n_opt, n_designs). Also returns the derivatives of each slope with
+        respect to the segment slopes it depends on.
+        """
+        h = self.broadcast(self.h, y)
+        m = np.diff(y, axis=0) / h
+        d = np.zeros_like(y)
+        dd_dm_left = np.zeros_like(y)
+        dd_dm_right = np.zeros_like(y)
+
+        if len(self.s_opt) == 2:
+            d[0] = d[1] = m[0]
+            dd_dm_right[0] = 1.0
+            dd_dm_left[1] = 1.0
+            return d, dd_dm_left, dd_dm_right
+
+        # Interior slopes, zero at local extrema
+        w1 = self.broadcast(self.w1, y)
+        w2 = self.broadcast(self.w2, y)
+        monotone = (np.sign(m[1:]) == np.sign(m[:-1])) & (m[1:] != 0) & (m[:-1] != 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            d_interior = (w1 + w2) / (w1 / m[:-1] + w2 / m[1:])
+            d[1:-1] = np.where(monotone, d_interior, 0.0)
+            dd_dm_left[1:-1] = np.where(monotone, d_interior ** 2 * w1 / (w1 + w2) / m[:-1] ** 2, 0.0)
+            dd_dm_right[1:-1] = np.where(monotone, d_interior ** 2 * w2 / (w1 + w2) / m[1:] ** 2, 0.0)
+
+        # One-sided three point estimates at both ends. An end slope depends on
+        # the segment next to it and on the one after that.
+        d[0], dd_dm_right[0], dd_dm_left[0] = self.edge_slope(self.h[0], self.h[1], m[0], m[1])
+        d[-1], dd_dm_left[-1], dd_dm_right[-1] = self.edge_slope(self.h[-1], self.h[-2], m[-1], m[-2])
+
+        return d, dd_dm_left, dd_dm_right
+
+    def edge_slope(self, h0, h1, m0, m1):
+        """
+        End slope next to segment slope `m0`, with `m1` the slope of the
+        following segment. Returns the slope and its derivatives with respect
+        to `m0` and `m1`.
+        """
+        d = ((2 * h0 + h1) * m0 - h0 * m1) / (h0 + h1)
+        dd_dm0 = np.full_like(d, (2 * h0 + h1) / (h0 + h1))
+        dd_dm1 = np.full_like(d, -h0 / (h0 + h1))
+
+        # Keep the spline shape preserving
+        wrong_sign = np.sign(d) != np.sign(m0)
+        overshoot = ~wrong_sign & (np.sign(m0) != np.sign(m1)) & (np.abs(d) > 3.0 * np.abs(m0))
+
+        d = np.where(wrong_sign, 0.0, np.where(overshoot, 3.0 * m0, d))
+        dd_dm0 = np.where(wrong_sign, 0.0, np.where(overshoot, 3.0, dd_dm0))
+        dd_dm1 = np.where(wrong_sign | overshoot, 0.0, dd_dm1)
+
+        return d, dd_dm0, dd_dm1
+
+    def __call__(self, y):
+        """
+        Values at the stations for control point values `y` of shape
+        (n_opt,) or (n_opt, n_designs).
+        """
+        y = np.asarray(y, dtype=float)
+        d = self.slopes(y)[0]
+        k = self.idx
+        return (
+            self.broadcast(self.h00, y) * y[k]
+            + self.broadcast(self.h10, y) * d[k]
+            + self.broadcast(self.h01, y) * y[k + 1]
+            + self.broadcast(self.h11, y) * d[k + 1]
+        )
+
+    def jacobian(self, y):
+        """
+        Derivatives of the values at the stations with respect to the control
+        point values `y` of one design, shape (n_span, n_opt).
+        """
+        y = np.asarray(y, dtype=float)
+        n_opt = len(y)
+        d, dd_dm_left, dd_dm_right = self.slopes(y)
+
+        # Each slope depends on the segment to its left and to its right
+        dd_dm = np.zeros((n_opt, n_opt - 1))
+        dd_dm[np.arange(1, n_opt), np.arange(n_opt - 1)] = dd_dm_left[1:]
+        dd_dm[np.arange(n_opt - 1), np.arange(n_opt - 1)] = dd_dm_right[:-1]
+        if n_opt > 2:
+            # The end slopes also depend on the second segment from their end
+            dd_dm[0, 1] = dd_dm_left[0]
+            dd_dm[-1, -2] = dd_dm_right[-1]
+        dd_dy = dd_dm @ self.dm_dy
+
+        k = self.idx
+        eye = np.eye(n_opt)
+        return (
+            self.h00[:, np.newaxis] * eye[k]
+            + self.h10[:, np.newaxis] * dd_dy[k]
+            + self.h01[:, np.newaxis] * eye[k + 1]
+            + self.h11[:, np.newaxis] * dd_dy[k + 1]
+        )
+
+
+def twist_from_gain(twist_opt_gain, twist_lower, twist_upper):
+    """
+    Twist control points in radians from the nondimensional twist gains, which
+    span the bounds in the analysis options.
+    """
+    twist_lower = np.asarray(twist_lower).reshape((-1,) + (1,) * (np.ndim(twist_opt_gain) - 1))
+    twist_upper = np.asarray(twist_upper).reshape((-1,) + (1,) * (np.ndim(twist_opt_gain) - 1))
+    return twist_lower + twist_opt_gain * (twist_upper - twist_lower)
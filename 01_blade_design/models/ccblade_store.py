@@ -0,0 +1,215 @@
+"""
+On-disk store of the saved inputs used by the standalone CCBlade model.
+
+A store is a folder with one `.npy` file per array and a `meta.json` file
+that holds the format version and the scalar inputs. The airfoil polars are
+kept as dense `(n_span, n_aoa, n_Re)` tables. Arrays are opened read-only
+and memory-mapped, so the raw arrays of all MPI ranks on a node are read
+from the same pages of the OS page cache. The `CCAirfoil` splines are still
+fitted by every process: they are the larger part, about 0.6 MB per process
+for 30 stations with 200 angles of attack and one Reynolds number, against
+0.14 MB of polar tables.
+
+All angles are stored in degrees, as `wisdem.ccblade.ccblade.CCBlade` expects,
+except the twist bounds of the blade parameterization, which are in radians
+like in the analysis options.
+"""
+import os
+import json
+import numpy as np
+from wisdem.ccblade.ccblade import CCAirfoil
+from .blade_param import PchipBasis, twist_from_gain
+
+
+STORE_VERSION = 2
+
+array_names = [
+    "r",
+    "s",
+    "chord_original",
+    "twist",
+    "precurve",
+    "presweep",
+    "airfoils_aoa",
+    "airfoils_Re",
+    "airfoils_cl",
+    "airfoils_cd",
+    "airfoils_cm",
+    "s_opt_chord",
+    "s_opt_twist",
+    "chord_opt_gain",
+    "twist_opt_gain",
+    "twist_lower",
+    "twist_upper",
+]
+
+scalar_names = [
+    "Rhub",
+    "Rtip",
+    "nBlades",
+    "rho",
+    "mu",
+    "precone",
+    "tilt",
+    "yaw",
+    "shearExp",
+    "hub_height",
+    "nSector",
+    "precurveTip",
+    "presweepTip",
+    "tiploss",
+    "hubloss",
+    "wakerotation",
+    "usecd",
+    "Uhub",
+    "tsr",
+    "pitch",
+]
+
+# Stores already opened by this process, keyed on their real path
+_loaded_stores = {}
+
+
+def ccblade_store_folder(n_span, folder=None):
+    if folder is None:
+        folder = os.path.dirname(os.path.realpath(__file__))
+    return os.path.join(folder, f"CCBlade_inputs_{n_span}")
+
+
+def save_ccblade_store(folder, arrays, scalars):
+    """
+    Write the arrays and scalars to a store folder.
+
+    `meta.json` is written last and moved into place in one step, so a
+    reader never sees a partially written store.
+    """
+    os.makedirs(folder, exist_ok=True)
+
+    for name in array_names:
+        np.save(
+            os.path.join(folder, name + ".npy"),
+            np.ascontiguousarray(arrays[name], dtype=float),
+        )
+
+    meta = {}
+    meta["version"] = STORE_VERSION
+    meta["n_span"] = len(arrays["r"])
+    meta["scalars"] = {}
+    for name in scalar_names:
+        meta["scalars"][name] = np.asarray(scalars[name]).reshape(-1)[0].item()
+
+    fname_meta = os.path.join(folder, "meta.json")
+    with open(fname_meta + ".tmp", "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(fname_meta + ".tmp", fname_meta)
+
+
+def load_ccblade_store(folder):
+    """
+    Load a store once per process and return a dict with the same keys the
+    old `CCBlade_inputs_{n_span}.pkl` files had, including the `af` airfoils.
+    """
+    folder = os.path.realpath(folder)
+    if folder in _loaded_stores:
+        return _loaded_stores[folder]
+
+    fname_meta = os.path.join(folder, "meta.json")
+    if not os.path.isfile(fname_meta):
+        raise FileNotFoundError(
+            f"No CCBlade store found at {folder}. Run export_ccblade_store.py first."
+        )
+
+    with open(fname_meta, "r") as f:
+        meta = json.load(f)
+
+    if meta["version"] != STORE_VERSION:
+        raise ValueError(
+            f"CCBlade store at {folder} has version {meta['version']}, "
+            f"but version {STORE_VERSION} is required. Please re-export it."
+        )
+
+    saved_dict = dict(meta["scalars"])
+    for name in array_names:
+        saved_dict[name] = np.load(os.path.join(folder, name + ".npy"), mmap_mode="r")
+
+    af = [None] * meta["n_span"]
+    for i in range(meta["n_span"]):
+        af[i] = CCAirfoil(
+            saved_dict["airfoils_aoa"],
+            saved_dict["airfoils_Re"],
+            saved_dict["airfoils_cl"][i, :, :],
+            saved_dict["airfoils_cd"][i, :, :],
+            saved_dict["airfoils_cm"][i, :, :],
+        )
+    saved_dict["af"] = af
+
+    _loaded_stores[folder] = saved_dict
+    return saved_dict
+
+
+def export_ccblade_store(wt_opt, folder, twist_lower, twist_upper, ccblade_path="ccblade"):
+    """
+    Export the CCBlade inputs of a WISDEM problem that has already been run,
+    e.g. `FullCCBlade.wt_opt`, to a store folder.
+
+    `twist_lower` and `twist_upper` are the twist bounds in radians from the
+    analysis options, which map the twist gains to the twist control points.
+    """
+    ccblade_path = ccblade_path + "."
+
+    arrays = {}
+    arrays["r"] = wt_opt.get_val(ccblade_path + "r", units="m")
+    arrays["s"] = wt_opt["blade.pa.s"]
+    arrays["chord_original"] = wt_opt.get_val("blade.pa.chord_original", units="m")
+    arrays["twist"] = wt_opt.get_val(ccblade_path + "theta", units="deg")
+    arrays["precurve"] = wt_opt.get_val(ccblade_path + "precurve", units="m")
+    arrays["presweep"] = wt_opt.get_val(ccblade_path + "presweep", units="m")
+    arrays["airfoils_aoa"] = wt_opt.get_val(ccblade_path + "airfoils_aoa", units="deg")
+    arrays["airfoils_Re"] = wt_opt[ccblade_path + "airfoils_Re"]
+    for name in ["airfoils_cl", "airfoils_cd", "airfoils_cm"]:
+        polar = wt_opt[ccblade_path + name]
+        # Older WISDEM versions carry an extra flap angle axis; keep the reference tab
+        if polar.ndim == 4:
+            polar = polar[:, :, :, int(np.floor(polar.shape[3] / 2))]
+        arrays[name] = polar
+    arrays["s_opt_chord"] = wt_opt["blade.opt_var.s_opt_chord"]
+    arrays["s_opt_twist"] = wt_opt["blade.opt_var.s_opt_twist"]
+    arrays["chord_opt_gain"] = wt_opt["blade.opt_var.chord_opt_gain"]
+    arrays["twist_opt_gain"] = wt_opt["blade.opt_var.twist_opt_gain"]
+    arrays["twist_lower"] = twist_lower
+    arrays["twist_upper"] = twist_upper
+    check_parameterization(arrays, wt_opt.get_val(ccblade_path + "chord", units="m"))
+
+    scalars = {}
+    for name in scalar_names:
+        if name in ["precone", "tilt", "yaw", "pitch"]:
+            scalars[name] = wt_opt.get_val(ccblade_path + name, units="deg")
+        else:
+            scalars[name] = wt_opt[ccblade_path + name]
+
+    save_ccblade_store(folder, arrays, scalars)
+
+
+def check_parameterization(arrays, chord):
+    """
+    Make sure the spanwise parameterization used by the standalone model
+    reproduces the chord and twist WISDEM computed for the exported design.
+    """
+    chord_basis = PchipBasis(arrays["s_opt_chord"], arrays["s"])
+    twist_basis = PchipBasis(arrays["s_opt_twist"], arrays["s"])
+
+    chord_param = arrays["chord_original"] * chord_basis(arrays["chord_opt_gain"])
+    twist_param = np.rad2deg(twist_basis(twist_from_gain(
+        arrays["twist_opt_gain"], arrays["twist_lower"], arrays["twist_upper"]
+    )))
+
+    if not np.allclose(chord_param, chord, rtol=1.e-6, atol=1.e-8):
+        raise ValueError(
+            "The chord gains do not reproduce the chord of the exported design, "
+            "this WISDEM version parameterizes the chord differently."
+        )
+    if not np.allclose(twist_param, arrays["twist"], rtol=1.e-6, atol=1.e-6):
+        raise ValueError(
+            "The twist gains do not reproduce the twist of the exported design, "
+            "this WISDEM version parameterizes the twist differently."
+        )
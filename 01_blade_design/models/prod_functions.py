@@ -4,10 +4,17 @@ import numpy as np
 from weis.glue_code.runWEIS import run_weis
 from wisdem.commonse.mpi_tools import MPI
 from weis.multifidelity.models.base_model import BaseModel
-from scipy.interpolate import PchipInterpolator
-import dill
 from wisdem.ccblade.ccblade import CCBlade as CCBladeOrig
+from wisdem.ccblade import _bem
 from mpi4py import MPI
+from weis.aeroelasticse.Util.FileTools import load_yaml, save_yaml
+from .ccblade_store import ccblade_store_folder, export_ccblade_store, load_ccblade_store, array_names
+from .aero_rotor import build_aero_problem
+from .blade_param import PchipBasis, twist_from_gain
+from .bem_batch import BatchBEM
+
+from mf_utils.eval_cache import cache_model
+from mf_utils.run_dirs import evaluation_dir, finish_evaluation_dir, rebase_paths
 
 
 comm = MPI.COMM_WORLD
@@ -17,12 +24,73 @@ rank = comm.Get_rank()
 run_dir = os.path.dirname(os.path.realpath(__file__)) + os.sep
 fname_wt_input = run_dir + "IEA-15-240-RWT_WISDEMieaontology4all.yaml"
 fname_modeling_options_ccblade = run_dir + "modeling_options_ccblade.yaml"
+fname_modeling_options_ccblade_aero = run_dir + "modeling_options_ccblade_aero.yaml"
 fname_modeling_options_openfast = run_dir + "modeling_options_openfast.yaml"
 fname_modeling_options_olaf = run_dir + "modeling_options_olaf.yaml"
 fname_modeling_options_openfast_AEP = run_dir + "modeling_options_openfast_AEP.yaml"
 fname_analysis_options = run_dir + "analysis_options_prod.yaml"
 folder_output = run_dir + "it_0/"
 fname_wt_output = folder_output + "/temp.yaml"
+folder_evaluations = run_dir + "evaluations/"
+
+
+def get_idx_start(desvars_init):
+    """
+    Return the index where each design variable starts within the full WISDEM
+    array, e.g. `blade.opt_var.twist_opt_gain` only sets entries 2 and onward.
+    """
+    idx_start = {}
+    for key, value in desvars_init.items():
+        if isinstance(value, dict):
+            idx_start[key] = value.get("idx_start", 0)
+        else:
+            idx_start[key] = 0
+    return idx_start
+
+
+def set_desvars(wt_opt, desvars, idx_start):
+    """
+    Push design variable values into an already set up WISDEM problem.
+    """
+    for key, value in desvars.items():
+        if isinstance(value, dict):
+            start = value.get("idx_start", idx_start.get(key, 0))
+            value = value["values"]
+        else:
+            start = idx_start.get(key, 0)
+        value = np.atleast_1d(value)
+        full_value = np.array(wt_opt[key])
+        full_value[start : start + len(value)] = value
+        wt_opt[key] = full_value
+
+
+def write_isolated_options(fname_modeling_options, eval_dir):
+    """
+    Write copies of the modeling and analysis options that send all WEIS and
+    OpenFAST outputs to `eval_dir`, and return their file names. Relative
+    paths, e.g. of the OpenFAST model, airfoil and turbulence files, are made
+    absolute against the folder of the original options file.
+    """
+    modeling_options = load_yaml(fname_modeling_options)
+    modeling_dir = os.path.dirname(os.path.realpath(fname_modeling_options))
+    rebase_paths(modeling_options, modeling_dir)
+    file_management = modeling_options["openfast"]["file_management"]
+    # WEIS resolves the model folder from the modeling options even before it exists
+    if "FAST_directory" in file_management and not os.path.isabs(file_management["FAST_directory"]):
+        file_management["FAST_directory"] = os.path.join(modeling_dir, file_management["FAST_directory"])
+    file_management["FAST_runDirectory"] = os.path.join(eval_dir, "openfast")
+
+    analysis_options = load_yaml(fname_analysis_options)
+    rebase_paths(analysis_options, os.path.dirname(os.path.realpath(fname_analysis_options)))
+    analysis_options["general"]["folder_output"] = eval_dir
+
+    save_yaml(eval_dir, "modeling_options.yaml", modeling_options)
+    save_yaml(eval_dir, "analysis_options.yaml", analysis_options)
+
+    return (
+        os.path.join(eval_dir, "modeling_options.yaml"),
+        os.path.join(eval_dir, "analysis_options.yaml"),
+    )
 
 
 class FullCCBlade(BaseModel):
@@ -31,21 +99,42 @@ class FullCCBlade(BaseModel):
 
     This calls WISDEM using the yaml files and all normal entry points, but
     has the additional overhead of unnecessary analyses.
+
+    With `warm=True` the WISDEM problem is only built and set up on the first
+    call. Later calls push the new design variables into that problem and
+    call `run_model`, skipping the yaml parsing, `setup()` and `final_setup()`
+    that otherwise dominate the cost of each evaluation.
     """
 
-    def __init__(self, desvars_init, warmstart_file, turbine_geom_yaml=fname_wt_input, modeling_options=fname_modeling_options_ccblade):
+    def __init__(self, desvars_init, warmstart_file, turbine_geom_yaml=fname_wt_input, modeling_options=fname_modeling_options_ccblade, warm=False, eval_cache=None):
         super(FullCCBlade, self).__init__(desvars_init, warmstart_file)
         self.turbine_geom_yaml = turbine_geom_yaml
         self.fname_modeling_options = modeling_options
+        self.warm = warm
+        self.idx_start = get_idx_start(desvars_init)
+        self.wt_opt = None
+
+        if eval_cache:
+            cache_model(self, [turbine_geom_yaml, modeling_options, fname_analysis_options], cache=eval_cache)
 
     def compute(self, desvars):
-        wt_opt_ccblade, analysis_options_ccblade, opt_options_ccblade = run_weis(
-            self.turbine_geom_yaml,
-            self.fname_modeling_options,
-            fname_analysis_options,
-            desvars,
-        )
+        if self.warm and self.wt_opt is not None:
+            wt_opt_ccblade = self.wt_opt
+            set_desvars(wt_opt_ccblade, desvars, self.idx_start)
+            wt_opt_ccblade.run_model()
+        else:
+            wt_opt_ccblade, analysis_options_ccblade, opt_options_ccblade = run_weis(
+                self.turbine_geom_yaml,
+                self.fname_modeling_options,
+                fname_analysis_options,
+                desvars,
+            )
         
+        self.wt_opt = wt_opt_ccblade
+
+        return self.ccblade_outputs(wt_opt_ccblade)
+
+    def ccblade_outputs(self, wt_opt_ccblade):
         outputs = {}
         outputs["AEP"] = wt_opt_ccblade.get_val("rp.AEP", units="GW*h")
         outputs["CP"] = wt_opt_ccblade["ccblade.CP"][0]
@@ -56,11 +145,65 @@ class FullCCBlade(BaseModel):
         outputs["root_flapwise_bending_moment"] = wt_opt_ccblade.get_val(
             "ccblade.M", units="kN*m"
         )
-        
-        self.wt_opt = wt_opt_ccblade
 
         return outputs
-        
+
+    def export_ccblade_store(self, folder=None):
+        """
+        Save the CCBlade inputs of the last evaluated design so the standalone
+        CCBlade model can use them.
+        """
+        n_span = len(self.wt_opt["ccblade.r"])
+        twist_options = load_yaml(fname_analysis_options)["design_variables"]["blade"]["aero_shape"]["twist"]
+        if rank == 0:
+            export_ccblade_store(
+                self.wt_opt,
+                ccblade_store_folder(n_span, folder),
+                twist_options["lower_bound"],
+                twist_options["upper_bound"],
+            )
+        comm.Barrier()
+
+
+class AeroCCBlade(FullCCBlade):
+    """
+    Build only the aerodynamic part of WISDEM from the yaml files and focus
+    on results from CCBlade.
+
+    The geometry goes through the same ontology parsing and blade
+    parameterization as FullCCBlade, but only CCBlade, the power curve, AEP
+    and the stall check are added to the problem (see models/aero_rotor.py).
+    This sits between FullCCBlade and the standalone CCBlade model: it needs
+    no exported store and handles any geometry change the yaml can express,
+    without the cost of the structural, drivetrain and cost analyses.
+
+    The problem is set up on the first call and reused afterwards, like
+    FullCCBlade with `warm=True`.
+    """
+
+    def __init__(self, desvars_init, warmstart_file, turbine_geom_yaml=fname_wt_input, modeling_options=fname_modeling_options_ccblade_aero, eval_cache=None):
+        super(AeroCCBlade, self).__init__(
+            desvars_init,
+            warmstart_file,
+            turbine_geom_yaml=turbine_geom_yaml,
+            modeling_options=modeling_options,
+            warm=True,
+            eval_cache=eval_cache,
+        )
+
+    def compute(self, desvars):
+        if self.wt_opt is None:
+            self.wt_opt = build_aero_problem(
+                self.turbine_geom_yaml,
+                self.fname_modeling_options,
+                fname_analysis_options,
+            )
+
+        set_desvars(self.wt_opt, desvars, self.idx_start)
+        self.wt_opt.run_model()
+
+        return self.ccblade_outputs(self.wt_opt)
+
 
 class OpenFAST(BaseModel):
     """
@@ -70,18 +213,34 @@ class OpenFAST(BaseModel):
     has the additional overhead of unnecessary analyses. However, OpenFAST
     is generally more expensive than the other portions of WISDEM, making this
     less important.
+
+    Each evaluation writes its WEIS and OpenFAST files to its own folder in
+    `evaluations/`, keyed on the design and the MPI rank, so finite difference
+    and sampling evaluations can run at the same time. By default the folder
+    is deleted once the outputs were read; set `cleanup` to "archive" to keep
+    it with the bulky OpenFAST outputs packed, or to None to keep everything.
+    Folders of evaluations that fail are always kept.
     """
 
-    def __init__(self, desvars_init, warmstart_file, turbine_geom_yaml=fname_wt_input,  modeling_options=fname_modeling_options_openfast):
+    def __init__(self, desvars_init, warmstart_file, turbine_geom_yaml=fname_wt_input,  modeling_options=fname_modeling_options_openfast, eval_cache=None, cleanup="delete"):
         super(OpenFAST, self).__init__(desvars_init, warmstart_file)
         self.turbine_geom_yaml = turbine_geom_yaml
         self.fname_modeling_options = modeling_options
+        self.cleanup = cleanup
+
+        if eval_cache:
+            cache_model(self, [turbine_geom_yaml, modeling_options, fname_analysis_options], cache=eval_cache)
 
     def compute(self, desvars):
+        eval_dir = evaluation_dir(folder_evaluations, "OpenFAST", desvars, rank)
+        fname_modeling_options_eval, fname_analysis_options_eval = write_isolated_options(
+            self.fname_modeling_options, eval_dir
+        )
+
         wt_opt_openfast, analysis_options_openfast, opt_options_openfast = run_weis(
             self.turbine_geom_yaml,
-            self.fname_modeling_options,
-            fname_analysis_options,
+            fname_modeling_options_eval,
+            fname_analysis_options_eval,
             desvars,
         )
 
@@ -97,6 +256,8 @@ class OpenFAST(BaseModel):
         
         self.wt_opt = wt_opt_openfast
 
+        finish_evaluation_dir(eval_dir, self.cleanup)
+
         return outputs
         
         
@@ -108,19 +269,28 @@ class OpenFASTAEP(BaseModel):
     This calls WISDEM using the yaml files and all normal entry points, but
     has the additional overhead of unnecessary analyses. However, OpenFAST
     is generally more expensive than the other portions of WISDEM, making this
-    less important.
+    less important. Evaluations run in their own folders, as in `OpenFAST`.
     """
 
-    def __init__(self, desvars_init, warmstart_file, turbine_geom_yaml=fname_wt_input,  modeling_options=fname_modeling_options_openfast_AEP):
+    def __init__(self, desvars_init, warmstart_file, turbine_geom_yaml=fname_wt_input,  modeling_options=fname_modeling_options_openfast_AEP, eval_cache=None, cleanup="delete"):
         super(OpenFASTAEP, self).__init__(desvars_init, warmstart_file)
         self.turbine_geom_yaml = turbine_geom_yaml
         self.fname_modeling_options = modeling_options
+        self.cleanup = cleanup
+
+        if eval_cache:
+            cache_model(self, [turbine_geom_yaml, modeling_options, fname_analysis_options], cache=eval_cache)
 
     def compute(self, desvars):
+        eval_dir = evaluation_dir(folder_evaluations, "OpenFASTAEP", desvars, rank)
+        fname_modeling_options_eval, fname_analysis_options_eval = write_isolated_options(
+            self.fname_modeling_options, eval_dir
+        )
+
         wt_opt_openfast, analysis_options_openfast, opt_options_openfast = run_weis(
             self.turbine_geom_yaml,
-            self.fname_modeling_options,
-            fname_analysis_options,
+            fname_modeling_options_eval,
+            fname_analysis_options_eval,
             desvars,
         )
         
@@ -137,6 +307,8 @@ class OpenFASTAEP(BaseModel):
         
         self.wt_opt = wt_opt_openfast
                 
+        finish_evaluation_dir(eval_dir, self.cleanup)
+
         return outputs
 
 
@@ -147,19 +319,28 @@ class OLAF(BaseModel):
     This calls WEIS using the yaml files and all normal entry points, but
     has the additional overhead of unnecessary analyses. However, OpenFAST
     is generally more expensive than the other portions of WEIS, making this
-    less important.
+    less important. Evaluations run in their own folders, as in `OpenFAST`.
     """
 
-    def __init__(self, desvars_init, warmstart_file, turbine_geom_yaml=fname_wt_input,  modeling_options=fname_modeling_options_olaf):
+    def __init__(self, desvars_init, warmstart_file, turbine_geom_yaml=fname_wt_input,  modeling_options=fname_modeling_options_olaf, eval_cache=None, cleanup="delete"):
         super(OLAF, self).__init__(desvars_init, warmstart_file)
         self.turbine_geom_yaml = turbine_geom_yaml
         self.fname_modeling_options = modeling_options
+        self.cleanup = cleanup
+
+        if eval_cache:
+            cache_model(self, [turbine_geom_yaml, modeling_options, fname_analysis_options], cache=eval_cache)
 
     def compute(self, desvars):
+        eval_dir = evaluation_dir(folder_evaluations, "OLAF", desvars, rank)
+        fname_modeling_options_eval, fname_analysis_options_eval = write_isolated_options(
+            self.fname_modeling_options, eval_dir
+        )
+
         wt_opt_olaf, analysis_options_olaf, opt_options_olaf = run_weis(
             self.turbine_geom_yaml,
-            self.fname_modeling_options,
-            fname_analysis_options,
+            fname_modeling_options_eval,
+            fname_analysis_options_eval,
             desvars,
         )
 
@@ -173,6 +354,8 @@ class OLAF(BaseModel):
             "aeroelastic.max_RootMyb", units="kN*m"
         )[0]
 
+        finish_evaluation_dir(eval_dir, self.cleanup)
+
         return outputs
 
 
@@ -181,34 +364,104 @@ class CCBlade(BaseModel):
     Call only CCBlade as a standalone function using saved inputs.
 
     To ensure we're running the correct geometry, you need to first run
-    FullCCBlade to save off some pickle files with info needed for this model.
+    FullCCBlade and export a CCBlade store with the info needed for this model
+    (see export_ccblade_store.py). The store is memory-mapped and loaded
+    once per process.
     However, this model is much faster than the full WISDEM version because it
     doesn't call other analyses unnecessarily. For a quick test, this is
     about 320x faster.
+
+    Both the chord and the twist gains are applied the way WISDEM does it, so
+    this model covers the same design space as FullCCBlade. Control points
+    before a design variable's `idx_start` keep the gains of the exported
+    design. The PCHIP basis at the saved spanwise stations is built once
+    (see models/blade_param.py), so each design only costs a few array
+    operations before CCBlade runs.
+
+    Use `compute_batch` to evaluate many designs at once, e.g. the initial
+    trust region samples or finite difference perturbations. The chord and
+    twist for all designs are computed in a single vectorized call, and so
+    is the BEM solve (see models/bem_batch.py): the residual of every
+    station, azimuthal sector and design is solved together, with the same
+    steps and results as CCBlade. The inflow and the torque integration
+    weights don't depend on the design, so they are computed once per model.
+
+    `compute_partials` returns analytic derivatives of CP and power with
+    respect to the chord and twist gains, so OpenMDAO wrappers can declare
+    partials instead of finite differencing this model.
     """
 
-    def __init__(self, desvars_init, warmstart_file=None, n_span=30):
+    def __init__(self, desvars_init, warmstart_file=None, n_span=30, store_folder=None, eval_cache=None):
         super().__init__(desvars_init, warmstart_file)
         self.n_span = n_span
+        self.store_folder = ccblade_store_folder(n_span, store_folder)
+        self.idx_start = get_idx_start(desvars_init)
+        self.saved_dict = None
+        self.bem = None
+
+        if eval_cache:
+            store_files = [os.path.join(self.store_folder, "meta.json")]
+            for name in array_names:
+                store_files.append(os.path.join(self.store_folder, name + ".npy"))
+            cache_model(self, store_files, cache=eval_cache)
+
+    def load_saved_inputs(self):
+        if self.saved_dict is None:
+            self.saved_dict = load_ccblade_store(self.store_folder)
+            self.chord_basis = PchipBasis(self.saved_dict["s_opt_chord"], self.saved_dict["s"])
+            self.twist_basis = PchipBasis(self.saved_dict["s_opt_twist"], self.saved_dict["s"])
+        return self.saved_dict
 
     def compute(self, desvars):
-        with open(run_dir + f"CCBlade_inputs_{self.n_span}.pkl", "rb") as f:
-            saved_dict = dill.load(f)
+        batch_outputs = self.compute_batch([desvars])
 
-        chord_opt_gain = desvars["blade.opt_var.chord_opt_gain"]
+        outputs = {}
+        for key in batch_outputs:
+            outputs[key] = batch_outputs[key][:1]
 
-        chord_original = saved_dict["chord_original"]
-        s = saved_dict["s"]
-        s_opt_chord = np.linspace(0.0, 1.0, len(chord_opt_gain))
+        return outputs
 
-        spline = PchipInterpolator
-        chord_spline = spline(s_opt_chord, chord_opt_gain)
-        chord = chord_original * chord_spline(s)
+    def full_gains(self, list_of_desvars, key):
+        """
+        Gains at all control points for each design, shape (n_opt, n_designs).
+        """
+        saved_dict = self.load_saved_inputs()
+        exported_gains = np.array(saved_dict[key.split(".")[-1]], dtype=float)
+        gains = np.tile(exported_gains[:, np.newaxis], (1, len(list_of_desvars)))
+
+        start = self.idx_start.get(key, 0)
+        for i, desvars in enumerate(list_of_desvars):
+            if key in desvars:
+                values = np.atleast_1d(desvars[key])
+                gains[start : start + len(values), i] = values
+
+        return gains
+
+    def chord(self, chord_opt_gain):
+        """
+        Chord (m) at the saved spanwise stations for gains at all control
+        points, of shape (n_opt,) or (n_opt, n_designs).
+        """
+        saved_dict = self.load_saved_inputs()
+        chord_original = self.chord_basis.broadcast(saved_dict["chord_original"], chord_opt_gain)
+        return chord_original * self.chord_basis(chord_opt_gain)
+
+    def twist(self, twist_opt_gain):
+        """
+        Twist (deg) at the saved spanwise stations for gains at all control
+        points, of shape (n_opt,) or (n_opt, n_designs).
+        """
+        saved_dict = self.load_saved_inputs()
+        twist_opt = twist_from_gain(twist_opt_gain, saved_dict["twist_lower"], saved_dict["twist_upper"])
+        return np.rad2deg(self.twist_basis(twist_opt))
+
+    def build_rotor(self, chord, twist, derivatives=False):
+        saved_dict = self.load_saved_inputs()
 
         get_cp_cm = CCBladeOrig(
             saved_dict["r"],
             chord,
-            saved_dict["twist"],
+            twist,
             saved_dict["af"],
             saved_dict["Rhub"],
             saved_dict["Rtip"],
@@ -229,20 +482,101 @@ class CCBlade(BaseModel):
             saved_dict["hubloss"],
             saved_dict["wakerotation"],
             saved_dict["usecd"],
+            derivatives=derivatives,
         )
         get_cp_cm.inverse_analysis = False
         get_cp_cm.induction = True
 
+        return get_cp_cm
+
+    def operating_point(self):
+        saved_dict = self.load_saved_inputs()
+
         # Compute omega given TSR
         Omega = (
             saved_dict["Uhub"] * saved_dict["tsr"] / saved_dict["Rtip"] * 30.0 / np.pi
         )
 
-        myout, derivs = get_cp_cm.evaluate(
-            [saved_dict["Uhub"]], [Omega], [saved_dict["pitch"]], coefficients=True
-        )
+        return saved_dict["Uhub"], Omega, saved_dict["pitch"]
+
+    def evaluate_rotor(self, get_cp_cm):
+        Uhub, Omega, pitch = self.operating_point()
+
+        return get_cp_cm.evaluate([Uhub], [Omega], [pitch], coefficients=True)
+
+    def batch_bem(self):
+        """
+        BEM solver vectorized over designs, built once from the rotor of the
+        exported design.
+        """
+        if self.bem is None:
+            saved_dict = self.load_saved_inputs()
+            rotor = self.build_rotor(saved_dict["chord_original"], saved_dict["twist"])
+            Uhub, Omega, pitch = self.operating_point()
+
+            # Inflow at the stations in each azimuthal sector, like CCBlade.evaluate
+            Vx = np.zeros((rotor.nSector, len(rotor.r)))
+            Vy = np.zeros((rotor.nSector, len(rotor.r)))
+            for i, azimuth in enumerate(np.linspace(0.0, 2 * np.pi, rotor.nSector + 1)[:-1]):
+                Vx[i], Vy[i] = _bem.windcomponents(
+                    rotor.r, rotor.precurve, rotor.presweep, rotor.precone, rotor.yaw, rotor.tilt,
+                    azimuth, Uhub, Omega, rotor.hubHt, rotor.shearExp,
+                )
+
+            # The torque is a linear function of the tangential loads
+            args = (rotor.r, rotor.precurve, rotor.presweep, rotor.precone, rotor.Rhub, rotor.Rtip,
+                rotor.precurveTip, rotor.presweepTip)
+            dQ_dTp = np.zeros(len(rotor.r))
+            for i, Tp in enumerate(np.eye(len(rotor.r))):
+                dQ_dTp[i] = _bem.thrusttorque(np.zeros(len(rotor.r)), Tp, *args)[3]
+
+            self.bem = BatchBEM(rotor, Uhub, Omega, pitch, Vx, Vy, dQ_dTp)
+        return self.bem
+
+    def compute_batch(self, list_of_desvars):
+        # Stack the gains column-wise so one call handles every design
+        chord = self.chord(self.full_gains(list_of_desvars, "blade.opt_var.chord_opt_gain"))
+        twist = self.twist(self.full_gains(list_of_desvars, "blade.opt_var.twist_opt_gain"))
+
+        CP, power = self.batch_bem().evaluate(chord, np.deg2rad(twist))
 
         outputs = {}
-        outputs["CP"] = myout["CP"]
+        outputs["CP"] = CP
+        outputs["power"] = power
 
         return outputs
+
+    def compute_partials(self, desvars):
+        """
+        Analytic derivatives of CP and power (W) with respect to the chord and
+        twist gains in `desvars`. CCBlade gives the derivatives with respect
+        to the spanwise chord and twist, which are chained through the PCHIP
+        parameterization.
+        """
+        saved_dict = self.load_saved_inputs()
+        chord_key = "blade.opt_var.chord_opt_gain"
+        twist_key = "blade.opt_var.twist_opt_gain"
+        chord_opt_gain = self.full_gains([desvars], chord_key)[:, 0]
+        twist_opt_gain = self.full_gains([desvars], twist_key)[:, 0]
+
+        get_cp_cm = self.build_rotor(self.chord(chord_opt_gain), self.twist(twist_opt_gain), derivatives=True)
+        myout, derivs = self.evaluate_rotor(get_cp_cm)
+
+        dchord_dgain = saved_dict["chord_original"][:, np.newaxis] * self.chord_basis.jacobian(chord_opt_gain)
+        # CCBlade gives the twist derivatives per degree
+        twist_range = np.asarray(saved_dict["twist_upper"]) - np.asarray(saved_dict["twist_lower"])
+        twist_opt = twist_from_gain(twist_opt_gain, saved_dict["twist_lower"], saved_dict["twist_upper"])
+        dtwist_dgain = np.rad2deg(self.twist_basis.jacobian(twist_opt) * twist_range)
+
+        partials = {}
+        partials["CP"] = {}
+        partials["power"] = {}
+        for key, dgain, wrt in [(chord_key, dchord_dgain, "dchord"), (twist_key, dtwist_dgain, "dtheta")]:
+            if key not in desvars:
+                continue
+            start = self.idx_start.get(key, 0)
+            dgain = dgain[:, start : start + len(np.atleast_1d(desvars[key]))]
+            partials["CP"][key] = derivs["dCP"][wrt][0, :] @ dgain
+            partials["power"][key] = derivs["dP"][wrt][0, :] @ dgain
+
+        return partials
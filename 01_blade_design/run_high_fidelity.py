@@ -1,5 +1,10 @@
+import os
+import sys
 import numpy as np
+# mf_utils is shared by the case studies at the top level of the repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 from models.prod_functions import OpenFAST
+from mf_utils.eval_cache import env_cache
 from scipy.optimize import minimize
 from time import time
 from os import path
@@ -30,7 +35,7 @@ class OF(om.ExplicitComponent):
             self.add_input(trimmed_key, val=desvars[key]['values'])
         
         self.add_output('power', val=0., units='MW')
-        self.model = OpenFAST(desvars, 'OF.pkl')
+        self.model = OpenFAST(desvars, 'OF.pkl', eval_cache=env_cache())
 
     def compute(self, inputs, outputs):
         desvars = self.options["desvars"]
@@ -1,5 +1,10 @@
+import os
+import sys
 import numpy as np
+# mf_utils is shared by the case studies at the top level of the repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 from models.prod_functions import FullCCBlade
+from mf_utils.eval_cache import env_cache
 from time import time
 from os import path
 import openmdao.api as om
@@ -30,7 +35,7 @@ class CCBlade(om.ExplicitComponent):
             self.add_input(trimmed_key, val=desvars[key]['values'])
         
         self.add_output('power', val=0., units='MW')
-        self.model = FullCCBlade(desvars, 'CCBlade.pkl')
+        self.model = FullCCBlade(desvars, 'CCBlade.pkl', warm=True, eval_cache=env_cache())
 
     def compute(self, inputs, outputs):
         desvars = self.options["desvars"]
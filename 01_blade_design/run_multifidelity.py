@@ -1,5 +1,11 @@
+import os
+import sys
 import numpy as np
+# mf_utils is shared by the case studies at the top level of the repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 from models.prod_functions import FullCCBlade, OpenFAST
+from mf_utils.eval_cache import env_cache
+from mf_utils.profiling import env_profiler, finish_profiler, profile_model
 from weis.multifidelity.methods.trust_region import SimpleTrustRegion
 
 
@@ -18,8 +24,13 @@ desvars = {
     "blade.opt_var.twist_opt_gain": twist_dv,
     "blade.opt_var.chord_opt_gain": chord_dv,
 }
-model_low = FullCCBlade(desvars, "cc_results.pkl")
-model_high = OpenFAST(desvars, "of_results.pkl")
+model_low = FullCCBlade(desvars, "cc_results.pkl", warm=True, eval_cache=env_cache())
+model_high = OpenFAST(desvars, "of_results.pkl", eval_cache=env_cache())
+# Profile the model calls if MF_PROFILE names an events file
+profiler = env_profiler()
+if profiler is not None:
+    profile_model(model_low, "low", profiler)
+    profile_model(model_high, "high", profiler)
 trust_region = SimpleTrustRegion(
     model_low,
     model_high,
@@ -32,3 +43,5 @@ trust_region = SimpleTrustRegion(
 trust_region.add_objective("power", scaler=-1e-6)
 
 trust_region.optimize(plot=False)
+
+finish_profiler(profiler)
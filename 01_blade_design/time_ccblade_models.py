@@ -0,0 +1,120 @@
+import os
+import sys
+import numpy as np
+# mf_utils is shared by the case studies at the top level of the repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+from models.prod_functions import FullCCBlade, AeroCCBlade, CCBlade, fname_modeling_options_ccblade_aero
+from time import time
+
+
+np.random.seed(123)
+
+twist_dv = {'values' : np.array([0.55, 0.55, 0.55, 0.55]),
+    'idx_start' : 2}
+chord_dv = {'values' : np.ones(3),
+    'idx_start' : 2}
+
+desvars = {
+    "blade.opt_var.twist_opt_gain": twist_dv,
+    "blade.opt_var.chord_opt_gain": chord_dv,
+}
+
+# Perturbed designs, similar to what finite differencing asks for
+n_calls = 8
+designs = []
+for i in range(n_calls):
+    design = {}
+    for key in desvars:
+        values = desvars[key]['values']
+        design[key] = values + 0.01 * np.random.rand(len(values))
+    designs.append(design)
+
+
+def time_model(model, designs):
+    times = []
+    outputs = []
+    for design in designs:
+        s = time()
+        outputs.append(model.compute(design))
+        times.append(time() - s)
+    return np.array(times), outputs
+
+
+def max_output_diff(outputs_a, outputs_b):
+    max_diff = 0.
+    for a, b in zip(outputs_a, outputs_b):
+        for key in a:
+            max_diff = max(max_diff, np.max(np.abs(np.array(a[key]) - np.array(b[key]))))
+    return max_diff
+
+
+cold_times, cold_outputs = time_model(FullCCBlade(desvars, None), designs)
+warm_times, warm_outputs = time_model(FullCCBlade(desvars, None, warm=True), designs)
+
+# The first warm call still builds the problem, so compare the calls after it
+cold_per_call = np.mean(cold_times[1:])
+warm_per_call = np.mean(warm_times[1:])
+
+print('Cold FullCCBlade time per call', cold_per_call)
+print('Warm FullCCBlade time per call', warm_per_call)
+print('Warm FullCCBlade first call', warm_times[0])
+print('Speedup per call', cold_per_call / warm_per_call)
+print('Max output difference between cold and warm', max_output_diff(cold_outputs, warm_outputs))
+
+
+# Aero-only WISDEM problem vs. the full stack. The full stack is also run with
+# the aero modeling options (DriveSE off), which is what the aero problem matches.
+aero_times, aero_outputs = time_model(AeroCCBlade(desvars, None), designs)
+full_aero_times, full_aero_outputs = time_model(
+    FullCCBlade(desvars, None, modeling_options=fname_modeling_options_ccblade_aero, warm=True), designs
+)
+aero_per_call = np.mean(aero_times[1:])
+
+print()
+print('AeroCCBlade time per call', aero_per_call)
+print('AeroCCBlade first call', aero_times[0])
+print('Speedup per call over warm FullCCBlade', warm_per_call / aero_per_call)
+print('Speedup of the first call over warm FullCCBlade', warm_times[0] / aero_times[0])
+print('Max output difference to FullCCBlade with the same options', max_output_diff(full_aero_outputs, aero_outputs))
+print('Max output difference to FullCCBlade with DriveSE', max_output_diff(warm_outputs, aero_outputs))
+
+
+# Standalone CCBlade, one design per call vs. one batch for all designs
+n_designs = 200
+batch_designs = []
+for i in range(n_designs):
+    batch_designs.append({
+        "blade.opt_var.twist_opt_gain": np.random.rand(4),
+        "blade.opt_var.chord_opt_gain": 0.5 + np.random.rand(3),
+    })
+
+# One model that has already loaded its inputs. The reference runs CCBlade
+# itself once per design, which is what compute_batch did before its BEM
+# solve was vectorized
+model = CCBlade(desvars)
+model.load_saved_inputs()
+s = time()
+loop_CP = []
+for design in batch_designs:
+    chord = model.chord(model.full_gains([design], "blade.opt_var.chord_opt_gain"))[:, 0]
+    twist = model.twist(model.full_gains([design], "blade.opt_var.twist_opt_gain"))[:, 0]
+    loop_CP.append(model.evaluate_rotor(model.build_rotor(chord, twist))[0]["CP"][0])
+loop_time = time() - s
+
+s = time()
+batch_CP = model.compute_batch(batch_designs)["CP"]
+batch_time = time() - s
+
+print()
+print('CCBlade per design loop time for', n_designs, 'designs', loop_time)
+print('CCBlade compute_batch time for', n_designs, 'designs', batch_time)
+print('Throughput gain of the vectorized BEM solve', loop_time / batch_time)
+print('Max relative CP difference between loop and batch', np.max(np.abs(loop_CP - batch_CP) / np.abs(loop_CP)))
+print('CCBlade time per design in the batch', batch_time / n_designs)
+print('AeroCCBlade time per call, for comparison', aero_per_call)
+
+# The standalone model applies both twist and chord gains, so it should track
+# FullCCBlade over the same perturbed designs
+standalone_CP = model.compute_batch(designs)["CP"]
+full_CP = np.array([np.squeeze(outputs["CP"]) for outputs in warm_outputs])
+print('Max CP difference between CCBlade and FullCCBlade', np.max(np.abs(standalone_CP - full_CP)))
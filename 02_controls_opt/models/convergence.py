@@ -0,0 +1,127 @@
+'''
+Statistical convergence of the metrics of a running Level 3 simulation
+
+fast_monitor calls check_convergence on the output OpenFAST has written so
+far. The initial transient is found per channel with MSER-5 (White, 1997):
+the truncation point that minimizes the standard error of the mean of the
+rest of the series, searched in the first half only. The time after the
+latest of those is cut into batches of batch_time seconds, and each metric
+gets a Student t confidence interval from its batch values:
+
+- DEL: damage rate of each batch, the DEL interval is 1/m of the relative
+  damage interval
+- Std: variance of each batch around the overall mean, half the relative
+  interval for the standard deviation
+
+The run has converged when the relative half-widths of all of them are
+below tol and at least min_time is left after the transient.
+
+Maxima don't converge like this: the maximum over the full simulation only
+grows with its length, and an interval of the mean of batch maxima doesn't
+bound it. fast_monitor doesn't stop runs on convergence while the maximum of
+any channel in max_channels is needed, e.g. as a constraint.
+'''
+import numpy as np
+from scipy.stats import t as student_t
+
+try:
+    from .load_metrics import RainflowCounter
+except ImportError:
+    # Run by the fast_monitor launcher script
+    from load_metrics import RainflowCounter
+
+default_settings = {
+    'tol':              0.05,       # relative half-width of the confidence intervals
+    'confidence':       0.9,
+    'batch_time':       60.,        # s
+    'min_time':         300.,       # s after the transient
+    'del_channels':     [['TwrBsMyt', 4]],
+    'stat_channels':    ['GenSpeed', 'PtfmPitch'],
+    'max_channels':     [],         # channels whose maximum over the full simulation is needed
+}
+
+
+def mser_truncation(y, batch_size=5):
+    '''
+    Index where the initial transient of y ends by MSER, or None if the
+    minimum is in the second half, i.e. the series is still too short.
+    '''
+    n_batches = len(y) // batch_size
+    if n_batches < 4:
+        return None
+    z = y[:n_batches * batch_size].reshape(n_batches, batch_size).mean(axis=1)
+
+    # Variance of z[d:] over (n - d)**2 for every d, from the reversed cumulative sums
+    n_rest  = np.arange(n_batches, 0, -1)
+    s1      = np.cumsum(z[::-1])[::-1]
+    s2      = np.cumsum(z[::-1] ** 2)[::-1]
+    mser    = (s2 / n_rest - (s1 / n_rest) ** 2) / n_rest
+
+    d = int(np.argmin(mser[:n_batches // 2 + 1]))
+    if d >= n_batches // 2:
+        return None
+    return d * batch_size
+
+
+def relative_halfwidth(values, confidence):
+    # Relative half-width of the confidence interval of the mean of batch values
+    values = np.asarray(values, dtype=float)
+    mean = np.mean(values)
+    if mean == 0:
+        return np.inf
+    se = np.std(values, ddof=1) / np.sqrt(len(values))
+    return student_t.ppf(0.5 + confidence / 2, len(values) - 1) * se / abs(mean)
+
+
+def check_convergence(channels, rows, settings):
+    '''
+    Transient end and confidence intervals of the metrics of the time series
+    in rows (Time first, like OutTail.read) as a dict with 'transient' (s),
+    'ci' (relative half-width per metric) and 'converged'.
+    '''
+    settings = dict(default_settings, **settings)
+    record = {'transient': None, 'ci': {}, 'converged': False, 'time': float(rows[-1, 0]) if len(rows) else 0.}
+
+    del_channels = [(chan, m) for chan, m in settings['del_channels'] if chan in channels]
+    stat_channels = [chan for chan in settings['stat_channels'] if chan in channels]
+    if len(rows) < 2 or not (del_channels or stat_channels):
+        return record
+
+    # 1. End of the initial transient, the latest over the channels
+    i_start = 0
+    for chan in [chan for chan, _ in del_channels] + stat_channels:
+        i_chan = mser_truncation(rows[:, channels.index(chan)])
+        if i_chan is None:
+            return record
+        i_start = max(i_start, i_chan)
+    record['transient'] = float(rows[i_start, 0])
+
+    # 2. Batches of the rest
+    time        = rows[i_start:, 0]
+    dt          = (time[-1] - time[0]) / max(len(time) - 1, 1)
+    batch_len   = max(int(round(settings['batch_time'] / dt)), 2)
+    n_batches   = len(time) // batch_len
+    if n_batches < 3:
+        return record
+
+    def batches(chan):
+        y = rows[i_start:, channels.index(chan)]
+        return y, y[:n_batches * batch_len].reshape(n_batches, batch_len)
+
+    for chan, m in del_channels:
+        _, y_b = batches(chan)
+        damage = []
+        for y in y_b:
+            counter = RainflowCounter(m)
+            counter.update(y)
+            damage.append(counter.total_damage())
+        record['ci'][chan + '_DEL'] = relative_halfwidth(damage, settings['confidence']) / m
+
+    for chan in stat_channels:
+        y, y_b = batches(chan)
+        record['ci'][chan + '_Std'] = relative_halfwidth(((y_b - y.mean()) ** 2).mean(axis=1), settings['confidence']) / 2
+
+    record['ci'] = {key: float(value) for key, value in record['ci'].items()}
+    record['converged'] = time[-1] - time[0] >= settings['min_time'] and \
+        all(value <= settings['tol'] for value in record['ci'].values())
+    return record
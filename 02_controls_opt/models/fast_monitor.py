@@ -0,0 +1,268 @@
+'''
+Monitored OpenFAST runs that stop once a constrained channel is out of bounds
+
+runFAST_pywrapper_batch runs the executable it's given on every case, so
+write_launcher puts this script in between: it starts the real OpenFAST,
+tails the text output (.out) while it's being written and terminates the run
+when a channel exceeds its upper limit by more than the margin. The reason is
+saved next to the output as <case>.stopped.json, and read_stopped returns the
+time series up to that point, flagged with 'stopped_early', in place of the
+.outb file OpenFAST never got to write.
+
+With adaptive settings (see convergence.check_convergence), runs are also
+stopped once the metrics have converged, unless the settings list
+max_channels, and the end of the initial transient is saved as
+<case>.monitor.json. The readers drop the time before it, whether the run
+was stopped or not, and keep the maxima of the whole run in 'untrimmed_max'.
+
+OpenFAST has to write text output for this (OutFileFmt 1 or 3). It buffers
+that output, so the stop comes a few kB of output after the violation.
+Launchers are shell scripts, so this is for Linux and macOS.
+
+    python fast_monitor.py --exe openfast --limits '{"GenSpeed": 9}' --margin 0.1 case.fst
+'''
+import os
+import sys
+import json
+import time
+import shlex
+import argparse
+import subprocess
+import numpy as np
+
+try:
+    from .convergence import check_convergence
+except ImportError:
+    # Run as the launcher script
+    from convergence import check_convergence
+
+
+class OutTail(object):
+    '''
+    Incremental reader of an OpenFAST text output file that is still growing.
+    '''
+
+    def __init__(self, fname):
+        self.fname      = fname
+        self.offset     = 0
+        self.partial    = ''
+        self.channels   = None
+        self.units      = None
+
+    def read(self):
+        '''
+        Returns the complete rows added since the last call, as an array of
+        shape (n_rows, n_channels). Time is the first channel.
+        '''
+        if not os.path.isfile(self.fname):
+            return np.zeros((0, 0))
+        with open(self.fname, 'r', errors='replace') as f:
+            f.seek(self.offset)
+            text = f.read()
+            self.offset = f.tell()
+
+        lines = (self.partial + text).split('\n')
+        self.partial = lines.pop()      # not terminated yet
+
+        rows = []
+        for line in lines:
+            tokens = line.split()
+            if self.units is None:
+                # Header lines until the channel names and units
+                if self.channels is None:
+                    if tokens and tokens[0] == 'Time':
+                        self.channels = tokens
+                else:
+                    self.units = [unit[1:-1] for unit in tokens]
+                continue
+            if len(tokens) == len(self.channels):
+                rows.append([float(token) for token in tokens])
+
+        if self.channels is None:
+            return np.zeros((0, 0))
+        return np.array(rows).reshape(-1, len(self.channels))
+
+
+def check_limits(channels, rows, limits, margin):
+    '''
+    First sample that exceeds limit + margin * |limit| for a channel in
+    limits, as a dict, or None.
+    '''
+    first = None
+    for chan, limit in limits.items():
+        if chan not in channels or not len(rows):
+            continue
+        i_chan  = channels.index(chan)
+        exceed  = np.flatnonzero(rows[:, i_chan] > limit + margin * abs(limit))
+        if len(exceed) and (first is None or rows[exceed[0], 0] < first['time']):
+            first = {'channel': chan, 'time': rows[exceed[0], 0], 'value': rows[exceed[0], i_chan], 'limit': limit, 'margin': margin}
+    return first
+
+
+def stop_file(fname):
+    # <case>.stopped.json next to <case>.fst, .out or .outb
+    return os.path.splitext(fname)[0] + '.stopped.json'
+
+
+def record_file(fname):
+    # <case>.monitor.json, the transient and convergence of adaptive runs
+    return os.path.splitext(fname)[0] + '.monitor.json'
+
+
+def run_monitored(FAST_exe, FAST_InputFile, limits, margin=0.1, poll_interval=1., adaptive=None):
+    '''
+    Run OpenFAST on FAST_InputFile and stop it once a channel in limits is out
+    of bounds, or with adaptive settings once the metrics have converged.
+    Returns the exit code of OpenFAST, or 0 if it was stopped.
+    '''
+    for fname in [stop_file(FAST_InputFile), record_file(FAST_InputFile)]:
+        if os.path.isfile(fname):
+            os.remove(fname)
+
+    tail = OutTail(os.path.splitext(FAST_InputFile)[0] + '.out')
+    if os.path.isfile(tail.fname):
+        os.remove(tail.fname)
+
+    # All rows so far and the time of the last convergence check, for adaptive runs
+    all_rows    = []
+    checked     = -np.inf
+    record      = None
+
+    proc = subprocess.Popen([FAST_exe, FAST_InputFile])
+    while True:
+        finished    = proc.poll() is not None
+        rows        = tail.read()
+        if adaptive is not None and len(rows):
+            all_rows.append(rows)
+
+        if finished:
+            # Complete runs are kept as they are, even if they end out of bounds
+            if adaptive is not None and all_rows:
+                write_record(FAST_InputFile, check_convergence(tail.channels, np.concatenate(all_rows), adaptive))
+            return proc.returncode
+
+        stop = check_limits(tail.channels, rows, limits, margin) if tail.channels else None
+        if stop is not None:
+            stop['reason'] = 'limit'
+
+        # Check the convergence after every new batch. Runs that need the maxima of the full simulation
+        # only use the record for the transient
+        if stop is None and adaptive is not None and all_rows and not adaptive.get('max_channels') and \
+            all_rows[-1][-1, 0] - checked >= adaptive.get('batch_time', 60.):
+            checked = all_rows[-1][-1, 0]
+            record  = check_convergence(tail.channels, np.concatenate(all_rows), adaptive)
+            if record['converged']:
+                stop = {'reason': 'converged', 'time': record['time'], 'ci': record['ci']}
+
+        if stop is not None:
+            if adaptive is not None:
+                write_record(FAST_InputFile, record or check_convergence(tail.channels, np.concatenate(all_rows), adaptive))
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+
+            stop['time'] = float(stop['time'])
+            if stop['reason'] == 'limit':
+                stop['value'] = float(stop['value'])
+                print('Stopped {} at t = {:.1f} s: {} = {:.3g} > {:.3g}'.format(FAST_InputFile, stop['time'], stop['channel'], stop['value'], stop['limit']))
+            else:
+                print('Stopped {} at t = {:.1f} s: metrics converged'.format(FAST_InputFile, stop['time']))
+            with open(stop_file(FAST_InputFile), 'w') as f:
+                json.dump(stop, f)
+            return 0
+
+        time.sleep(poll_interval)
+
+
+def write_record(FAST_InputFile, record):
+    with open(record_file(FAST_InputFile), 'w') as f:
+        json.dump(record, f)
+
+
+def trim_transient(out, fname):
+    '''
+    Drop the initial transient that an adaptive run of fname (.out or .outb)
+    found from the output dict, in place. Adds 'transient', 'converged' and
+    'untrimmed_max', the maxima of the channels before trimming, which are
+    the maxima of a run that isn't adaptive. Outputs of other runs are
+    returned as they are.
+    '''
+    if not os.path.isfile(record_file(fname)):
+        return out
+    with open(record_file(fname)) as f:
+        record = json.load(f)
+
+    out['converged']        = record['converged']
+    out['transient']        = record['transient']
+    out['untrimmed_max']    = {chan: float(np.max(value)) for chan, value in out.items() \
+        if chan != 'Time' and isinstance(value, np.ndarray) and value.shape == out['Time'].shape and len(value)}
+    if record['transient'] is not None:
+        keep = out['Time'] >= record['transient']
+        for chan, value in out.items():
+            if isinstance(value, np.ndarray) and value.shape == keep.shape:
+                out[chan] = value[keep]
+    return out
+
+
+def write_launcher(run_dir, FAST_exe, limits, margin=0.1, poll_interval=1., adaptive=None):
+    '''
+    Write an executable that runs FAST_exe monitored, to use as FAST_exe of
+    runFAST_pywrapper_batch. Returns its path.
+    '''
+    os.makedirs(run_dir, exist_ok=True)
+    launcher = os.path.join(run_dir, 'openfast_monitored.sh')
+    command = [sys.executable, os.path.abspath(__file__), '--exe', FAST_exe, '--limits', json.dumps(limits), \
+        '--margin', str(margin), '--poll-interval', str(poll_interval)]
+    if adaptive is not None:
+        command += ['--adaptive', json.dumps(adaptive)]
+    with open(launcher, 'w') as f:
+        f.write('#!/bin/sh\n')
+        f.write('exec {} "$@"\n'.format(' '.join(shlex.quote(arg) for arg in command)))
+    os.chmod(launcher, 0o755)
+    return launcher
+
+
+def read_stopped(fname, channels=None):
+    '''
+    Time series of a run that was stopped, as a dict like read_outb, with
+    the reason in 'stop'. 'stopped_early' is set for runs stopped on a limit,
+    not for converged ones. None if the run of fname (.out or .outb) wasn't
+    stopped.
+    '''
+    if not os.path.isfile(stop_file(fname)):
+        return None
+    with open(stop_file(fname)) as f:
+        stop = json.load(f)
+
+    tail = OutTail(os.path.splitext(fname)[0] + '.out')
+    rows = tail.read()
+    if tail.channels is None:
+        rows = np.zeros((0, 1))
+        tail.channels = ['Time']
+    if channels is None:
+        channels = tail.channels[1:]
+
+    out = {'Time': rows[:, 0]}
+    for chan in channels:
+        if chan in tail.channels:
+            out[chan] = rows[:, tail.channels.index(chan)]
+    out['stopped_early']    = stop.get('reason', 'limit') == 'limit'
+    out['stop']             = stop
+    return out
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run OpenFAST and stop it once a channel exceeds its limit.')
+    parser.add_argument('--exe', required=True, help='OpenFAST executable')
+    parser.add_argument('--limits', required=True, help='json dict of channel upper limits')
+    parser.add_argument('--margin', type=float, default=0.1, help='relative margin above the limits')
+    parser.add_argument('--poll-interval', type=float, default=1., help='seconds between checks of the output')
+    parser.add_argument('--adaptive', default=None, help='json dict of convergence settings, stops runs once the metrics converged')
+    parser.add_argument('FAST_InputFile')
+    args = parser.parse_args()
+
+    adaptive = json.loads(args.adaptive) if args.adaptive is not None else None
+    sys.exit(run_monitored(args.exe, args.FAST_InputFile, json.loads(args.limits), args.margin, args.poll_interval, adaptive))
@@ -0,0 +1,164 @@
+'''
+Level 2 solvers of the closed loop linear turbine
+
+The time domain solves of LinearTurbineModel.solve (solve_level2_cases) and of
+several controllers at once (solve_closed_loop_batch), the frequency domain
+metrics (solve_spectral_batch) and the operating point lookup they share. They
+only need the linear model and linear controllers, not the rest of WEIS, and run
+in the level 2 worker processes of MF_Turbine.
+'''
+import copy, functools
+import numpy as np
+import control as co
+from scipy.linalg import expm
+
+from .spectral import wind_spectrum, frequency_response, spectral_outputs
+from .op_table import OperatingPointTable
+
+
+# Linear model of a level 2 worker process, set by init_level2_worker
+_level2_worker = {}
+
+def init_level2_worker(linear_turbine):
+    _level2_worker['LinearTurbine'] = linear_turbine
+
+def solve_level2_task(solve,linConts,dist):
+    return solve(_level2_worker['LinearTurbine'],linConts,dist)
+
+def solve_level2_cases(LinearTurbine,linConts,dist):
+    # LinearTurbineModel.solve for each controller. solve keeps the operating point on the model,
+    # so it runs on a copy, which looks the operating point up in the table of the original model
+    source          = LinearTurbine
+    LinearTurbine   = copy.copy(source)
+    LinearTurbine.get_plant_op = functools.partial(get_plant_op, source)
+    return [LinearTurbine.solve(dist,Plot=False,open_loop=False,controller=linCont)[0] for linCont in linConts]
+
+def get_plant_op(LinearTurbine,u_h,reduce_states=False):
+    '''
+    LinearTurbineModel.get_plant_op, looked up in an OperatingPointTable of the
+    model that is built on first use, so the cost doesn't grow with the number
+    of linearization wind speeds. solve_level2_cases binds it to the models it
+    solves.
+    '''
+    table = getattr(LinearTurbine, 'op_table', None)
+    if table is None or not table.matches(LinearTurbine):
+        table = LinearTurbine.op_table = OperatingPointTable(LinearTurbine)
+
+    wind_speed_op = np.mean(u_h)
+    if table.clip(wind_speed_op) != wind_speed_op:
+        print('WARNING: Level 2 operating point {:.2f} m/s is outside of the linearized wind speeds, {} to {} m/s'.format( \
+            wind_speed_op, table.u_h[0], table.u_h[-1]))
+        wind_speed_op = float(table.clip(wind_speed_op))
+
+    op = table.interpolate(wind_speed_op)
+    P_op = co.StateSpace(op['A'], op['B'], op['C'], op['D'])
+    if reduce_states:
+        P_op = co.minreal(P_op, tol=1e-7, verbose=False)
+    P_op.InputName  = LinearTurbine.DescCntrlInpt
+    P_op.OutputName = LinearTurbine.DescOutput
+
+    ops = {}
+    ops['u']    = op['u'][LinearTurbine.ind_fast_inps]
+    ops['uh']   = wind_speed_op
+    ops['y']    = op['y'][LinearTurbine.ind_fast_outs]
+    ops['x']    = op['x']
+
+    return ops, P_op
+
+def solve_closed_loop_batch(LinearTurbine,linConts,dist):
+    '''
+    Closed loop response of the linear turbine to one disturbance, for each
+    linear controller in linConts. This is the first order hold integration of
+    control.forced_response, which LinearTurbineModel.solve uses, but the
+    closed loop systems are stacked so the time loop runs once for all of them.
+    '''
+    tt  = dist['Time']
+    u_h = dist['Wind']
+
+    # The plant operating point only depends on the mean wind. It's set on a copy of the
+    # model, which concurrent evaluations share
+    ops, P_op = get_plant_op(LinearTurbine, u_h)
+    LinearTurbine = copy.copy(LinearTurbine)
+    LinearTurbine.ops, LinearTurbine.P_op = ops, P_op
+    P_cls = [LinearTurbine.add_control(linCont) for linCont in linConts]
+
+    A = [np.asarray(P_cl.A) for P_cl in P_cls]
+    B = np.array([np.asarray(P_cl.B) for P_cl in P_cls])
+    C = np.array([np.asarray(P_cl.C) for P_cl in P_cls])
+    D = np.array([np.asarray(P_cl.D) for P_cl in P_cls])
+    n_sys, n_states, n_inputs = B.shape
+
+    # Linearized input, only the wind moves
+    u_lin = np.zeros((n_inputs, len(tt)))
+    indWind = LinearTurbine.DescCntrlInpt.index('IfW Extended input: horizontal wind speed (steady/uniform wind), m/s')
+    u_lin[indWind,:] = u_h - LinearTurbine.ops['uh']
+
+    # Discretize each system with the input interpolated linearly between time steps
+    dt = (tt[-1] - tt[0]) / (len(tt) - 1)
+    Ad  = np.zeros((n_sys, n_states, n_states))
+    Bd0 = np.zeros((n_sys, n_states, n_inputs))
+    Bd1 = np.zeros((n_sys, n_states, n_inputs))
+    for i_sys in range(n_sys):
+        M = np.block([[A[i_sys] * dt, B[i_sys] * dt, np.zeros((n_states, n_inputs))],
+                      [np.zeros((n_inputs, n_states + n_inputs)), np.identity(n_inputs)],
+                      [np.zeros((n_inputs, n_states + 2 * n_inputs))]])
+        expM = expm(M)
+        Ad[i_sys]  = expM[:n_states, :n_states]
+        Bd1[i_sys] = expM[:n_states, n_states+n_inputs:]
+        Bd0[i_sys] = expM[:n_states, n_states:n_states + n_inputs] - Bd1[i_sys]
+
+    # Input contribution of every step up front, then one stacked product per
+    # time step for all systems, which grows linearly with their number
+    Bu = (Bd0 @ u_lin[:,:-1] + Bd1 @ u_lin[:,1:]).transpose(2,0,1)
+    xx = np.zeros((len(tt), n_sys, n_states))
+    for i in range(1, len(tt)):
+        xx[i] = np.einsum('kij,kj->ki', Ad, xx[i-1]) + Bu[i-1]
+
+    # Outputs with the operating point added back, as in LinearTurbineModel.solve
+    y = np.einsum('kon,tkn->kot', C, xx) + D @ u_lin + LinearTurbine.ops['y'].reshape(-1, 1)
+    OutList = [out_name.split()[1][:-1] for out_name in P_cls[0].OutputName]
+
+    l2_outs = []
+    for i_sys in range(n_sys):
+        OutData = {}
+        for i, out_chan in enumerate(OutList):
+            OutData[out_chan] = y[i_sys, i, :]
+        OutData['Time'] = tt
+        l2_outs.append(OutData)
+
+    return l2_outs
+
+def solve_spectral_batch(LinearTurbine,linConts,dist):
+    '''
+    Level 2 metrics of one disturbance for each linear controller in linConts,
+    from the closed loop frequency response and the wind spectrum instead of a
+    time simulation. Returns the case metrics of each controller, see
+    spectral.spectral_outputs.
+    '''
+    tt  = dist['Time']
+    u_h = dist['Wind']
+
+    ops, P_op = get_plant_op(LinearTurbine, u_h)
+    LinearTurbine = copy.copy(LinearTurbine)
+    LinearTurbine.ops, LinearTurbine.P_op = ops, P_op
+    P_cls = [LinearTurbine.add_control(linCont) for linCont in linConts]
+
+    A = np.array([np.asarray(P_cl.A) for P_cl in P_cls])
+    B = np.array([np.asarray(P_cl.B) for P_cl in P_cls])
+    C = np.array([np.asarray(P_cl.C) for P_cl in P_cls])
+    D = np.array([np.asarray(P_cl.D) for P_cl in P_cls])
+
+    # Only the wind moves
+    indWind = LinearTurbine.DescCntrlInpt.index('IfW Extended input: horizontal wind speed (steady/uniform wind), m/s')
+    B, D    = B[:, :, [indWind]], D[:, :, [indWind]]
+    f, df, S_u = wind_spectrum(tt, u_h)
+    H       = frequency_response(A, B, C, D, f)[..., 0]
+
+    # Mean outputs: operating point plus the steady response to the mean wind offset
+    u_mean  = np.mean(u_h) - LinearTurbine.ops['uh']
+    H_0     = (C @ np.linalg.pinv(-A) @ B + D)[..., 0]
+    y_mean  = H_0 * u_mean + LinearTurbine.ops['y'].ravel()
+    OutList = [out_name.split()[1][:-1] for out_name in P_cls[0].OutputName]
+
+    duration = tt[-1] - tt[0]
+    return [spectral_outputs(OutList, f, df, H[i_sys], S_u, y_mean[i_sys], duration) for i_sys in range(len(P_cls))]
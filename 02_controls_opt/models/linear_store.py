@@ -0,0 +1,132 @@
+"""
+On-disk store of the linear turbine models used by Level 2.
+
+Each entry is one compressed `.npz` file holding the arrays of a parsed
+`LinearTurbineModel` (state space matrices at every wind speed, operating
+points, indices) plus a json entry with its descriptions and other plain
+attributes. Entries are named after a hash of everything the linearization
+depends on: every file of the OpenFAST model folder, the input file, the
+DOFs, the wind speeds, the linearization settings and the WEIS and ROSCO
+versions that linearize and parse it. Changing any of them gives a new entry
+instead of silently reusing a stale one.
+
+Every attribute of the model is stored, except the ones in `transient_names`.
+Saving raises if an attribute can't be stored, and entries that miss one of
+the `required_names` aren't loaded, so a loaded model has all it needs to solve.
+"""
+import os
+import json
+import hashlib
+import numpy as np
+
+from mf_utils.eval_cache import file_digest, update_hash, package_versions
+
+
+STORE_VERSION = 1
+
+# Attributes that only hold the state of the latest solve, or are rebuilt on use
+transient_names = ["ops", "P_op", "op_table"]
+
+# Attributes LinearTurbineModel.solve and add_control use
+required_names = [
+    "A_ops", "B_ops", "C_ops", "D_ops",
+    "u_ops", "y_ops", "x_ops", "u_h",
+    "ind_fast_inps", "ind_fast_outs",
+    "DescCntrlInpt", "DescStates", "DescOutput", "StateDerivOrder",
+]
+
+
+def model_tree_digest(directory):
+    """
+    Hash of the names and contents of all files below `directory`.
+    """
+    sha = hashlib.sha256()
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for fname in sorted(files):
+            path = os.path.join(root, fname)
+            sha.update(os.path.relpath(path, directory).encode())
+            sha.update(file_digest(path).encode())
+    return sha.hexdigest()
+
+
+def linearization_key(FAST_directory, FAST_InputFile, dofs, wind_speeds, settings):
+    """
+    Key of a linear model. `settings` is a dict with the linearization
+    settings that change the result, e.g. TMax and NLinTimes.
+    """
+    sha = hashlib.sha256()
+    sha.update(model_tree_digest(FAST_directory).encode())
+    versions = package_versions()
+    update_hash(sha, {
+        "versions": {name: versions[name] for name in ["weis", "rosco", "rosco_toolbox"]},
+        "FAST_InputFile": FAST_InputFile,
+        "dofs": list(dofs),
+        "wind_speeds": np.asarray(wind_speeds, dtype=float),
+        "settings": settings,
+    })
+    return sha.hexdigest()
+
+
+def linear_store_file(store_dir, key):
+    return os.path.join(store_dir, f"linear_model_{key[:24]}.npz")
+
+
+def save_linear_model(lin_model, fname):
+    """
+    Write the attributes of a linear model to `fname`. The file is moved into
+    place in one step, so other processes never read a partial entry. Raises
+    a ValueError if a required attribute is missing or an attribute can't be
+    stored.
+    """
+    missing = [name for name in required_names if not hasattr(lin_model, name)]
+    if missing:
+        raise ValueError(f"Linear model misses the attributes {missing}, it can't be stored")
+
+    arrays = {}
+    meta = {"version": STORE_VERSION, "attributes": {}}
+    for name, value in vars(lin_model).items():
+        if name in transient_names:
+            continue
+        if isinstance(value, np.ndarray):
+            arrays[name] = value
+            continue
+        try:
+            meta["attributes"][name] = json.loads(json.dumps(value, default=lambda v: v.item()))
+        except (TypeError, ValueError, AttributeError):
+            raise ValueError(
+                f"Attribute {name} of the linear model can't be stored, "
+                "add it to linear_store.transient_names if it's rebuilt on use"
+            )
+
+    os.makedirs(os.path.dirname(os.path.abspath(fname)), exist_ok=True)
+    tmp_file = f"{fname[:-4]}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(tmp_file, __meta__=np.array(json.dumps(meta)), **arrays)
+    os.replace(tmp_file, fname)
+
+
+def load_linear_model(fname, cls):
+    """
+    Rebuild a linear model of class `cls` from `fname` without calling its
+    constructor. Returns None if there is no entry, it has another version or
+    it misses a required attribute.
+    """
+    if not os.path.isfile(fname):
+        return None
+
+    with np.load(fname) as stored:
+        meta = json.loads(str(stored["__meta__"]))
+        if meta["version"] != STORE_VERSION:
+            return None
+
+        lin_model = cls.__new__(cls)
+        for name in stored.files:
+            if name != "__meta__":
+                setattr(lin_model, name, stored[name])
+
+    for name, value in meta["attributes"].items():
+        setattr(lin_model, name, value)
+
+    if any(not hasattr(lin_model, name) for name in required_names):
+        return None
+    return lin_model
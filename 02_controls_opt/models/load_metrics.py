@@ -0,0 +1,226 @@
+'''
+Streaming load metrics of Level 2 and Level 3 simulations
+
+LoadMetrics consumes the time series of all cases at once, either whole or in
+chunks as the simulations produce them, and keeps only running quantities:
+the rainflow residue and damage sum of the DEL channels and the count, mean,
+sum of squared deviations and maximum of the statistics channels. The cases
+are combined with probability weights, e.g. of the wind speeds and seeds.
+
+The DEL follows pCrunch's Loads_Analysis.get_DEL: full rainflow cycles of the
+whole series, the residue counted by repeating it once, and damage normalized
+with a fixed time t = 600 s. The cycle ranges are used as they are, without
+fatpack's 64 load classes and 100 range bins, so the DEL differs from pCrunch
+by that discretization (well below 1% for turbulent simulations).
+'''
+import numpy as np
+
+
+class RainflowCounter(object):
+    '''
+    Online 4-point rainflow counting of one time series with Woehler slope m.
+    update() can be called with any chunking, the result is the same.
+    '''
+
+    def __init__(self, m):
+        self.m              = m
+        self.residue        = []
+        self.candidate      = None      # last sample, becomes a reversal if the direction changes
+        self.damage         = 0.        # sum of range**m over the closed cycles
+        self.n_cycles       = 0
+
+    def update(self, y):
+        y = np.asarray(y, dtype=float).ravel()
+        if not len(y):
+            return
+
+        if not self.residue:
+            # The first sample is always a reversal
+            self.push(y[0])
+            y = y[1:]
+
+        # Find the reversals of the new samples, continuing from the last reversal
+        if self.candidate is None:
+            points = np.concatenate(([self.residue[-1]], y))
+        else:
+            points = np.concatenate(([self.residue[-1], self.candidate], y))
+        points = points[np.concatenate(([True], np.diff(points) != 0))]
+        if len(points) < 2:
+            self.candidate = None
+            return
+
+        rising = np.diff(points) > 0
+        for reversal in points[np.flatnonzero(rising[1:] != rising[:-1]) + 1]:
+            self.push(reversal)
+        self.candidate = points[-1]
+
+    def push(self, reversal):
+        residue = self.residue
+        residue.append(reversal)
+        while len(residue) >= 4:
+            dS1 = abs(residue[-3] - residue[-4])
+            dS2 = abs(residue[-2] - residue[-3])
+            dS3 = abs(residue[-1] - residue[-2])
+            if dS2 <= dS1 and dS2 <= dS3:
+                self.damage     += dS2 ** self.m
+                self.n_cycles   += 1
+                del residue[-3:-1]
+            else:
+                break
+
+    def total_damage(self):
+        '''
+        Damage of the closed cycles plus the cycles in the residue, which is
+        closed by repeating it. Doesn't change the state, so more samples can
+        follow.
+        '''
+        # Close the series with the last sample
+        last = RainflowCounter(self.m)
+        last.residue = list(self.residue)
+        if self.candidate is not None:
+            last.push(self.candidate)
+        if len(last.residue) < 2:
+            return self.damage + last.damage
+
+        # Join the residue with itself like fatpack.concatenate_reversals
+        R = np.array(last.residue)
+        t1 = (R[-1] - R[-2]) * (R[1] - R[0])
+        t2 = (R[-1] - R[-2]) * (R[0] - R[-1])
+        if t1 > 0 and t2 < 0:
+            repeated = np.concatenate((R, R))
+        elif t1 > 0:
+            repeated = np.concatenate((R[:-1], R[1:]))
+        elif t2 >= 0:
+            repeated = np.concatenate((R, R[1:]))
+        else:
+            repeated = np.concatenate((R[:-1], R))
+
+        counter = RainflowCounter(self.m)
+        for reversal in repeated:
+            counter.push(reversal)
+        return self.damage + last.damage + counter.damage
+
+
+class LoadMetrics(object):
+    '''
+    DELs, maxima and standard deviations of n_cases simulations.
+
+    del_channels is a list of (channel, Woehler slope) and stat_channels a list
+    of channels. weights are the probabilities of the cases, equal if None.
+    damage_scale multiplies the damage of each case, e.g. to scale runs that
+    were cut short to the full simulation length.
+    '''
+
+    def __init__(self, n_cases, weights=None, del_channels=[('TwrBsMyt',4)], stat_channels=['GenSpeed','PtfmPitch'], del_time=600.):
+        if weights is None:
+            weights = np.ones(n_cases)
+        weights = np.asarray(weights, dtype=float)
+        if weights.shape != (n_cases,):
+            raise ValueError('Expected {} case weights, got {}'.format(n_cases, weights.shape))
+
+        self.n_cases        = n_cases
+        self.weights        = weights / weights.sum()
+        self.del_channels   = list(del_channels)
+        self.stat_channels  = list(stat_channels)
+        self.del_time       = del_time
+        self.damage_scale   = np.ones(n_cases)
+
+        self.rainflow = {chan: [RainflowCounter(m) for _ in range(n_cases)] for chan, m in self.del_channels}
+        self.count  = {chan: np.zeros(n_cases) for chan in self.stat_channels}
+        self.mean   = {chan: np.zeros(n_cases) for chan in self.stat_channels}
+        self.M2     = {chan: np.zeros(n_cases) for chan in self.stat_channels}
+        self.max    = {chan: np.full(n_cases, -np.inf) for chan in self.stat_channels}
+
+    def update(self, chunk, cases=None):
+        '''
+        Add the next samples of some cases. chunk maps the channels to arrays
+        of shape (len(cases), n_samples), or (n_samples,) if cases is a single
+        index. cases defaults to all cases.
+        '''
+        if cases is None:
+            cases = np.arange(self.n_cases)
+        cases = np.atleast_1d(cases)
+
+        for chan, _ in self.del_channels:
+            data = np.asarray(chunk[chan], dtype=float).reshape(len(cases), -1)
+            for case, y in zip(cases, data):
+                self.rainflow[chan][case].update(y)
+
+        for chan in self.stat_channels:
+            data = np.asarray(chunk[chan], dtype=float).reshape(len(cases), -1)
+            if not data.shape[1]:
+                continue
+
+            # Merge the chunk statistics into the running ones (Chan et al.)
+            n_b     = data.shape[1]
+            mean_b  = data.mean(axis=1)
+            M2_b    = ((data - mean_b[:, None]) ** 2).sum(axis=1)
+            n_a     = self.count[chan][cases]
+            n       = n_a + n_b
+            delta   = mean_b - self.mean[chan][cases]
+
+            self.mean[chan][cases]  += delta * n_b / n
+            self.M2[chan][cases]    += M2_b + delta ** 2 * n_a * n_b / n
+            self.count[chan][cases]  = n
+            self.max[chan][cases]    = np.maximum(self.max[chan][cases], data.max(axis=1))
+
+    def update_outputs(self, levelX_out):
+        '''
+        Add complete time series, one output dict per case.
+        '''
+        channels = [chan for chan, _ in self.del_channels] + self.stat_channels
+        if len(set(len(lx_out[channels[0]]) for lx_out in levelX_out)) == 1:
+            self.update({chan: np.array([lx_out[chan] for lx_out in levelX_out]) for chan in channels}, np.arange(len(levelX_out)))
+        else:
+            for case, lx_out in enumerate(levelX_out):
+                self.update_case(case, lx_out)
+
+    def update_case(self, case, lx_out):
+        '''
+        Add the complete time series of one case, e.g. as its simulation finishes.
+        '''
+        channels = [chan for chan, _ in self.del_channels] + self.stat_channels
+        self.update({chan: lx_out[chan] for chan in channels}, case)
+
+    def update_max(self, case, maxima):
+        '''
+        Raise the maxima of one case to the ones in maxima, a dict per channel,
+        e.g. for samples that are left out of the other metrics.
+        '''
+        for chan in self.stat_channels:
+            if chan in maxima:
+                self.max[chan][case] = max(self.max[chan][case], maxima[chan])
+
+    def case_outputs(self):
+        '''
+        Metrics of every case, as arrays over the cases.
+        '''
+        outputs = {}
+        for chan, m in self.del_channels:
+            damage = np.array([counter.total_damage() for counter in self.rainflow[chan]]) * self.damage_scale
+            outputs[chan + '_DEL'] = (damage / self.del_time) ** (1. / m)
+        for chan in self.stat_channels:
+            outputs[chan + '_Max'] = self.max[chan].copy()
+            outputs[chan + '_Std'] = np.sqrt(self.M2[chan] / np.maximum(self.count[chan], 1))
+        return outputs
+
+    def outputs(self):
+        '''
+        Metrics over all cases, see combine_cases.
+        '''
+        return combine_cases(self.case_outputs(), self.weights, self.del_channels, self.stat_channels)
+
+
+def combine_cases(case_outputs, weights, del_channels, stat_channels):
+    '''
+    Metrics over all cases from the arrays of case_outputs: the DEL of the
+    probability weighted damage, the overall maximum and the standard
+    deviation of the weighted variances of the cases. weights sum to one.
+    '''
+    outputs = {}
+    for chan, m in del_channels:
+        outputs[chan + '_DEL'] = float(np.dot(weights, case_outputs[chan + '_DEL'] ** m) ** (1. / m))
+    for chan in stat_channels:
+        outputs[chan + '_Max'] = float(case_outputs[chan + '_Max'].max())
+        outputs[chan + '_Std'] = float(np.sqrt(np.dot(weights, case_outputs[chan + '_Std'] ** 2)))
+    return outputs
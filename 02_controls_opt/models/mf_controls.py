@@ -20,13 +20,13 @@ from weis.aeroelasticse.FAST_reader import InputReader_Common, InputReader_OpenF
 from weis.aeroelasticse.Util.FileTools import save_yaml, load_yaml
 from weis.aeroelasticse.LinearFAST import LinearFAST
 from weis.aeroelasticse.FAST_post   import FAST_IO_timeseries
-from pCrunch.Analysis import Loads_Analysis
 from weis.aeroelasticse.Turbsim_mdao.turbsim_file import TurbSimFile
 
 
 
 # weis control modules
 import weis.control.LinearModel as lin_mod
+import control as co
 
 
 # pCrunch Modules and instantiation
@@ -45,7 +45,30 @@ from pCrunch import Processing, Analysis
 
 
 import numpy as np
-import sys, os, platform, yaml
+import sys, os, platform, yaml, pickle, hashlib, copy, threading
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+
+from mf_utils.eval_cache import file_digest, update_hash
+from mf_utils.run_dirs import evaluation_dir, finish_evaluation_dir
+from .fast_output import OutbReader
+from .fast_monitor import write_launcher
+from .load_metrics import LoadMetrics, combine_cases
+from .model_reduction import reduce_linear_model
+from .level2_solvers import init_level2_worker, solve_level2_task, solve_level2_cases, solve_closed_loop_batch, \
+    solve_spectral_batch
+from .linear_store import linearization_key, linear_store_file, load_linear_model, save_linear_model, model_tree_digest
+
+# Snapshots of initialized MF_Turbine objects, see MF_Turbine.from_snapshot. Bump the version
+# whenever the attributes of MF_Turbine change
+SNAPSHOT_VERSION        = 7
+# Guards the tuning and level 3 case caches of MF_Turbine objects, which concurrent evaluations share
+_tuning_lock            = threading.RLock()
+
+# Attributes of tuned ROSCO controllers that the incremental retuning of MF_Turbine.tune uses. They are
+# internals of the ROSCO tuning, so every omega_pc gets a full tuning if a ROSCO version doesn't set them
+incremental_tuning_attrs = ['v_above_rated', 'A', 'B_beta', 'omega_pc_U', 'pc_gain_schedule']
+
+default_snapshot_file   = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'outputs', 'iea_semi', 'mf_turbine_snapshot.pkl')
 
 class MF_Turbine(object):
     '''
@@ -55,9 +78,12 @@ class MF_Turbine(object):
 
     Both models use the same wind inputs, via case_inputs, iec attributes
 
+    The turbine, controller, linear model and cases are the common definition. Evaluations
+    work on their own controller (see controller_for), case lists and run folders, so
+    level 2 and level 3 evaluations can run at the same time from threads or processes.
     '''
 
-    def __init__(self,level2_wind_speeds=[14,16,18],level3_wind_speeds=[16]):
+    def __init__(self,level2_wind_speeds=[14,16,18],level3_wind_speeds=[16],level3_seeds=[25]):
         # Turbine Model
         # Select Turbine Model
         import weis
@@ -72,12 +98,29 @@ class MF_Turbine(object):
         self.FAST_level2_directory  = os.path.join(output_dir,'outputs','iea_semi','level2')
         self.FAST_level3_directory  = os.path.join(output_dir,'outputs','iea_semi','level3')
 
+        # Store of linear models, reused instead of re-linearizing. Set to None to always linearize
+        self.linear_store_dir       = os.path.join(output_dir,'outputs','iea_semi','linear_store')
+
+        # Balanced truncation of the level 2 model after linearization, e.g. {'tol': 1e-3} or {'order': 12},
+        # see model_reduction.reduce_linear_model. None solves the full model
+        self.level2_reduction       = None
+
         # Parallel Processing
         self.n_cores            = 1
+        self.level3_max_jobs    = None      # concurrent level 3 OpenFAST jobs, None uses n_cores
+
+        # Clean up of the folders of the level 3 jobs once their outputs were read, "delete", "archive"
+        # or None to keep them, see mf_utils.run_dirs.finish_evaluation_dir
+        self.level3_cleanup     = "delete"
+
+        # Worker processes of the level 2 solves with n_cores > 1, started on first use, see level2_executor.
+        # Stop them with shutdown_level2_pool
+        self.level2_pool        = None
 
         # Set up common controller
         # Load controller from yaml file 
         parameter_filename  = os.path.join(weis_dir,'ROSCO_toolbox/Tune_Cases/IEA15MW.yaml')
+        self.parameter_filename = parameter_filename
         inps = yaml.safe_load(open(parameter_filename))
         path_params         = inps['path_params']
         turbine_params      = inps['turbine_params']
@@ -143,7 +186,7 @@ class MF_Turbine(object):
             level3_wind_speeds = [level3_wind_speeds]
 
         iec.dlc_inputs['DLC']   = [1.1]
-        iec.dlc_inputs['Seeds'] = [[25]]
+        iec.dlc_inputs['Seeds'] = [level3_seeds]
         iec.dlc_inputs['U']     = [level3_wind_speeds]
         
         iec.dlc_inputs['Yaw']   = [[]]
@@ -220,9 +263,104 @@ class MF_Turbine(object):
         # Save shared info to MF_Turbine
         self.iec                    = iec
         self.channels               = channels
+
+        # Channels read back from the level 3 outputs (None reads all of them), and whether OpenFAST
+        # only writes those, plus the channels of the metrics and stop limits, see level3_outlist
+        self.level3_channels        = ['TwrBsMyt','GenSpeed','PtfmPitch']
+        self.trim_outlist           = False
+        self.model_outlist          = None      # OutList channels of the OpenFAST model, read on first use
+
+        # Upper limits of level 3 channels, e.g. {'GenSpeed': 9., 'PtfmPitch': 5.}. Runs are stopped once
+        # a channel exceeds its limit by more than the relative margin. None runs the full simulations.
+        # The maxima of stopped runs already violate the limits, their damage is extrapolated to the full
+        # simulation, and the DELs and standard deviations of their omega_pc are multiplied by the penalty
+        self.level3_stop_limits     = None
+        self.level3_stop_margin     = 0.1
+        self.level3_stop_penalty    = 1.5
+
+        # Adaptive level 3 simulation length, e.g. {'tol': 0.05}, see convergence.default_settings. Runs are
+        # stopped once the confidence intervals of the DELs and standard deviations are within tol and TMax
+        # is only the longest run. The initial transient is found from the channels and left out of those
+        # metrics. None runs TMax
+        self.level3_adaptive        = None
+
+        # Channels whose level 3 maxima are optimization constraints. Maxima are taken over the whole run,
+        # and adaptive runs aren't stopped early while there are any, so they match runs of length TMax
+        self.level3_max_constraints = ['GenSpeed','PtfmPitch']
         self.level3_wind_speeds     = level3_wind_speeds
         self.level2_wind_speeds     = level2_wind_speeds
 
+        # Probability of each case in case_list when combining their outputs, None weights them equally
+        self.case_weights           = None
+
+        # Incremental retuning for new omega_pc values, see tune and gen_level3_cases. Switched off
+        # if this ROSCO version doesn't support it
+        self.incremental_tuning     = True
+        self.tuning_base            = None
+        self.pc_gain_cache          = {}
+        self.level3_case_base       = None
+
+    @classmethod
+    def from_snapshot(cls,fname=None,level2_wind_speeds=[14,16,18],level3_wind_speeds=[16],level3_seeds=[25]):
+        '''
+        Restore an MF_Turbine from a snapshot of a fully initialized one, which skips
+        the ROSCO tuning, loading the OpenFAST model and the case generation.
+
+        The snapshot is only used if the ROSCO tuning yaml, the OpenFAST model files,
+        the modules of this package, the wind files, the wind speeds and the seeds are
+        unchanged. Otherwise the turbine is built as usual and a new snapshot is saved.
+        '''
+        if fname is None:
+            fname = default_snapshot_file
+
+        args = {'level2_wind_speeds': level2_wind_speeds, 'level3_wind_speeds': level3_wind_speeds, 'level3_seeds': level3_seeds}
+        if os.path.isfile(fname):
+            with open(fname, 'rb') as f:
+                snapshot = pickle.load(f)
+
+            if snapshot['version'] == SNAPSHOT_VERSION and snapshot['args'] == args:
+                mf_turb = cls.__new__(cls)
+                mf_turb.__dict__.update(snapshot['state'])
+                mf_turb.level2_pool = None
+                if mf_turb.snapshot_sources() == snapshot['sources']:
+                    return mf_turb
+
+        mf_turb = cls(level2_wind_speeds,level3_wind_speeds,level3_seeds)
+        try:
+            mf_turb.save_snapshot(fname,args)
+        except (pickle.PicklingError, TypeError, AttributeError, OSError) as e:
+            print('WARNING: could not save MF_Turbine snapshot:', e)
+        return mf_turb
+
+    def save_snapshot(self,fname,args):
+        snapshot = {}
+        snapshot['version']     = SNAPSHOT_VERSION
+        snapshot['args']        = args
+        snapshot['sources']     = self.snapshot_sources()
+        snapshot['state']       = {key: value for key, value in self.__dict__.items() if key != 'level2_pool'}
+
+        # Write to a temporary file first, so other processes never load a partial snapshot
+        os.makedirs(os.path.dirname(os.path.abspath(fname)), exist_ok=True)
+        tmp_file = '{}.{}.tmp'.format(fname, os.getpid())
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, fname)
+
+    def snapshot_sources(self):
+        '''
+        Digests of the files the initialized state depends on, and which wind files exist.
+        The pickled state also holds objects of the other modules of this package, e.g. the
+        linear model tables, so all of them are included
+        '''
+        package_dir = os.path.dirname(os.path.abspath(__file__))
+        sources = {}
+        sources['parameter_file']   = file_digest(self.parameter_filename)
+        sources['fast_model']       = model_tree_digest(self.FAST_directory)
+        sources['code']             = {fname: file_digest(os.path.join(package_dir, fname)) \
+            for fname in sorted(os.listdir(package_dir)) if fname.endswith('.py')}
+        sources['wind_files']       = [os.path.isfile(case[('InflowWind','FileName_BTS')]) for case in self.case_list]
+        return sources
+
     def compare(self,dofs,overwrite=True):
         ''' 
         Compare level 2 and 3 timeseries, for debugging purposes
@@ -231,19 +369,16 @@ class MF_Turbine(object):
         self.gen_level2_model(dofs, overwrite)
 
         # Extract disturbance
-        dist = []
-        for case in self.case_list:
-            ts_file     = TurbSimFile(case[('InflowWind','FileName_BTS')])
-            ts_file.compute_rot_avg(self.iec.D/2)
-            u_h         = ts_file['rot_avg'][0,:]
-            tt          = ts_file['t']
-            dist.append({'Time':tt, 'Wind': u_h})
+        dist = [load_disturbance(case[('InflowWind','FileName_BTS')], self.iec.D/2) for case in self.case_list]
 
         # Run level 2
         self.run_level2(self.controller,dist)
 
-        # Run level 3
+        # Run level 3, reading every channel for the plots
+        level3_channels         = self.level3_channels
+        self.level3_channels    = None
         self.run_level3(self.controller, overwrite)
+        self.level3_channels    = level3_channels
 
         # comparison plot, used to be in Level 2, not sure if information is here
         if True:
@@ -287,6 +422,10 @@ class MF_Turbine(object):
                     - FlapDOF1, FlapDOF2, EdgeDOF, TeetDOF, DrTrDOF, GenDOF, YawDOF
                     - TwFADOF1, TwFADOF2, TwSSDOF1, TwSSDOF2,
                     - PtfmSgDOF, PtfmSwDOF, PtfmHvDOF, PtfmRDOF, PtfmPDOF, PtfmYDOF
+
+            The linear model is loaded from linear_store_dir when the same OpenFAST model, dofs,
+            wind speeds and settings were linearized before, and saved there otherwise.
+            The store keeps the full model, it's reduced afterwards if level2_reduction is set.
         '''
         lin_fast = LinearFAST(FAST_ver='OpenFAST', dev_branch=True)
 
@@ -314,6 +453,16 @@ class MF_Turbine(object):
 
         # overwrite steady & linearizations
         lin_fast.overwrite        = overwrite           # for debugging only
+
+        # Reuse a linear model of the same turbine and settings if there is one
+        if self.linear_store_dir is not None:
+            settings = {'v_rated': lin_fast.v_rated, 'TMax': lin_fast.TMax, 'NLinTimes': lin_fast.NLinTimes}
+            key = linearization_key(self.FAST_directory, self.FAST_InputFile, dofs, lin_fast.wind_speeds, settings)
+            store_file = linear_store_file(self.linear_store_dir, key)
+            self.LinearTurbine = load_linear_model(store_file, lin_mod.LinearTurbineModel)
+            if self.LinearTurbine is not None:
+                self.reduce_level2_model()
+                return
         
         # run OpenFAST linearizations
         lin_fast.gen_linear_model()
@@ -324,18 +473,290 @@ class MF_Turbine(object):
             lin_fast.NLinTimes,
             )
 
+        if self.linear_store_dir is not None:
+            try:
+                save_linear_model(self.LinearTurbine, store_file)
+            except (ValueError, OSError) as e:
+                print('WARNING: could not store the linear model:', e)
+
+        self.reduce_level2_model()
+
+    def reduce_level2_model(self):
+        '''
+        Reduce the states of the linear model with balanced truncation, if level2_reduction
+        is set. The full model is kept as LinearTurbine_full. Returns the reduction details
+        (see model_reduction.reduce_linear_model), or None.
+        '''
+        self.LinearTurbine_full = self.LinearTurbine
+        if self.level2_reduction is None:
+            return None
+
+        self.LinearTurbine = reduce_linear_model(self.LinearTurbine_full, **self.level2_reduction)
+        return self.LinearTurbine.reduction
+
+    def check_level2_reduction(self,disturbance):
+        '''
+        Level 2 metrics of the current controller with the reduced and the full linear model,
+        and the relative error of each metric. Returns a dict with 'outputs' of both models
+        and 'rel_error', which is also kept as level2_reduction_check.
+        '''
+        linCont = lin_mod.LinearControlModel(self.controller_for(self.controller.omega_pc))
+
+        outputs = {}
+        for model, LinearTurbine in [('full', self.LinearTurbine_full), ('reduced', self.LinearTurbine)]:
+            level2_out      = [solve_closed_loop_batch(LinearTurbine,[linCont],dist)[0] for dist in disturbance]
+            outputs[model]  = compute_outputs(level2_out,self.case_weights)
+
+        rel_error = {}
+        for key, value in outputs['full'].items():
+            rel_error[key] = abs(outputs['reduced'][key] - value) / max(abs(value), 1e-12)
+
+        self.level2_reduction_check = {'outputs': outputs, 'rel_error': rel_error, 'omega_pc': self.controller.omega_pc}
+        return self.level2_reduction_check
+
+    def level2_executor(self):
+        '''
+        Process pool of the level 2 solves, or None with n_cores = 1. The workers get the
+        linear model once, when the pool starts, and the pool is restarted when the model
+        or n_cores changes.
+        '''
+        if self.n_cores <= 1:
+            return None
+
+        with _tuning_lock:
+            pool = self.level2_pool
+            if pool is not None and (pool['model'] is not self.LinearTurbine or pool['n_workers'] != self.n_cores):
+                self.shutdown_level2_pool()
+            if self.level2_pool is None:
+                executor = ProcessPoolExecutor(max_workers=self.n_cores, initializer=init_level2_worker, \
+                    initargs=(self.LinearTurbine,))
+                self.level2_pool = {'executor': executor, 'model': self.LinearTurbine, 'n_workers': self.n_cores}
+            return self.level2_pool['executor']
+
+    def shutdown_level2_pool(self):
+        '''
+        Stop the level 2 worker processes. They are started again when needed.
+        '''
+        with _tuning_lock:
+            if self.level2_pool is not None:
+                self.level2_pool['executor'].shutdown()
+                self.level2_pool = None
+
+    def map_level2(self,solve,linConts,disturbance):
+        '''
+        solve(LinearTurbine,linConts,dist) for each disturbance, on the level 2 pool with
+        n_cores > 1. With fewer disturbances than workers, the controllers are split over
+        the workers too. Returns the outputs per disturbance, one per controller.
+        '''
+        executor = self.level2_executor()
+        if executor is None:
+            return [solve(self.LinearTurbine,linConts,dist) for dist in disturbance]
+
+        n_chunks    = max(1, min(len(linConts), self.n_cores // len(disturbance)))
+        chunks      = np.array_split(np.arange(len(linConts)), n_chunks)
+        futures     = [[executor.submit(solve_level2_task, solve, [linConts[i] for i in chunk], dist) \
+            for chunk in chunks] for dist in disturbance]
+        return [[out for future in dist_futures for out in future.result()] for dist_futures in futures]
+
     def run_level2(self,controller,disturbance):
-        controller.tune_controller(self.turbine)
+        '''
+        Run the linear model for each disturbance. The cases are independent, so
+        with n_cores > 1 they're spread over the level 2 pool. Returns the outputs in
+        the order of disturbance, which are also kept as level2_out for inspection.
+        '''
+        self.tune(controller)
         linCont             = lin_mod.LinearControlModel(controller)
-        self.level2_out     = []
-        for dist in disturbance:
-            l2_out, _, P_cl = self.LinearTurbine.solve(dist,Plot=False,open_loop=False,controller=linCont)
-            self.level2_out.append(l2_out)
 
+        level2_out          = [l2_outs[0] for l2_outs in self.map_level2(solve_level2_cases,[linCont],disturbance)]
+        self.level2_out     = level2_out
+        return level2_out
+
+
+    def run_level2_batch(self,controller,disturbance,omega_pcs):
+        '''
+        Run the linear model for several pitch controller bandwidths at once.
+        Returns one list of outputs per omega_pc, in the order of disturbance.
+        controller is only copied, see controller_for.
+        '''
+        linConts = [lin_mod.LinearControlModel(self.controller_for(omega_pc,controller)) for omega_pc in omega_pcs]
+        dist_outs = self.map_level2(solve_closed_loop_batch,linConts,disturbance)
+
+        # Regroup from per disturbance to per omega_pc
+        return [[l2_outs[i] for l2_outs in dist_outs] for i in range(len(omega_pcs))]
+
+    def run_level2_spectral(self,controller,disturbance,omega_pcs):
+        '''
+        Level 2 metrics of each disturbance in the frequency domain, see
+        solve_spectral_batch. Returns one list of case metrics per omega_pc,
+        in the order of disturbance.
+        '''
+        linConts = [lin_mod.LinearControlModel(self.controller_for(omega_pc,controller)) for omega_pc in omega_pcs]
+        dist_outs = self.map_level2(solve_spectral_batch,linConts,disturbance)
+
+        return [[case_outs[i] for case_outs in dist_outs] for i in range(len(omega_pcs))]
 
     def run_level3(self,controller,overwrite=True):
-        controller.tune_controller(self.turbine)
         # Run FAST cases
+        case_list, case_name_list, dlc_list = self.gen_level3_cases(controller)
+        fastBatch = self.setup_level3_batch(case_list,case_name_list,self.FAST_level3_directory,overwrite)
+
+        if self.n_cores == 1:
+            out = fastBatch.run_serial()
+        else:
+            out = fastBatch.run_multi(cores=self.n_cores)
+
+        self.level3_batch   = fastBatch
+        self.level3_out     = out
+
+    def tune(self,controller):
+        '''
+        Tune the controller for its current omega_pc.
+
+        Of the whole ROSCO tuning, only the pitch controller gain schedule depends on
+        omega_pc. After one full tuning of a controller, new omega_pc values only
+        recompute that schedule from the plant (A, B_beta) of the full tuning, and the
+        schedules are cached per omega_pc. Scheduled omega_pc or zeta_pc, another
+        controller or another zeta_pc get a full tuning. After changing any other
+        controller parameter, set tuning_base to None. Copies made by controller_for
+        share the tuning of the controller they were copied from.
+
+        The plant and the schedule are internals of the ROSCO tuning. If the tuned
+        controller lacks any of incremental_tuning_attrs, or the first incremental
+        schedule doesn't match a full tuning, incremental_tuning is switched off and
+        every omega_pc gets a full tuning.
+        '''
+        with _tuning_lock:
+            omega_pc    = np.squeeze(controller.omega_pc)
+            source      = getattr(controller, 'tuned_from', controller)
+            base        = self.tuning_base
+            if not self.incremental_tuning or base is None or base['controller'] is not source or np.ndim(omega_pc) or \
+                np.ndim(controller.zeta_pc) or base['zeta_pc'] != controller.zeta_pc:
+                controller.tune_controller(self.turbine)
+                self.pc_gain_cache = {}
+                if not self.incremental_tuning or np.ndim(omega_pc) or np.ndim(controller.zeta_pc):
+                    self.tuning_base = None
+                    return
+
+                missing = [attr for attr in incremental_tuning_attrs if not hasattr(controller, attr)]
+                if missing:
+                    print('WARNING: the ROSCO controller has no {}, every omega_pc gets a full tuning'.format(', '.join(missing)))
+                    self.incremental_tuning = False
+                    self.tuning_base        = None
+                    return
+
+                # Plant of the above rated operating points, as used for the pitch gain schedule
+                n_pc = len(controller.v_above_rated) - 1
+                self.tuning_base = {
+                    'controller':   source,
+                    'zeta_pc':      controller.zeta_pc,
+                    'v':            controller.v_above_rated[1:],
+                    'A_pc':         controller.A[-n_pc:],
+                    'B_beta_pc':    controller.B_beta[-n_pc:],
+                    'checked':      False,
+                    }
+                self.pc_gain_cache[float(omega_pc)] = (controller.omega_pc_U, controller.pc_gain_schedule)
+                return
+
+            if float(omega_pc) not in self.pc_gain_cache:
+                omega_pc_U  = float(omega_pc) * np.ones(len(base['v']))
+                zeta_pc_U   = base['zeta_pc'] * np.ones(len(base['v']))
+                pc_gain_schedule = ROSCO_controller.ControllerTypes()
+                pc_gain_schedule.second_order_PI(zeta_pc_U,omega_pc_U,base['A_pc'],base['B_beta_pc'],linearize=True,v=base['v'])
+
+                # Compare the first incremental schedule of a tuning to a full tuning
+                if not base['checked']:
+                    base['checked'] = True
+                    if not self.check_incremental_tuning(controller,pc_gain_schedule):
+                        print('WARNING: the incremental pitch controller tuning differs from a full ROSCO tuning, every omega_pc gets a full tuning')
+                        self.incremental_tuning = False
+                        self.tuning_base        = None
+                        self.pc_gain_cache      = {}
+                        controller.tune_controller(self.turbine)
+                        return
+
+                self.pc_gain_cache[float(omega_pc)] = (omega_pc_U, pc_gain_schedule)
+
+            # New objects every time, linear controller models keep references to the old ones
+            omega_pc_U, pc_gain_schedule        = self.pc_gain_cache[float(omega_pc)]
+            controller.omega_pc_U               = omega_pc_U.copy()
+            controller.pc_gain_schedule         = ROSCO_controller.ControllerTypes()
+            controller.pc_gain_schedule.Kp      = pc_gain_schedule.Kp.copy()
+            controller.pc_gain_schedule.Ki      = pc_gain_schedule.Ki.copy()
+
+    def check_incremental_tuning(self,controller,pc_gain_schedule,rtol=1e-8):
+        '''
+        Whether the pitch controller gains of pc_gain_schedule match a full tuning of
+        (a copy of) controller
+        '''
+        full = copy.copy(controller)
+        full.tune_controller(self.turbine)
+        return np.allclose(pc_gain_schedule.Kp, full.pc_gain_schedule.Kp, rtol=rtol, atol=0) and \
+            np.allclose(pc_gain_schedule.Ki, full.pc_gain_schedule.Ki, rtol=rtol, atol=0)
+
+    def controller_for(self,omega_pc,controller=None):
+        '''
+        Copy of controller (default: the common controller) tuned for omega_pc, for one
+        evaluation. Tuning only assigns new attributes to the copy, so the common
+        controller isn't changed.
+        '''
+        if controller is None:
+            controller = self.controller
+
+        copied              = copy.copy(controller)
+        copied.tuned_from   = getattr(controller, 'tuned_from', controller)
+        copied.omega_pc     = omega_pc
+        self.tune(copied)
+        return copied
+
+    def gen_level3_cases(self,controller):
+        '''
+        Tune the controller and generate the level 3 cases (wind speeds and seeds) with it.
+
+        The case list is generated once. Later calls with the same case inputs only copy it
+        and patch the DISCON entries that differ from the ones it was generated with,
+        which for a new omega_pc are the pitch controller gains. case_inputs isn't changed,
+        the cases of each call are its own.
+        '''
+        self.tune(controller)
+
+        # Monitored runs need the text output, which is written while OpenFAST runs
+        monitored = self.level3_stop_limits is not None or self.level3_adaptive is not None
+        case_inputs = dict(self.case_inputs)
+        case_inputs[("Fst","OutFileFmt")] = {'vals':[3 if monitored else 2], 'group':0}
+
+        # Set control parameters
+        discon_vt = ROSCO_utilities.DISCON_dict(self.turbine,controller)
+
+        # Everything but the controller parameters decides whether the cases can be reused
+        sha = hashlib.sha256()
+        update_hash(sha, {key: val for key, val in case_inputs.items() if key[0] != 'DISCON_in'})
+        signature = sha.hexdigest()
+
+        with _tuning_lock:
+            base = self.level3_case_base
+            if base is None or base['signature'] != signature:
+                for discon_input in discon_vt:
+                    case_inputs[('DISCON_in',discon_input)] = {'vals': [discon_vt[discon_input]], 'group': 0}
+                case_list, case_name_list, dlc_list = self.iec.execute(case_inputs=case_inputs)
+                self.level3_case_base = {'signature': signature, 'discon': discon_vt, \
+                    'case_list': case_list, 'case_name_list': case_name_list, 'dlc_list': dlc_list}
+                return [dict(case) for case in case_list], list(case_name_list), list(dlc_list)
+
+        # Patch the changed DISCON entries into copies of the cases
+        patch = {}
+        for discon_input in discon_vt:
+            if discon_input not in base['discon'] or not values_equal(discon_vt[discon_input], base['discon'][discon_input]):
+                patch[('DISCON_in',discon_input)] = discon_vt[discon_input]
+
+        case_list = []
+        for base_case in base['case_list']:
+            case = dict(base_case)
+            case.update(patch)
+            case_list.append(case)
+
+        return case_list, list(base['case_name_list']), list(base['dlc_list'])
+
+    def setup_level3_batch(self,case_list,case_name_list,run_dir,overwrite=True):
         fastBatch                   = runFAST_pywrapper_batch(FAST_ver='OpenFAST',dev_branch = True)
         
         # Select Turbine Model
@@ -344,27 +765,211 @@ class MF_Turbine(object):
 
         fastBatch.debug_level       = 2
         fastBatch.overwrite_outfiles = overwrite        # for debugging purposes
-        
-        # Set control parameters
-        discon_vt = ROSCO_utilities.DISCON_dict(self.turbine,controller)
-        for discon_input in discon_vt:
-            self.case_inputs[('DISCON_in',discon_input)] = {'vals': [discon_vt[discon_input]], 'group': 0}
-            
-        self.case_list, self.case_name_list, self.dlc_list = self.iec.execute(case_inputs=self.case_inputs)
-        
-        fastBatch.case_list         = self.case_list
-        fastBatch.case_name_list    = self.case_name_list
-        fastBatch.channels          = self.channels
-        fastBatch.FAST_runDirectory = self.FAST_level3_directory
-        fastBatch.post              = FAST_IO_timeseries
 
-        if self.n_cores == 1:
-            out = fastBatch.run_serial()
+        monitored = self.level3_stop_limits is not None or self.level3_adaptive is not None
+        fastBatch.case_list         = case_list
+        fastBatch.case_name_list    = case_name_list
+        if self.trim_outlist and self.level3_channels is not None:
+            fastBatch.channels      = self.level3_outlist()
         else:
-            out = fastBatch.run_multi(cores=self.n_cores)
+            fastBatch.channels      = self.channels
+        fastBatch.FAST_runDirectory = run_dir
+        fastBatch.post              = OutbReader(self.level3_channels, fallback=FAST_IO_timeseries, monitored=monitored)
 
-        self.level3_batch   = fastBatch
-        self.level3_out     = out
+        if monitored:
+            # Run OpenFAST through a launcher that stops runs out of bounds or once the metrics converged
+            fastBatch.FAST_exe      = write_launcher(run_dir, fastBatch.FAST_exe, \
+                self.level3_stop_limits or {}, self.level3_stop_margin, adaptive=self.adaptive_settings())
+
+        return fastBatch
+
+    def level3_outlist(self):
+        '''
+        Channels for runFAST_pywrapper_batch that restrict the OutList to level3_channels and the
+        channels of the metrics and stop limits. runFAST_pywrapper only changes the channels it's
+        given, so every other channel of the model's OutList is switched off explicitly
+        '''
+        metrics = new_metrics(1)
+        keep    = set(self.level3_channels) | set(self.level3_stop_limits or [])
+        keep.update([chan for chan, _ in metrics.del_channels] + metrics.stat_channels)
+
+        if self.model_outlist is None:
+            reader                  = InputReader_OpenFAST(FAST_ver='OpenFAST', dev_branch=True)
+            reader.FAST_InputFile   = self.FAST_InputFile
+            reader.FAST_directory   = self.FAST_directory
+            reader.execute()
+            self.model_outlist      = outlist_channels(reader.fst_vt['outlist'])
+
+        channels = {chan: False for chan in self.model_outlist}
+        channels.update({chan: True for chan in keep})
+        return channels
+
+    def adaptive_settings(self):
+        # Convergence settings of level 3 runs, for the metrics of new_metrics
+        if self.level3_adaptive is None:
+            return None
+        metrics = new_metrics(1)
+        settings = {'del_channels': [list(chan) for chan in metrics.del_channels], 'stat_channels': metrics.stat_channels, \
+            'max_channels': list(self.level3_max_constraints)}
+        settings.update(self.level3_adaptive)
+        return settings
+
+    def run_level3_jobs(self,controller,omega_pcs,max_jobs=None,retries=1):
+        '''
+        Run the level 3 cases (wind speeds and seeds) of all omega_pcs as independent OpenFAST
+        jobs, at most max_jobs (default n_cores) at a time. Each result goes into the metrics
+        of its omega_pc as soon as it's done, and failed jobs are resubmitted up to retries
+        times. Returns the outputs per omega_pc, like compute_outputs. controller is only
+        copied, see controller_for.
+
+        The time series are kept in level3_outs, a list of the cases per omega_pc, for
+        inspection, and level3_stopped tells which omega_pcs had runs stopped on a limit.
+        With concurrent calls that's the one that finished last.
+        '''
+        if max_jobs is None:
+            max_jobs = self.n_cores
+
+        # 1. One job per case and omega_pc. The runs of each omega_pc get their own folder, per
+        # process and thread, so concurrent evaluations don't overwrite each other's files. The
+        # folder is cleaned up once all of its jobs are read, see level3_cleanup
+        jobs        = []
+        run_jobs    = {}
+        for i_pc, omega_pc in enumerate(omega_pcs):
+            case_list, case_name_list, _ = self.gen_level3_cases(self.controller_for(omega_pc,controller))
+            run_dir = evaluation_dir(self.FAST_level3_directory, 'omega_pc', {'omega_pc': float(np.squeeze(omega_pc))}, \
+                '{}_{}'.format(os.getpid(), threading.get_ident()))
+            run_jobs[run_dir] = run_jobs.get(run_dir, 0) + len(case_list)
+
+            for i_case, (case, case_name) in enumerate(zip(case_list,case_name_list)):
+                job = {'omega_pc': i_pc, 'case': i_case, 'name': case_name, 'attempt': 0, 'run_dir': run_dir}
+                job['batch'] = self.setup_level3_batch([case],[case_name],run_dir)
+                jobs.append(job)
+
+        n_cases     = len(jobs) // len(omega_pcs)
+        metrics     = [new_metrics(n_cases,self.case_weights) for _ in omega_pcs]
+        level3_outs = [[None] * n_cases for _ in omega_pcs]
+
+        # 2. Run the jobs, in this process if there is a single worker
+        n_workers = min(max_jobs, len(jobs))
+        executor  = ProcessPoolExecutor(max_workers=n_workers) if n_workers > 1 else None
+
+        def submit(job):
+            if executor is not None:
+                return executor.submit(run_level3_job, job['batch'])
+            future = Future()
+            try:
+                future.set_result(run_level3_job(job['batch']))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        try:
+            pending = {submit(job): job for job in jobs}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = pending.pop(future)
+                    try:
+                        l3_out = future.result()
+                    except Exception as e:
+                        if job['attempt'] >= retries:
+                            raise
+                        job['attempt'] += 1
+                        print('Level 3 job {} failed ({}), retry {} of {}'.format(job['name'], e, job['attempt'], retries))
+                        pending[submit(job)] = job
+                        continue
+
+                    # 3. Stream the result into the metrics of its omega_pc. Damage of adaptive and stopped
+                    # runs is scaled to the full simulation, like the damage rate they were converged on, and
+                    # the maxima of adaptive runs include the transient, like those of runs that aren't adaptive
+                    if 'transient' in l3_out or l3_out.get('stopped_early', False):
+                        case = job['batch'].case_list[0]
+                        full = case.get(("Fst","TMax"), self.case_inputs[("Fst","TMax")]['vals'][0]) - \
+                            case.get(("Fst","TStart"), self.case_inputs[("Fst","TStart")]['vals'][0])
+                        metrics[job['omega_pc']].damage_scale[job['case']] = full / max(l3_out['Time'][-1] - l3_out['Time'][0], 1e-6)
+                        metrics[job['omega_pc']].update_max(job['case'], l3_out.get('untrimmed_max', {}))
+                    metrics[job['omega_pc']].update_case(job['case'], l3_out)
+                    level3_outs[job['omega_pc']][job['case']] = l3_out
+
+                    run_jobs[job['run_dir']] -= 1
+                    if run_jobs[job['run_dir']] == 0:
+                        finish_evaluation_dir(job['run_dir'], self.level3_cleanup)
+        finally:
+            if executor is not None:
+                for future in pending:
+                    future.cancel()
+                executor.shutdown()
+
+        # Runs stopped on a limit violation are infeasible: their maxima already exceed the limit. Their other
+        # outputs only cover part of the simulation, so those of their omega_pc get level3_stop_penalty
+        outputs = []
+        stopped = []
+        for pc_metrics, pc_outs in zip(metrics, level3_outs):
+            pc_outputs = pc_metrics.outputs()
+            stopped.append(any(l3_out.get('stopped_early', False) for l3_out in pc_outs))
+            if stopped[-1]:
+                for key in pc_outputs:
+                    if key.endswith(('_DEL', '_Std')):
+                        pc_outputs[key] *= self.level3_stop_penalty
+            outputs.append(pc_outputs)
+
+        self.level3_stopped = stopped
+        self.level3_outs    = level3_outs
+        self.level3_out     = level3_outs[-1]
+        return outputs
+
+
+def values_equal(a,b):
+    # DISCON values are numbers, strings, lists or arrays
+    try:
+        return np.array_equal(np.asarray(a),np.asarray(b))
+    except (TypeError, ValueError):
+        return a == b
+
+
+def outlist_channels(outlist):
+    # Names of the channels in a nested fst_vt['outlist'] dict
+    channels = []
+    for key, val in outlist.items():
+        if isinstance(val, dict):
+            channels += outlist_channels(val)
+        else:
+            channels.append(key)
+    return channels
+
+
+def run_level3_job(fastBatch):
+    # One level 3 case, in a worker process of run_level3_jobs
+    return fastBatch.run_serial()[0]
+
+
+def load_disturbance(bts_file,R):
+    '''
+    Rotor averaged wind speed of a TurbSim file, for a rotor of radius R.
+
+    Reading and reducing the full turbulence grid is slow, so the result is
+    saved next to the wind file, keyed on a hash of the wind file and on R.
+    If that folder isn't writable the disturbance is just not cached.
+    '''
+    cache_file = '{}.rot_avg_{}_R{:g}.npz'.format(bts_file, file_digest(bts_file)[:16], R)
+    if os.path.isfile(cache_file):
+        with np.load(cache_file) as cached:
+            return {'Time': cached['Time'], 'Wind': cached['Wind']}
+
+    ts_file     = TurbSimFile(bts_file)
+    ts_file.compute_rot_avg(R)
+    u_h         = ts_file['rot_avg'][0,:]
+    tt          = ts_file['t']
+
+    # Write to a temporary file first, so concurrent processes never read a partial file
+    try:
+        tmp_file = '{}.{}.tmp.npz'.format(cache_file[:-4], os.getpid())
+        np.savez(tmp_file, Time=tt, Wind=u_h)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+
+    return {'Time':tt, 'Wind': u_h}
 
 
 class Level3_Turbine(object):
@@ -373,16 +978,24 @@ class Level3_Turbine(object):
         self.mf_turb = mf_turb
 
     def compute(self,omega_pc):
-        self.mf_turb.controller.omega_pc = omega_pc
-        self.mf_turb.run_level3(self.mf_turb.controller)
+        return self.compute_batch([omega_pc])[0]
 
-        return compute_outputs(self.mf_turb.level3_out)
+    def compute_batch(self,omega_pcs):
+        # All cases of all omega_pc values are scheduled as independent jobs
+        return self.mf_turb.run_level3_jobs(self.mf_turb.controller,omega_pcs,self.mf_turb.level3_max_jobs)
 
 
 
 class Level2_Turbine(object):
+    '''
+    Level 2 linear model. With spectral, the metrics come from the closed loop
+    frequency response and the wind spectra instead of time simulations: much
+    faster, for dense omega_pc sweeps, but expected values of a Gaussian
+    response rather than the metrics of the simulated wind series.
+    '''
 
-    def __init__(self,mf_turb,dofs):
+    def __init__(self,mf_turb,dofs,spectral=False):
+        self.spectral = spectral
         self.setup(mf_turb,dofs)
 
     def setup(self,mf_turb,dofs):
@@ -395,53 +1008,62 @@ class Level2_Turbine(object):
         # mf_turb.run_level3(mf_turb.turbine,mf_turb.controller)
 
         # 4. Extract disturbance from level3 sims (wind only for now)
-        dist = []
-        for case in mf_turb.case_list:
-            ts_file     = TurbSimFile(case[('InflowWind','FileName_BTS')])
-            ts_file.compute_rot_avg(mf_turb.iec.D/2)
-            u_h         = ts_file['rot_avg'][0,:]
-            tt          = ts_file['t']
-            dist.append({'Time':tt, 'Wind': u_h})
+        dist = [load_disturbance(case[('InflowWind','FileName_BTS')], mf_turb.iec.D/2) for case in mf_turb.case_list]
 
         # save data to object
         self.disturbance    = dist
         self.mf_turb        = mf_turb
 
+        # Accuracy lost by reducing the linear model, for the initial controller
+        if mf_turb.level2_reduction is not None:
+            reduction = mf_turb.LinearTurbine.reduction
+            print('Reduced the level 2 model from {} to {} states, relative error bound {:.2e}'.format( \
+                reduction['full_states'], reduction['states'], reduction['error_bound']))
+
+            check = mf_turb.check_level2_reduction(dist)
+            for key, value in check['outputs']['full'].items():
+                print('{:16s} full {:12.5g}  reduced {:12.5g}  error {:.2%}'.format( \
+                    key, value, check['outputs']['reduced'][key], check['rel_error'][key]))
+
     def compute(self,omega_pc):
-        # 5. Run level 2 simulation
-        self.mf_turb.controller.omega_pc = omega_pc
-        self.mf_turb.run_level2(self.mf_turb.controller,self.disturbance)
+        if self.spectral:
+            return self.compute_batch([omega_pc])[0]
+
+        # 5. Run level 2 simulation, with this evaluation's own controller
+        controller = self.mf_turb.controller_for(omega_pc)
+        level2_out = self.mf_turb.run_level2(controller,self.disturbance)
 
-        outputs = compute_outputs(self.mf_turb.level2_out)
+        outputs = compute_outputs(level2_out,self.mf_turb.case_weights)
 
         return outputs
 
-def compute_outputs(levelX_out):
-    # compute Tower Base Myt DEL
-    for lx_out in levelX_out:
-        lx_out['meta'] = {}
-        lx_out['meta']['name'] = 'placeholder'
-    chan_info = [('TwrBsMyt',4)]
-    la = Loads_Analysis()
-    TwrBsMyt_DEL = la.get_DEL(levelX_out,chan_info)['TwrBsMyt'].tolist()
-
-    # Generator Speed Measures
-    GenSpeed_Max = [lx_out['GenSpeed'].max() for lx_out in levelX_out]
-    GenSpeed_Std = [lx_out['GenSpeed'].std() for lx_out in levelX_out]
-
-    # Platform pitch measures
-    PtfmPitch_Max = [lx_out['PtfmPitch'].max() for lx_out in levelX_out]
-    PtfmPitch_Std = [lx_out['PtfmPitch'].std() for lx_out in levelX_out]
-
-    # save outputs
-    outputs = {}
-    outputs['TwrBsMyt_DEL']     = TwrBsMyt_DEL[0]
-    outputs['GenSpeed_Max']     = GenSpeed_Max[0]
-    outputs['GenSpeed_Std']     = GenSpeed_Std[0]
-    outputs['PtfmPitch_Max']    = PtfmPitch_Max[0]
-    outputs['PtfmPitch_Std']    = PtfmPitch_Std[0]
-
-    return outputs
+    def compute_batch(self,omega_pcs):
+        if self.spectral:
+            case_outs = self.mf_turb.run_level2_spectral(self.mf_turb.controller,self.disturbance,omega_pcs)
+            return [compute_spectral_outputs(case_out,self.mf_turb.case_weights) for case_out in case_outs]
+
+        # Level 2 simulations of all the omega_pc values in one pass
+        level2_outs = self.mf_turb.run_level2_batch(self.mf_turb.controller,self.disturbance,omega_pcs)
+
+        return [compute_outputs(level2_out,self.mf_turb.case_weights) for level2_out in level2_outs]
+
+def new_metrics(n_cases,weights=None):
+    # Tower base Myt DEL, generator speed and platform pitch measures over all cases,
+    # combined with the case probabilities
+    return LoadMetrics(n_cases,weights=weights,del_channels=[('TwrBsMyt',4)],stat_channels=['GenSpeed','PtfmPitch'])
+
+def compute_outputs(levelX_out,weights=None):
+    metrics = new_metrics(len(levelX_out),weights)
+    metrics.update_outputs(levelX_out)
+
+    return metrics.outputs()
+
+def compute_spectral_outputs(case_outs,weights=None):
+    # Combine the case metrics of solve_spectral_batch like compute_outputs does
+    metrics = new_metrics(len(case_outs),weights)
+    case_outputs = {key: np.array([case_out[key] for case_out in case_outs]) for key in case_outs[0]}
+
+    return combine_cases(case_outputs,metrics.weights,metrics.del_channels,metrics.stat_channels)
 
 if __name__ == '__main__':
     # 0. Set up Model, using default input files
@@ -0,0 +1,176 @@
+'''
+Balanced truncation of the linear turbine model used by Level 2
+
+LinearTurbineModel interpolates its state space matrices between the wind
+speeds it was linearized at, so all operating points are reduced with one
+projection: the controllability and observability Gramians of the operating
+points are summed and balanced together, and the states with small Hankel
+singular values of that sum are truncated. Projecting is linear, so the
+interpolated reduced model is the reduction of the interpolated full model.
+
+Inputs and outputs are scaled to the same H2 norm first, so e.g. TwrBsMyt in
+kN-m doesn't outweigh GenSpeed in rad/s. Balanced truncation needs a stable
+system. The states that take part in unstable or marginal modes of any
+operating point, e.g. the generator azimuth, are kept as they are, and only
+the stable subsystem of the other states is truncated, with the kept states
+as additional inputs and outputs. Models whose unstable modes involve the
+stable states (or all states) aren't reduced. For a single operating point,
+2 * sum of the truncated singular values bounds the H-inf error of the scaled
+stable subsystem; with several, it's the bound of the summed Gramians, a
+guide rather than a guarantee, so check the metrics with
+MF_Turbine.check_level2_reduction.
+'''
+import copy
+import numpy as np
+from scipy.linalg import solve_continuous_lyapunov, svd, eigh, schur
+
+
+def unstable_modes(A, margin=1e-6):
+    # Eigenvalues with a real part above -margin times the spectral radius
+    eigs = np.linalg.eigvals(A)
+    return eigs.real >= -margin * max(1., np.max(np.abs(eigs)))
+
+
+def unstable_states(A_ops, margin=1e-6, tol=1e-8):
+    '''
+    Indices of the states in the unstable invariant subspaces of the operating
+    points (last axis of A_ops), i.e. the states that unstable or marginal
+    modes move.
+    '''
+    n = A_ops.shape[0]
+    states = np.zeros(n, dtype=bool)
+    for k in range(A_ops.shape[2]):
+        A = A_ops[:,:,k]
+        threshold = -margin * max(1., np.max(np.abs(np.linalg.eigvals(A))))
+        _, Z, n_unstable = schur(A, output='real', sort=lambda re, im: re >= threshold)
+        if n_unstable:
+            basis = np.linalg.norm(Z[:, :n_unstable], axis=1)
+            states |= basis > tol * basis.max()
+    return np.flatnonzero(states)
+
+
+def psd_factor(W):
+    '''
+    Factor L with W = L L^T of a symmetric positive semi-definite matrix,
+    which Gramians are only up to round-off.
+    '''
+    s, U = eigh((W + W.T) / 2)
+    return U * np.sqrt(np.maximum(s, 0.))
+
+
+def gramians(A, B, C):
+    '''
+    Controllability and observability Gramians of a stable system.
+    '''
+    Wc = solve_continuous_lyapunov(A, -B @ B.T)
+    Wo = solve_continuous_lyapunov(A.T, -C.T @ C)
+    return Wc, Wo
+
+
+def io_scaling(A_ops, B_ops, C_ops):
+    '''
+    Scale factors of the outputs, then the inputs, to unit H2 norm summed
+    over the operating points. The error bound of balanced_basis is for the
+    system with outputs y_scale * y and inputs u_scale * u.
+    '''
+    n_ops = A_ops.shape[2]
+
+    Wc_ops = [gramians(A_ops[:,:,k], B_ops[:,:,k], C_ops[:,:,k])[0] for k in range(n_ops)]
+    y_norm = np.sqrt(sum(np.diag(C_ops[:,:,k] @ Wc_ops[k] @ C_ops[:,:,k].T) for k in range(n_ops)))
+    y_scale = 1. / np.where(y_norm > 0, y_norm, 1.)
+
+    Wo_ops = [gramians(A_ops[:,:,k], B_ops[:,:,k], C_ops[:,:,k] * y_scale[:, None])[1] for k in range(n_ops)]
+    u_norm = np.sqrt(sum(np.diag(B_ops[:,:,k].T @ Wo_ops[k] @ B_ops[:,:,k]) for k in range(n_ops)))
+    u_scale = 1. / np.where(u_norm > 0, u_norm, 1.)
+    return y_scale, u_scale
+
+
+def balanced_basis(A_ops, B_ops, C_ops, order=None, tol=1e-3):
+    '''
+    Common balancing projection of all operating points (last axis of the
+    matrices, like LinearTurbineModel.A_ops), with the inputs and outputs
+    scaled by io_scaling. Keeps order states, or the fewest states with an
+    error bound of at most tol times the largest Hankel singular value.
+
+    Returns T (n, r) and Ti (r, n), with reduced states x_r = Ti x and
+    x = T x_r, the Hankel singular values and the error bound relative to
+    the largest one. Raises ValueError if an operating point isn't stable.
+    '''
+    n_ops = A_ops.shape[2]
+    for k in range(n_ops):
+        if unstable_modes(A_ops[:,:,k]).any():
+            raise ValueError('Balanced truncation needs stable operating points, operating point {} is not'.format(k))
+
+    y_scale, u_scale = io_scaling(A_ops, B_ops, C_ops)
+    B_sc = B_ops * u_scale[None, :, None]
+    C_sc = C_ops * y_scale[:, None, None]
+
+    Wc = sum(gramians(A_ops[:,:,k], B_sc[:,:,k], C_sc[:,:,k])[0] for k in range(n_ops))
+    Wo = sum(gramians(A_ops[:,:,k], B_sc[:,:,k], C_sc[:,:,k])[1] for k in range(n_ops))
+
+    # Square root balancing
+    Lc, Lo = psd_factor(Wc), psd_factor(Wo)
+    U, hsv, Vt = svd(Lo.T @ Lc)
+
+    if order is None:
+        tail = 2 * np.concatenate((np.cumsum(hsv[::-1])[::-1], [0.]))
+        order = int(np.argmax(tail <= tol * hsv[0]))
+    order = max(1, min(order, int(np.sum(hsv > hsv[0] * 1e-12))))
+
+    S_r = 1. / np.sqrt(hsv[:order])
+    T   = Lc @ Vt[:order].T * S_r
+    Ti  = (S_r[:, None] * U[:, :order].T) @ Lo.T
+    return T, Ti, hsv, 2 * hsv[order:].sum() / hsv[0]
+
+
+def reduce_linear_model(lin_model, order=None, tol=1e-3):
+    '''
+    Copy of a LinearTurbineModel with the states of its stable subsystem
+    reduced by balanced_basis to order states or the tolerance tol. The
+    states of unstable_states are kept after the balanced states, with their
+    descriptions. The reduction details are in the reduction attribute of
+    the copy. Raises ValueError if there is no stable subsystem to reduce.
+    '''
+    A_ops, B_ops, C_ops = lin_model.A_ops, lin_model.B_ops, lin_model.C_ops
+    n_full  = A_ops.shape[0]
+    kept    = unstable_states(A_ops)
+    stable  = np.setdiff1d(np.arange(n_full), kept)
+    if not len(stable):
+        raise ValueError('All {} states take part in unstable modes, the linear model can\'t be reduced'.format(n_full))
+
+    # The kept states drive the stable subsystem and are driven by it
+    A_ss    = A_ops[np.ix_(stable, stable)]
+    B_sub   = np.concatenate((B_ops[stable], A_ops[np.ix_(stable, kept)]), axis=1)
+    C_sub   = np.concatenate((C_ops[:, stable], A_ops[np.ix_(kept, stable)]), axis=0)
+    try:
+        T_s, Ti_s, hsv, error_bound = balanced_basis(A_ss, B_sub, C_sub, order, tol)
+    except ValueError:
+        raise ValueError('The unstable modes of the linear model involve the states it would reduce')
+
+    # Projection of the full state vector, x = T x_r and x_r = Ti x
+    n_states    = T_s.shape[1] + len(kept)
+    T           = np.zeros((n_full, n_states))
+    Ti          = np.zeros((n_states, n_full))
+    T[np.ix_(stable, np.arange(T_s.shape[1]))]  = T_s
+    Ti[np.ix_(np.arange(T_s.shape[1]), stable)] = Ti_s
+    T[kept, T_s.shape[1] + np.arange(len(kept))]    = 1.
+    Ti[T_s.shape[1] + np.arange(len(kept)), kept]   = 1.
+
+    reduced         = copy.copy(lin_model)
+    reduced.A_ops   = np.einsum('rn,nmk,ms->rsk', Ti, A_ops, T)
+    reduced.B_ops   = np.einsum('rn,nik->rik', Ti, B_ops)
+    reduced.C_ops   = np.einsum('onk,nr->ork', C_ops, T)
+    reduced.D_ops   = lin_model.D_ops.copy()
+    reduced.x_ops   = Ti @ lin_model.x_ops
+
+    reduced.DescStates      = ['Balanced state {}'.format(i + 1) for i in range(T_s.shape[1])] + \
+                                [lin_model.DescStates[i] for i in kept]
+    reduced.StateDerivOrder = np.concatenate((np.ones(T_s.shape[1], dtype=int), np.asarray(lin_model.StateDerivOrder, dtype=int)[kept]))
+    reduced.reduction       = {
+        'full_states':  n_full,
+        'states':       n_states,
+        'kept_states':  [lin_model.DescStates[i] for i in kept],
+        'hsv':          hsv,
+        'error_bound':  error_bound,
+        }
+    return reduced
@@ -0,0 +1,56 @@
+'''
+Array-backed lookup of the linear turbine over its linearization wind speeds
+
+LinearTurbineModel.get_plant_op builds seven scipy interpolators over all
+operating points on every solve, copying every matrix each time, so a solve
+gets slower with every wind speed added to the linearization. The table
+stores the matrices once, wind speed first, and a lookup is a binary search
+and a blend of the two bracketing operating points. That costs the same for
+3 or 20 wind speeds and takes arrays of wind speeds at once.
+'''
+import numpy as np
+
+
+class OperatingPointTable(object):
+    '''
+    State space matrices and operating points of a LinearTurbineModel over
+    its wind speeds u_h, interpolated linearly and clipped to the range of
+    u_h like get_plant_op.
+    '''
+
+    names = ['A', 'B', 'C', 'D', 'u', 'y', 'x']
+
+    def __init__(self, lin_model):
+        order       = np.argsort(lin_model.u_h)
+        self.u_h    = np.asarray(lin_model.u_h, dtype=float)[order]
+        self.source = lin_model.A_ops
+
+        self.values = {}
+        for name, ops in zip(self.names, [lin_model.A_ops, lin_model.B_ops, lin_model.C_ops, lin_model.D_ops, \
+            lin_model.u_ops, lin_model.y_ops, lin_model.x_ops]):
+            self.values[name] = np.ascontiguousarray(np.moveaxis(np.asarray(ops), -1, 0)[order])
+
+    def matches(self, lin_model):
+        # Tables are rebuilt when the matrices are replaced, e.g. by a reduced model
+        return self.source is lin_model.A_ops
+
+    def clip(self, wind_speeds):
+        return np.clip(np.asarray(wind_speeds, dtype=float), self.u_h[0], self.u_h[-1])
+
+    def interpolate(self, wind_speeds):
+        '''
+        Dict of the matrices and operating points at wind_speeds. With an
+        array of wind speeds, every value gets their shape as leading axes.
+        '''
+        ws = self.clip(wind_speeds)
+        if len(self.u_h) == 1:
+            return {name: np.broadcast_to(value[0], ws.shape + value.shape[1:]).copy() for name, value in self.values.items()}
+
+        i = np.clip(np.searchsorted(self.u_h, ws, side='right') - 1, 0, len(self.u_h) - 2)
+        w = (ws - self.u_h[i]) / (self.u_h[i + 1] - self.u_h[i])
+
+        interp = {}
+        for name, value in self.values.items():
+            w_n = w.reshape(w.shape + (1,) * (value.ndim - 1))
+            interp[name] = (1 - w_n) * value[i] + w_n * value[i + 1]
+        return interp
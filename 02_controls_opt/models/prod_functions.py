@@ -1,26 +1,74 @@
+import os
+import numpy as np
 from weis.multifidelity.models.base_model import BaseModel
 from .mf_controls import MF_Turbine, Level2_Turbine, Level3_Turbine
+from .linear_store import model_tree_digest
+
+from mf_utils.eval_cache import cache_model
+
+
+def turbine_cache_inputs(mf_turb):
+    """
+    Input files and settings that define an MF_Turbine, for the evaluation cache.
+    The main input file only points to the other OpenFAST inputs (ElastoDyn,
+    ServoDyn, DISCON, AeroDyn, airfoils, ...), so the whole model folder is hashed.
+    """
+    input_files = [os.path.join(mf_turb.FAST_directory, mf_turb.FAST_InputFile), mf_turb.parameter_filename]
+    extra = {
+        'fast_model': model_tree_digest(mf_turb.FAST_directory),
+        'level2_wind_speeds': mf_turb.level2_wind_speeds,
+        'level3_wind_speeds': mf_turb.level3_wind_speeds,
+        'TMax': mf_turb.iec.TMax,
+        'seeds': mf_turb.iec.dlc_inputs['Seeds'],
+        'case_weights': mf_turb.case_weights,
+    }
+    return input_files, extra
 
 
 class L2Turbine(BaseModel):
     
-    def __init__(self, desvars_init, warmstart_file, mf_turb):
+    def __init__(self, desvars_init, warmstart_file, mf_turb, eval_cache=None, spectral=False):
         super(L2Turbine, self).__init__(desvars_init, warmstart_file)
         dofs = ['GenDOF','TwFADOF1','PtfmPDOF']
-        self.l2_turb = Level2_Turbine(mf_turb, dofs)
+        self.l2_turb = Level2_Turbine(mf_turb, dofs, spectral=spectral)
+
+        if eval_cache:
+            input_files, extra = turbine_cache_inputs(mf_turb)
+            extra['dofs'] = dofs
+            extra['spectral'] = spectral
+            extra['level2_reduction'] = mf_turb.level2_reduction
+            cache_model(self, input_files, extra, cache=eval_cache)
 
     def compute(self, desvars):
         outputs = self.l2_turb.compute(desvars['pc_omega'])
         print('L2 compute:', desvars['pc_omega'])
         return outputs
+
+    def compute_batch(self, list_of_desvars):
+        # All designs go through one stacked linear simulation
+        omega_pcs = [np.squeeze(desvars['pc_omega']) for desvars in list_of_desvars]
+        list_of_outputs = self.l2_turb.compute_batch(omega_pcs)
+
+        outputs = {}
+        for key in list_of_outputs[0]:
+            outputs[key] = np.array([l2_outputs[key] for l2_outputs in list_of_outputs])
+        return outputs
         
         
 class L3Turbine(BaseModel):
     
-    def __init__(self, desvars_init, warmstart_file, mf_turb):
+    def __init__(self, desvars_init, warmstart_file, mf_turb, eval_cache=None):
         super(L3Turbine, self).__init__(desvars_init, warmstart_file)
         self.l3_turb = Level3_Turbine(mf_turb)
 
+        if eval_cache:
+            input_files, extra = turbine_cache_inputs(mf_turb)
+            extra['level3_channels'] = mf_turb.level3_channels
+            extra['level3_max_constraints'] = mf_turb.level3_max_constraints
+            extra['level3_stop'] = (mf_turb.level3_stop_limits, mf_turb.level3_stop_margin, mf_turb.level3_stop_penalty)
+            extra['level3_adaptive'] = mf_turb.level3_adaptive
+            cache_model(self, input_files, extra, cache=eval_cache)
+
     def compute(self, desvars):
         outputs = self.l3_turb.compute(desvars['pc_omega'])
         print('L3 compute:', desvars['pc_omega'])
@@ -0,0 +1,137 @@
+'''
+Frequency domain load metrics of the closed loop linear turbine
+
+The level 2 model is linear, so its outputs are the wind filtered by the
+closed loop transfer functions. With the power spectral density (PSD) of the
+rotor averaged wind, the output PSDs are |H(f)|^2 S_u(f), and their spectral
+moments m_k = int f^k S(f) df give the metrics without integrating in time:
+
+- Std: sqrt(m0)
+- DEL: Dirlik's rainflow range distribution, with sqrt(m4/m2) cycles per
+  second, normalized like LoadMetrics (damage over the wind series, 600 s)
+- Max: the expected largest peak of a Gaussian process over the wind series
+  (Davenport), on top of the mean
+
+These are expected values for a stationary Gaussian response, so they differ
+from the metrics of one simulated realization by its statistical scatter,
+and the start-up transient of the simulation isn't in them.
+'''
+import numpy as np
+from scipy.signal import periodogram
+from scipy.special import gamma
+
+EULER_GAMMA = 0.5772156649
+
+
+def wind_spectrum(tt, u, n_freq=2000):
+    '''
+    One-sided PSD of the wind series u on n_freq log-spaced frequency bands
+    (Hz), from the periodogram of the whole series. Summing the periodogram
+    over each band keeps the variance of the wind exactly and smooths the
+    estimate at high frequencies, while the narrow bands at low frequencies
+    resolve the lightly damped modes of the turbine. Returns the centre
+    frequencies, widths and PSD of the bands.
+    '''
+    dt = (tt[-1] - tt[0]) / (len(tt) - 1)
+    f_p, S_p = periodogram(u, fs=1. / dt, detrend='constant')
+
+    # Cumulative variance at the upper edges of the periodogram bins. f = 0 is
+    # left out: the mean is removed, and the closed loop may have integrators
+    # that the wind doesn't drive
+    df_p    = f_p[1] - f_p[0]
+    f_upper = np.concatenate(([f_p[1] - df_p / 2], f_p[1:] + df_p / 2))
+    var     = np.concatenate(([0.], np.cumsum(S_p[1:] * df_p)))
+
+    edges   = np.geomspace(f_upper[0], f_upper[-1], n_freq + 1)
+    df      = np.diff(edges)
+    return np.sqrt(edges[1:] * edges[:-1]), df, np.diff(np.interp(edges, f_upper, var)) / df
+
+
+def frequency_response(A, B, C, D, f):
+    '''
+    Transfer functions C (j 2 pi f I - A)^-1 B + D of state space systems at
+    the frequencies f (Hz). A, B, C, D have a leading axis of systems, and the
+    result has shape (n_sys, n_freq, n_outputs, n_inputs).
+
+    Diagonalizing A makes every frequency a scaling of the modes instead of a
+    linear solve. Systems whose eigenvectors are close to defective are
+    solved directly.
+    '''
+    s = 2j * np.pi * np.asarray(f)
+    H = np.zeros((A.shape[0], len(s), C.shape[1], B.shape[2]), dtype=complex)
+    for i_sys in range(A.shape[0]):
+        lam, V = np.linalg.eig(A[i_sys])
+        if np.linalg.cond(V) < 1e8:
+            CV = C[i_sys] @ V
+            VB = np.linalg.solve(V, B[i_sys])
+            H[i_sys] = np.einsum('on,fn,ni->foi', CV, 1. / (s[:, None] - lam), VB)
+        else:
+            sI_A = s[:, None, None] * np.identity(A.shape[1]) - A[i_sys]
+            H[i_sys] = C[i_sys] @ np.linalg.solve(sI_A, np.broadcast_to(B[i_sys], (len(s),) + B.shape[1:]))
+    return H + D[:, None]
+
+
+def spectral_moments(f, df, S, orders=(0, 1, 2, 4)):
+    '''
+    Moments int f^k S(f) df of the PSDs S (last axis over the bands f of
+    width df), as a dict by k.
+    '''
+    return {k: np.sum(f ** k * S * df, axis=-1) for k in orders}
+
+
+def dirlik_damage(moments, m, duration):
+    '''
+    Expected sum of range**m of the rainflow cycles over duration, with
+    Dirlik's range distribution.
+    '''
+    m0, m1, m2, m4 = moments[0], moments[1], moments[2], moments[4]
+    if m0 <= 0 or m2 <= 0 or m4 <= 0:
+        return 0.
+
+    xm      = m1 / m0 * np.sqrt(m2 / m4)
+    gam     = m2 / np.sqrt(m0 * m4)
+    D1      = 2 * (xm - gam ** 2) / (1 + gam ** 2)
+    R       = (gam - xm - D1 ** 2) / (1 - gam - D1 + D1 ** 2)
+    D2      = (1 - gam - D1 + D1 ** 2) / (1 - R)
+    D3      = 1 - D1 - D2
+    Q       = 1.25 * (gam - D3 - D2 * R) / D1
+
+    # E[S^m] for ranges S = 2 sqrt(m0) Z, Z from the three term Dirlik pdf
+    EZm = D1 * Q ** m * gamma(1 + m) + np.sqrt(2) ** m * gamma(1 + m / 2.) * (D2 * abs(R) ** m + D3)
+    n_cycles = np.sqrt(m4 / m2) * duration
+    return n_cycles * (2 * np.sqrt(m0)) ** m * EZm
+
+
+def expected_max(mean, moments, duration):
+    '''
+    Expected maximum of a stationary Gaussian process over duration.
+    '''
+    m0, m2 = moments[0], moments[2]
+    if m0 <= 0 or m2 <= 0:
+        return mean
+    n_up = max(np.sqrt(m2 / m0) * duration, np.e)   # zero up-crossings, at least one
+    k = np.sqrt(2 * np.log(n_up))
+    return mean + np.sqrt(m0) * (k + EULER_GAMMA / k)
+
+
+def spectral_outputs(OutList, f, df, H, S_u, y_mean, duration, del_channels=[('TwrBsMyt',4)], stat_channels=['GenSpeed','PtfmPitch'], del_time=600.):
+    '''
+    Metrics of one case, like LoadMetrics.case_outputs for a single case.
+    H has shape (n_freq, n_outputs), the transfer functions from the wind to
+    the channels in OutList, S_u is the wind PSD of the bands f, df (see
+    wind_spectrum) and y_mean the mean outputs.
+    '''
+    S_y = np.abs(H.T) ** 2 * S_u
+    moments = spectral_moments(f, df, S_y)
+
+    outputs = {}
+    for chan, m in del_channels:
+        i = OutList.index(chan)
+        damage = dirlik_damage({k: moment[i] for k, moment in moments.items()}, m, duration)
+        outputs[chan + '_DEL'] = (damage / del_time) ** (1. / m)
+    for chan in stat_channels:
+        i = OutList.index(chan)
+        chan_moments = {k: moment[i] for k, moment in moments.items()}
+        outputs[chan + '_Max'] = expected_max(y_mean[i], chan_moments, duration)
+        outputs[chan + '_Std'] = np.sqrt(chan_moments[0])
+    return outputs
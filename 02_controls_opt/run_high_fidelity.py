@@ -1,8 +1,14 @@
+import os
+import sys
 import numpy as np
+# mf_utils is shared by the case studies at the top level of the repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 from models.prod_functions import L3Turbine
 from models.mf_controls import MF_Turbine
+from mf_utils.eval_cache import env_cache
 from time import time
 from os import path
+import os
 import openmdao.api as om
 
 
@@ -24,10 +30,12 @@ class Model(om.ExplicitComponent):
         self.add_output('PtfmPitch_Max', val=0.)
         self.add_output('PtfmPitch_Std', val=0.)
         
-        mf_turb = MF_Turbine()
+        mf_turb = MF_Turbine.from_snapshot()
         mf_turb.n_cores = 1
+        # Level 3 cases (wind speeds and seeds) run as parallel OpenFAST jobs
+        mf_turb.level3_max_jobs = os.cpu_count()
         
-        self.model = L3Turbine(desvars, 'L3Turbine.pkl', mf_turb)
+        self.model = L3Turbine(desvars, 'L3Turbine.pkl', mf_turb, eval_cache=env_cache())
 
     def compute(self, inputs, outputs):
         desvars = self.options["desvars"]
@@ -1,6 +1,11 @@
+import os
+import sys
 import numpy as np
+# mf_utils is shared by the case studies at the top level of the repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 from models.prod_functions import L2Turbine
 from models.mf_controls import MF_Turbine
+from mf_utils.eval_cache import env_cache
 from time import time
 from os import path
 import openmdao.api as om
@@ -24,10 +29,11 @@ class Model(om.ExplicitComponent):
         self.add_output('PtfmPitch_Max', val=0.)
         self.add_output('PtfmPitch_Std', val=0.)
         
-        mf_turb = MF_Turbine()
+        mf_turb = MF_Turbine.from_snapshot()
         mf_turb.n_cores = 4
+        self.mf_turb = mf_turb
         
-        self.model = L2Turbine(desvars, 'L2Turbine.pkl', mf_turb)
+        self.model = L2Turbine(desvars, 'L2Turbine.pkl', mf_turb, eval_cache=env_cache())
 
     def compute(self, inputs, outputs):
         desvars = self.options["desvars"]
@@ -75,3 +81,6 @@ p.driver.add_recorder(recorder)
 
 p.setup(mode='fwd')
 p.run_driver()
+
+# Stop the level 2 worker processes
+comp.mf_turb.shutdown_level2_pool()
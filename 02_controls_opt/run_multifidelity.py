@@ -1,15 +1,29 @@
+import os
+import sys
 import numpy as np
 from weis.multifidelity.methods.trust_region import SimpleTrustRegion
+# mf_utils is shared by the case studies at the top level of the repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 from models.prod_functions import L2Turbine, L3Turbine
 from models.mf_controls import MF_Turbine, Level2_Turbine, Level3_Turbine
+from mf_utils.eval_cache import env_cache
+from mf_utils.profiling import env_profiler, finish_profiler, profile_model
 
 
 bounds = {'pc_omega' : np.array([[0.10, 0.4]])}
 desvars = {'pc_omega' : np.array([0.22])}
-mf_turb = MF_Turbine()
+mf_turb = MF_Turbine.from_snapshot()
 mf_turb.n_cores = 1
-model_low = L2Turbine(desvars, 'L2Turbine.pkl', mf_turb)
-model_high = L3Turbine(desvars, 'L3Turbine.pkl', mf_turb)
+# Level 3 cases (wind speeds and seeds) run as parallel OpenFAST jobs
+mf_turb.level3_max_jobs = os.cpu_count()
+model_low = L2Turbine(desvars, 'L2Turbine.pkl', mf_turb, eval_cache=env_cache())
+model_high = L3Turbine(desvars, 'L3Turbine.pkl', mf_turb, eval_cache=env_cache())
+
+# Profile the model calls if MF_PROFILE names an events file
+profiler = env_profiler()
+if profiler is not None:
+    profile_model(model_low, "low", profiler)
+    profile_model(model_high, "high", profiler)
 
 np.random.seed(123)
 
@@ -27,3 +41,6 @@ trust_region.add_constraint("GenSpeed_Max", upper=9.)
 trust_region.add_constraint("PtfmPitch_Max", upper=5.)
 
 trust_region.optimize(plot=False, num_basinhop_iterations=5)
+
+finish_profiler(profiler)
+mf_turb.shutdown_level2_pool()
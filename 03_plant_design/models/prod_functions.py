@@ -11,10 +11,12 @@ import floris.tools.visualization as vis
 from floris.tools.optimization.scipy.yaw_wind_rose import YawOptimizationWindRose
 from scipy.spatial.distance import cdist
 
+from mf_utils.eval_cache import cache_model
+
 
 class FarmModel(BaseModel):
     
-    def __init__(self, desvars_init, warmstart_file, input_file, calls_between_saving=1, wd=np.arange(0, 360, 60), ws=np.arange(0, 26, 2)):
+    def __init__(self, desvars_init, warmstart_file, input_file, calls_between_saving=1, wd=np.arange(0, 360, 60), ws=np.arange(0, 26, 2), eval_cache=None):
         super(FarmModel, self).__init__(desvars_init, warmstart_file, calls_between_saving)
         # Initialize the FLORIS interface fi
         this_directory = os.path.abspath(os.path.dirname(__file__))
@@ -36,6 +38,10 @@ class FarmModel(BaseModel):
         
         self.yaw_opt = YawOptimizationWindRose(self.fi, self.df.wd, self.df.ws, minimum_ws=minimum_ws)
 
+        if eval_cache:
+            extra = {'wd': wd, 'ws': ws, 'minimum_ws': minimum_ws}
+            cache_model(self, [input_file], extra, cache=eval_cache)
+
     def compute(self, desvars):
         x = desvars['x']
         y = desvars['y']
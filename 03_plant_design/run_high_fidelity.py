@@ -1,5 +1,10 @@
+import os
+import sys
 import numpy as np
+# mf_utils is shared by the case studies at the top level of the repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 from models.prod_functions import FarmModel
+from mf_utils.eval_cache import env_cache
 from time import time
 from os import path
 import openmdao.api as om
@@ -33,7 +38,7 @@ class Farm(om.ExplicitComponent):
         wd = np.linspace(0, 360, 18)
         ws = np.linspace(0, 26, 14)
         
-        self.model = FarmModel(desvars, 'gch.pkl', input_file="gch_input.json", wd=wd, ws=ws)
+        self.model = FarmModel(desvars, 'gch.pkl', input_file="gch_input.json", wd=wd, ws=ws, eval_cache=env_cache())
 
     def compute(self, inputs, outputs):
         desvars = self.options["desvars"]
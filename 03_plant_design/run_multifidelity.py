@@ -1,5 +1,11 @@
+import os
+import sys
 import numpy as np
+# mf_utils is shared by the case studies at the top level of the repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 from models.prod_functions import FarmModel
+from mf_utils.eval_cache import env_cache
+from mf_utils.profiling import env_profiler, finish_profiler, profile_model
 from weis.multifidelity.methods.trust_region import SimpleTrustRegion
 from time import time
 from os import path
@@ -18,11 +24,16 @@ desvars = {
 
 wd = np.linspace(0, 360, 6)
 ws = np.linspace(0, 26, 5)
-model_low = FarmModel(desvars, 'jensen.pkl', input_file="jensen_input.json", calls_between_saving=100, wd=wd, ws=ws)
+model_low = FarmModel(desvars, 'jensen.pkl', input_file="jensen_input.json", calls_between_saving=100, wd=wd, ws=ws, eval_cache=env_cache())
 
 wd = np.linspace(0, 360, 18)
 ws = np.linspace(0, 26, 14)
-model_high = FarmModel(desvars, 'gch.pkl', input_file="gch_input.json", wd=wd, ws=ws)
+model_high = FarmModel(desvars, 'gch.pkl', input_file="gch_input.json", wd=wd, ws=ws, eval_cache=env_cache())
+# Profile the model calls if MF_PROFILE names an events file
+profiler = env_profiler()
+if profiler is not None:
+    profile_model(model_low, "low", profiler)
+    profile_model(model_high, "high", profiler)
 trust_region = SimpleTrustRegion(
     model_low,
     model_high,
@@ -39,3 +50,4 @@ trust_region.set_initial_point(model_low.flatten_desvars(desvars))
 
 trust_region.optimize(plot=False, num_iterations=30, num_basinhop_iterations=10)
 
+finish_profiler(profiler)
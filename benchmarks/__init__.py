@@ -0,0 +1,5 @@
+"""
+Offline benchmarks of the glue code in the blade, controls and plant case
+studies, using deterministic local stand-ins for WEIS, OpenFAST, ROSCO and
+FLORIS. Run `python -m benchmarks --help` from the top of the repository.
+"""
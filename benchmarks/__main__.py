@@ -0,0 +1,205 @@
+"""
+Run the offline benchmarks.
+
+    python -m benchmarks                          # all cases
+    python -m benchmarks --cases plant blade.om   # cases whose names contain these
+    python -m benchmarks --cost openfast=0.05     # change a synthetic solver cost
+    python -m benchmarks --save base.json
+    python -m benchmarks --baseline base.json     # exit code 1 on regressions
+
+The per-call overhead is the wall time minus the synthetic time the stand-ins
+spent "solving", so it measures the glue code in the studies and the
+multifidelity layer. Memory is measured in a separate, shorter pass under
+tracemalloc, which would otherwise slow the timed calls down.
+"""
+import os
+import io
+import sys
+import gc
+import json
+import time
+import resource
+import argparse
+import platform
+import tracemalloc
+import contextlib
+import numpy as np
+
+from . import standins
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Offline benchmarks of the case studies.")
+    parser.add_argument("--cases", nargs="*", default=[], help="only run cases whose names contain one of these strings")
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    parser.add_argument("--calls", type=int, default=None, help="number of timed calls per case, overriding the defaults")
+    parser.add_argument("--memory-calls", type=int, default=2, help="number of calls traced for the memory peak")
+    parser.add_argument("--cost", action="append", default=[], metavar="NAME=SECONDS", help="synthetic cost of a stand-in solver call, one of " + ", ".join(standins.costs))
+    parser.add_argument("--mode", choices=["sleep", "spin"], default=None, help="how the synthetic solver cost is spent")
+    parser.add_argument("--save", default=None, help="write the results to this json file")
+    parser.add_argument("--baseline", default=None, help="compare against the results in this json file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative increase flagged as a regression")
+    parser.add_argument("--min-time", type=float, default=2.e-4, help="overhead increases below this many seconds are never flagged")
+    parser.add_argument("--min-memory", type=float, default=1.0, help="memory increases below this many MB are never flagged")
+    parser.add_argument("--verbose", action="store_true", help="don't hide the output of the models")
+    return parser.parse_args(argv)
+
+
+def max_rss_mb():
+    # ru_maxrss is in kB on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024.0 ** 2 if sys.platform == "darwin" else rss / 1024.0
+
+
+def run_case(name, case, n_calls, memory_calls, verbose):
+    quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    standins.reset_costs()
+
+    with quiet:
+        t0 = time.perf_counter()
+        call = case["setup"]()
+        setup_time = time.perf_counter() - t0
+        setup_solver_time = standins.solver_time()
+
+        wall = np.zeros(n_calls)
+        cpu = np.zeros(n_calls)
+        solver = np.zeros(n_calls)
+        gc.collect()
+        for i in range(n_calls):
+            s0 = standins.solver_time()
+            c0 = time.process_time()
+            t0 = time.perf_counter()
+            call(i)
+            wall[i] = time.perf_counter() - t0
+            cpu[i] = time.process_time() - c0
+            solver[i] = standins.solver_time() - s0
+
+        gc.collect()
+        tracemalloc.start()
+        for i in range(memory_calls):
+            call(n_calls + i)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    overhead = wall - solver
+    return {
+        "setup_time": setup_time,
+        "setup_overhead": setup_time - setup_solver_time,
+        "calls": n_calls,
+        "wall_median": float(np.median(wall)),
+        "wall_mean": float(np.mean(wall)),
+        "wall_p95": float(np.percentile(wall, 95)),
+        "cpu_mean": float(np.mean(cpu)),
+        "solver_mean": float(np.mean(solver)),
+        "overhead_median": float(np.median(overhead)),
+        "overhead_p95": float(np.percentile(overhead, 95)),
+        "peak_traced_mb": peak / 1024.0 ** 2,
+        "max_rss_mb": max_rss_mb(),
+    }
+
+
+def print_results(results):
+    header = "{:<26} {:>6} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+        "case", "calls", "setup s", "median ms", "p95 ms", "solver ms", "glue ms", "peak MB"
+    )
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(
+            "{:<26} {:>6d} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.2f}".format(
+                name,
+                r["calls"],
+                r["setup_time"],
+                1e3 * r["wall_median"],
+                1e3 * r["wall_p95"],
+                1e3 * r["solver_mean"],
+                1e3 * r["overhead_median"],
+                r["peak_traced_mb"],
+            )
+        )
+
+
+def compare(results, baseline, tolerance, min_time, min_memory):
+    """
+    Return a list of regressions of the per-call glue overhead and of the
+    traced memory peak relative to the baseline results.
+    """
+    regressions = []
+    for name, r in results.items():
+        if name not in baseline:
+            continue
+        b = baseline[name]
+        checks = [
+            ("overhead_median", 1e3, "ms", min_time),
+            ("peak_traced_mb", 1.0, "MB", min_memory),
+        ]
+        for key, factor, unit, floor in checks:
+            increase = r[key] - b[key]
+            if increase > floor and r[key] > (1.0 + tolerance) * b[key]:
+                regressions.append(
+                    "{}: {} went from {:.3f} to {:.3f} {}".format(name, key, factor * b[key], factor * r[key], unit)
+                )
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # The stand-ins have to be installed before the studies are imported
+    info = standins.install()
+    from .cases import cases
+
+    if args.list:
+        for name, case in cases.items():
+            print("{:<26} {}".format(name, case["doc"]))
+        return 0
+
+    seconds = {}
+    for cost in args.cost:
+        key, value = cost.split("=")
+        seconds[key] = float(value)
+    standins.configure(mode=args.mode, **seconds)
+
+    selected = [name for name in cases if not args.cases or any(pattern in name for pattern in args.cases)]
+    if not selected:
+        print("No cases match", args.cases)
+        return 2
+
+    print("Trust region from", "WEIS" if info["real_multifidelity"] else "the stand-ins")
+    results = {}
+    for name in selected:
+        n_calls = args.calls or cases[name]["n_calls"]
+        print("Running", name, flush=True)
+        results[name] = run_case(name, cases[name], n_calls, args.memory_calls, args.verbose)
+    print()
+    print_results(results)
+
+    if args.save:
+        meta = {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "real_multifidelity": info["real_multifidelity"],
+            "costs": {key: cost.seconds for key, cost in standins.costs.items()},
+        }
+        with open(args.save, "w") as f:
+            json.dump({"meta": meta, "cases": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["cases"]
+        regressions = compare(results, baseline, args.tolerance, args.min_time, args.min_memory)
+        print()
+        if regressions:
+            print("Regressions against", os.path.basename(args.baseline))
+            for regression in regressions:
+                print("   ", regression)
+            return 1
+        print("No regressions against", os.path.basename(args.baseline))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
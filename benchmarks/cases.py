@@ -0,0 +1,318 @@
+"""
+Benchmark cases for the three studies.
+
+Each case function sets up the models once and returns a callable that does
+one timed call, given the call index. The OpenMDAO wrappers mirror the
+components defined in the studies' run scripts, which can't be imported
+without running the optimizations.
+"""
+import os
+import sys
+import types
+import tempfile
+import importlib
+import numpy as np
+import openmdao.api as om
+
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# Filled by the `case` decorator, in the order the cases are defined
+cases = {}
+
+
+def case(name, n_calls):
+    def decorator(setup):
+        cases[name] = {"setup": setup, "n_calls": n_calls, "doc": (setup.__doc__ or "").strip()}
+        return setup
+
+    return decorator
+
+
+def load_study(study_folder):
+    """
+    Import `<study_folder>/models/prod_functions.py`. The three studies all
+    call their package `models`, so each one is loaded under its own name.
+    """
+    package_name = "bench_" + study_folder
+    if package_name not in sys.modules:
+        package = types.ModuleType(package_name)
+        package.__path__ = [os.path.join(repo_dir, study_folder, "models")]
+        sys.modules[package_name] = package
+    return importlib.import_module(package_name + ".prod_functions")
+
+
+def perturbed(desvars, n, scale, seed=123):
+    rng = np.random.default_rng(seed)
+    designs = []
+    for i in range(n):
+        design = {}
+        for key, value in desvars.items():
+            if isinstance(value, dict):
+                value = value["values"]
+            value = np.array(value, dtype=float)
+            design[key] = value + scale * rng.random(value.shape)
+        designs.append(design)
+    return designs
+
+
+def om_problem(component, desvars, form="central"):
+    p = om.Problem(model=om.Group(), reports=False)
+    p.model.approx_totals(method="fd", step=1e-6, form=form)
+    p.model.add_subsystem("comp", component, promotes=["*"])
+    for key, value in desvars.items():
+        p.model.add_design_var(key.split(".")[-1])
+    return p
+
+
+class ModelComp(om.ExplicitComponent):
+    """
+    Wrapper with the same structure as the components in the run scripts.
+    """
+
+    def initialize(self):
+        self.options.declare("model")
+        self.options.declare("desvars")
+        self.options.declare("output_names")
+
+    def setup(self):
+        desvars = self.options["desvars"]
+        for key in desvars:
+            value = desvars[key]["values"] if isinstance(desvars[key], dict) else desvars[key]
+            self.add_input(key.split(".")[-1], val=value)
+        for name in self.options["output_names"]:
+            self.add_output(name, val=0.0)
+
+    def compute(self, inputs, outputs):
+        desvars = self.options["desvars"]
+
+        model_inputs = {}
+        for key in desvars:
+            model_inputs[key] = inputs[key.split(".")[-1]]
+
+        model_outputs = self.options["model"].compute(model_inputs)
+        for name in self.options["output_names"]:
+            outputs[name] = np.squeeze(model_outputs[name])
+
+
+## Blade study
+
+blade_desvars = {
+    "blade.opt_var.twist_opt_gain": {"values": np.array([0.55, 0.55, 0.55, 0.55]), "idx_start": 2},
+    "blade.opt_var.chord_opt_gain": {"values": np.ones(3), "idx_start": 2},
+}
+
+
+@case("blade.full_ccblade_cold", n_calls=20)
+def full_ccblade_cold():
+    """FullCCBlade building the WEIS problem on every call."""
+    prod = load_study("01_blade_design")
+    model = prod.FullCCBlade(blade_desvars, None)
+    designs = perturbed(blade_desvars, 20, 0.01)
+    return lambda i: model.compute(designs[i % len(designs)])
+
+
+@case("blade.full_ccblade_warm", n_calls=50)
+def full_ccblade_warm():
+    """FullCCBlade reusing the WEIS problem between calls."""
+    prod = load_study("01_blade_design")
+    model = prod.FullCCBlade(blade_desvars, None, warm=True)
+    designs = perturbed(blade_desvars, 50, 0.01)
+    model.compute(designs[0])
+    return lambda i: model.compute(designs[i % len(designs)])
+
+
+@case("blade.openfast", n_calls=20)
+def openfast():
+    """OpenFAST model with its per-evaluation folders, deleted after each call."""
+    prod = load_study("01_blade_design")
+    prod.folder_evaluations = tempfile.mkdtemp(prefix="mf_benchmarks_evals_") + os.sep
+    model = prod.OpenFAST(blade_desvars, None, cleanup="delete")
+    designs = perturbed(blade_desvars, 20, 0.01)
+    return lambda i: model.compute(designs[i % len(designs)])
+
+
+@case("blade.om_wrapper", n_calls=5)
+def blade_om_wrapper():
+    """Run-script OpenMDAO wrapper around warm FullCCBlade, one run_model and FD totals per call."""
+    prod = load_study("01_blade_design")
+    model = prod.FullCCBlade(blade_desvars, None, warm=True)
+    comp = ModelComp(model=model, desvars=blade_desvars, output_names=["power"])
+    p = om_problem(comp, blade_desvars, form="forward")
+    p.model.add_objective("power")
+    p.setup()
+
+    def call(i):
+        p.run_model()
+        return p.compute_totals()
+
+    return call
+
+
+## Controls study
+
+
+def controls_models():
+    prod = load_study("02_controls_opt")
+    mf_turb = prod.MF_Turbine()
+    mf_turb.n_cores = 1
+    mf_turb.linear_store_dir = tempfile.mkdtemp(prefix="mf_benchmarks_linear_")
+    mf_turb.FAST_level3_directory = tempfile.mkdtemp(prefix="mf_benchmarks_level3_")
+    desvars = {"pc_omega": np.array([0.22])}
+    return prod, mf_turb, desvars
+
+
+@case("controls.l2_turbine", n_calls=20)
+def l2_turbine():
+    """Level 2 linear model evaluations, after building the linear model once."""
+    prod, mf_turb, desvars = controls_models()
+    model = prod.L2Turbine(desvars, None, mf_turb)
+    omegas = np.linspace(0.1, 0.4, 20)
+    return lambda i: model.compute({"pc_omega": omegas[i % len(omegas)]})
+
+
+@case("controls.l2_parallel", n_calls=20)
+def l2_parallel():
+    """Level 2 evaluations of four wind speeds on a pool of four worker processes."""
+    prod = load_study("02_controls_opt")
+    mf_turb = prod.MF_Turbine(level3_wind_speeds=[12, 14, 16, 18])
+    mf_turb.n_cores = 4
+    mf_turb.linear_store_dir = tempfile.mkdtemp(prefix="mf_benchmarks_linear_")
+    model = prod.L2Turbine({"pc_omega": np.array([0.22])}, None, mf_turb)
+    omegas = np.linspace(0.1, 0.4, 20)
+    return lambda i: model.compute({"pc_omega": omegas[i % len(omegas)]})
+
+
+@case("controls.l3_turbine", n_calls=10)
+def l3_turbine():
+    """Level 3 OpenFAST evaluations."""
+    prod, mf_turb, desvars = controls_models()
+    model = prod.L3Turbine(desvars, None, mf_turb)
+    omegas = np.linspace(0.1, 0.4, 10)
+    return lambda i: model.compute({"pc_omega": omegas[i % len(omegas)]})
+
+
+@case("controls.om_wrapper", n_calls=5)
+def controls_om_wrapper():
+    """Run-script OpenMDAO wrapper around L2Turbine, one run_model and FD totals per call."""
+    prod, mf_turb, desvars = controls_models()
+    model = prod.L2Turbine(desvars, None, mf_turb)
+    output_names = ["TwrBsMyt_DEL", "GenSpeed_Max", "GenSpeed_Std", "PtfmPitch_Max", "PtfmPitch_Std"]
+    p = om_problem(ModelComp(model=model, desvars=desvars, output_names=output_names), desvars)
+    p.model.add_objective("TwrBsMyt_DEL", ref=1.e5)
+    p.model.add_constraint("GenSpeed_Max", upper=9.)
+    p.model.add_constraint("PtfmPitch_Max", upper=5.)
+    p.setup()
+
+    def call(i):
+        p.run_model()
+        return p.compute_totals()
+
+    return call
+
+
+@case("controls.trust_region", n_calls=1)
+def controls_trust_region():
+    """Trust region loop between L2Turbine and L3Turbine, as in run_multifidelity.py."""
+    prod, mf_turb, desvars = controls_models()
+    trust_region_module = importlib.import_module("weis.multifidelity.methods.trust_region")
+    model_low = prod.L2Turbine(desvars, None, mf_turb)
+    model_high = prod.L3Turbine(desvars, None, mf_turb)
+
+    def call(i):
+        np.random.seed(123)
+        trust_region = trust_region_module.SimpleTrustRegion(
+            model_low, model_high, {"pc_omega": np.array([[0.10, 0.4]])}, disp=False, trust_radius=0.5, num_initial_points=2,
+        )
+        trust_region.add_objective("TwrBsMyt_DEL", scaler=1e-5)
+        trust_region.add_constraint("GenSpeed_Max", upper=9.)
+        trust_region.add_constraint("PtfmPitch_Max", upper=5.)
+        return trust_region.optimize(plot=False, num_iterations=3, num_basinhop_iterations=1)
+
+    return call
+
+
+## Plant study
+
+extent = 600.
+farm_desvars = {
+    "x": [0., 0., extent, extent, extent/2, extent/2., extent/1.25],
+    "y": [0, extent, 0., extent, 0., extent, 200.],
+}
+farm_bounds = {
+    "x": np.array([[0.0, extent]] * 7),
+    "y": np.array([[0.0, extent]] * 7),
+}
+
+
+def farm_model(input_file, n_wd, n_ws, eval_cache=None):
+    prod = load_study("03_plant_design")
+    wd = np.linspace(0, 360, n_wd)
+    ws = np.linspace(0, 26, n_ws)
+    return prod.FarmModel(farm_desvars, None, input_file=input_file, wd=wd, ws=ws, eval_cache=eval_cache)
+
+
+@case("plant.farm_jensen", n_calls=100)
+def farm_jensen():
+    """Low-fidelity FarmModel on the coarse wind rose of run_multifidelity.py."""
+    model = farm_model("jensen_input.json", 6, 5)
+    designs = perturbed(farm_desvars, 100, 50.)
+    return lambda i: model.compute(designs[i % len(designs)])
+
+
+@case("plant.farm_gch", n_calls=100)
+def farm_gch():
+    """High-fidelity FarmModel on the fine wind rose of run_multifidelity.py."""
+    model = farm_model("gch_input.json", 18, 14)
+    designs = perturbed(farm_desvars, 100, 50.)
+    return lambda i: model.compute(designs[i % len(designs)])
+
+
+@case("plant.farm_cached", n_calls=100)
+def farm_cached():
+    """FarmModel served from a warm evaluation cache, i.e. the cost of a cache hit."""
+    from mf_utils.eval_cache import EvalCache
+
+    cache = EvalCache(os.path.join(tempfile.mkdtemp(prefix="mf_benchmarks_cache_"), "eval_cache.sqlite"))
+    model = farm_model("jensen_input.json", 6, 5, eval_cache=cache)
+    designs = perturbed(farm_desvars, 10, 50.)
+    for design in designs:
+        model.compute(design)
+    return lambda i: model.compute(designs[i % len(designs)])
+
+
+@case("plant.om_wrapper", n_calls=5)
+def plant_om_wrapper():
+    """Run-script OpenMDAO wrapper around FarmModel, one run_model and FD totals per call."""
+    model = farm_model("jensen_input.json", 6, 5)
+    desvars = {key: np.array(value) for key, value in farm_desvars.items()}
+    p = om_problem(ModelComp(model=model, desvars=desvars, output_names=["AEP", "turb_spacing"]), desvars)
+    p.model.add_objective("AEP", ref=-10.)
+    p.model.add_constraint("turb_spacing", upper=0.)
+    p.setup()
+
+    def call(i):
+        p.run_model()
+        return p.compute_totals()
+
+    return call
+
+
+@case("plant.trust_region", n_calls=1)
+def plant_trust_region():
+    """Trust region loop between the Jensen and GCH farm models, shortened from run_multifidelity.py."""
+    trust_region_module = importlib.import_module("weis.multifidelity.methods.trust_region")
+    model_low = farm_model("jensen_input.json", 6, 5)
+    model_high = farm_model("gch_input.json", 18, 14)
+
+    def call(i):
+        np.random.seed(123)
+        trust_region = trust_region_module.SimpleTrustRegion(
+            model_low, model_high, farm_bounds, disp=False, trust_radius=300., num_initial_points=20,
+        )
+        trust_region.add_objective("AEP", scaler=-0.1)
+        trust_region.add_constraint("turb_spacing", upper=0.0)
+        trust_region.set_initial_point(model_low.flatten_desvars(farm_desvars))
+        return trust_region.optimize(plot=False, num_iterations=3, num_basinhop_iterations=1)
+
+    return call
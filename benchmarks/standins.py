@@ -0,0 +1,812 @@
+"""
+Deterministic local stand-ins for the solvers the case studies call.
+
+`install()` registers modules under the import paths used by the three
+studies (`weis.*`, `wisdem.*`, `ROSCO_toolbox`, `pCrunch`, `floris.tools`,
+`mpi4py`), so the studies' own code imports and runs unchanged. The stand-ins
+for `run_weis`, `runFAST_pywrapper_batch`, `LinearTurbineModel.solve` and
+`FlorisInterface` return smooth synthetic outputs of the design variables and
+spend a configurable synthetic solver time. Everything else only provides
+what the studies touch.
+
+The synthetic solver time of every call is tallied in `costs`, so the
+benchmarks can separate the glue code overhead from the (fake) solver time.
+The outputs are only meant to be plausible, not physical.
+"""
+import os
+import re
+import sys
+import time
+import types
+import importlib.machinery
+import hashlib
+import tempfile
+import numpy as np
+import yaml
+from scipy.signal import lfilter
+
+
+class SyntheticCost(object):
+    """
+    Synthetic solver time spent by a stand-in on each call.
+
+    With mode="sleep" the process idles, which keeps the glue code timings
+    clean. With mode="spin" it burns CPU like a real solver would.
+    """
+
+    def __init__(self, seconds=0.0, mode="sleep"):
+        self.seconds = seconds
+        self.mode = mode
+        self.total = 0.0
+        self.calls = 0
+
+    def __call__(self, n=1):
+        seconds = self.seconds * n
+        s = time.perf_counter()
+        if seconds > 0.0:
+            if self.mode == "spin":
+                while time.perf_counter() - s < seconds:
+                    pass
+            else:
+                time.sleep(seconds)
+        self.total += time.perf_counter() - s
+        self.calls += n
+
+
+# Synthetic cost of one call of each stand-in, in seconds. FLORIS and
+# OpenFAST linearizations are charged per wind condition.
+costs = {
+    "run_weis": SyntheticCost(2.e-3),
+    "openfast": SyntheticCost(5.e-3),
+    "linearization": SyntheticCost(5.e-3),
+    "linear": SyntheticCost(1.e-3),
+    "turbsim": SyntheticCost(0.0),
+    "tuning": SyntheticCost(5.e-3),
+    "floris": SyntheticCost(1.e-5),
+}
+
+
+def configure(mode=None, **seconds):
+    for name, value in seconds.items():
+        if name not in costs:
+            raise ValueError(f"Unknown stand-in {name}, use one of {sorted(costs)}.")
+        costs[name].seconds = value
+    if mode is not None:
+        for cost in costs.values():
+            cost.mode = mode
+
+
+def reset_costs():
+    for cost in costs.values():
+        cost.total = 0.0
+        cost.calls = 0
+
+
+def solver_time():
+    return sum(cost.total for cost in costs.values())
+
+
+def seeded_rng(*values):
+    digest = hashlib.sha256(repr(values).encode()).digest()
+    return np.random.default_rng(int.from_bytes(digest[:8], "little"))
+
+
+def not_provided(name):
+    """
+    Class for a solver entry point the benchmarks never call.
+    """
+
+    def __init__(self, *args, **kwargs):
+        raise NotImplementedError(f"{name} is not provided by the benchmark stand-ins.")
+
+    return type(name.split(".")[-1], (object,), {"__init__": __init__})
+
+
+## WEIS and WISDEM, blade study
+
+n_span = 30
+n_opt = 6
+
+
+class StandinProblem(object):
+    """
+    The parts of a WEIS OpenMDAO problem that the blade models read and set.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.values["blade.opt_var.twist_opt_gain"] = np.full(n_opt, 0.55)
+        self.values["blade.opt_var.chord_opt_gain"] = np.ones(n_opt)
+        self.values["ccblade.r"] = np.linspace(3.0, 120.0, n_span)
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def __setitem__(self, key, value):
+        self.values[key] = np.array(value, dtype=float)
+
+    def get_val(self, key, units=None):
+        return self.values[key]
+
+    def run_model(self):
+        costs["run_weis"]()
+
+        twist = self.values["blade.opt_var.twist_opt_gain"]
+        chord = self.values["blade.opt_var.chord_opt_gain"]
+        s = np.linspace(0.0, 1.0, n_span)
+        chord_span = np.interp(s, np.linspace(0.0, 1.0, n_opt), chord)
+
+        CP = 0.49 - 0.04 * np.sum((chord - 1.0) ** 2) - 0.08 * np.sum((twist - 0.55) ** 2)
+        power = 0.5 * 1.225 * np.pi * 120.0 ** 2 * 10.59 ** 3 * CP
+        root_moment = 1.e5 * np.sum(chord_span * s) / n_span * (1.0 + 0.1 * np.mean(twist))
+        stall_margin = 0.8 - 0.3 * np.interp(s, np.linspace(0.0, 1.0, n_opt), twist)
+
+        self.values["ccblade.CP"] = np.array([CP])
+        self.values["ccblade.P"] = np.array([power])
+        self.values["ccblade.M"] = np.array([root_moment])
+        self.values["rp.AEP"] = np.array([80.0 * CP / 0.49])
+        self.values["stall_check.no_stall_constraint"] = stall_margin
+        self.values["aeroelastic.Cp_out"] = np.array([0.98 * CP])
+        self.values["aeroelastic.P_aero_out"] = np.array([0.98 * power])
+        self.values["aeroelastic.P_out"] = np.array([0.96 * power])
+        self.values["aeroelastic.AEP"] = np.array([0.98 * 80.0 * CP / 0.49])
+        self.values["aeroelastic.max_RootMyb"] = np.array([1.1 * root_moment])
+        self.values["stall_check_of.no_stall_constraint"] = stall_margin
+
+
+def set_standin_value(wt_opt, key, value):
+    # Values are dicts with an `idx_start` or arrays for the last entries
+    full_value = np.array(wt_opt[key], dtype=float)
+    if isinstance(value, dict):
+        start = value.get("idx_start", 0)
+        value = np.atleast_1d(value["values"])
+    else:
+        value = np.atleast_1d(value)
+        start = len(full_value) - len(value)
+    full_value[start : start + len(value)] = value
+    wt_opt[key] = full_value
+
+
+def run_weis(fname_wt_input, fname_modeling_options, fname_analysis_options, overridden_values=None):
+    wt_opt = StandinProblem()
+    if overridden_values is not None:
+        for key in overridden_values:
+            set_standin_value(wt_opt, key, overridden_values[key])
+    wt_opt.run_model()
+    return wt_opt, {}, {}
+
+
+def load_yaml(fname_input, package=0):
+    with open(fname_input, "r") as f:
+        return yaml.safe_load(f)
+
+
+def save_yaml(outdir, fname, data_out):
+    os.makedirs(outdir, exist_ok=True)
+    with open(os.path.join(outdir, fname), "w") as f:
+        yaml.safe_dump(to_builtin(data_out), f)
+
+
+def to_builtin(data):
+    if isinstance(data, dict):
+        return {key: to_builtin(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [to_builtin(value) for value in data]
+    if isinstance(data, np.ndarray):
+        return data.tolist()
+    if isinstance(data, np.generic):
+        return data.item()
+    return data
+
+
+## ROSCO, OpenFAST and pCrunch, controls study
+
+
+class Turbine(object):
+    def __init__(self, turbine_params):
+        self.turbine_params = turbine_params
+
+    def load_from_fast(self, FAST_InputFile, FAST_directory, dev_branch=True, **kwargs):
+        self.fast_file = os.path.join(FAST_directory, FAST_InputFile)
+        self.rotor_radius = 120.0
+        self.rated_rotor_speed = 7.56
+
+
+def standin_plant(v):
+    # Rotor speed plant A and pitch input B_beta of the stand-in turbine
+    return -0.02 * (v - 10.59), -2.5 - 0.05 * (v - 10.59)
+
+
+class ControllerTypes(object):
+    def second_order_PI(self, zeta, om_n, A, B, linearize=False, v=None):
+        if linearize:
+            pA = np.polyfit(v, A, 1)
+            pB = np.polyfit(v, B, 1)
+            A = pA[0] * v + pA[1]
+            B = pB[0] * v + pB[1]
+        self.Kp = 1 / B * (2 * zeta * om_n + A)
+        self.Ki = om_n ** 2 / B
+
+
+class Controller(object):
+    def __init__(self, controller_params):
+        self.controller_params = controller_params
+        self.omega_pc = controller_params.get("omega_pc", 0.15)
+        self.zeta_pc = controller_params.get("zeta_pc", 0.7)
+
+    def tune_controller(self, turbine):
+        costs["tuning"]()
+        self.turbine = turbine
+        self.v_below_rated = np.linspace(4.0, 10.59, 8)
+        self.v_above_rated = np.linspace(10.59, 25.0, 16)
+        self.v = np.concatenate((self.v_below_rated, self.v_above_rated[1:]))
+        self.A, self.B_beta = standin_plant(self.v)
+
+        n_pc = len(self.v_above_rated) - 1
+        self.omega_pc_U = float(np.squeeze(self.omega_pc)) * np.ones(n_pc)
+        self.zeta_pc_U = self.zeta_pc * np.ones(n_pc)
+        self.pc_gain_schedule = ControllerTypes()
+        self.pc_gain_schedule.second_order_PI(
+            self.zeta_pc_U, self.omega_pc_U, self.A[-n_pc:], self.B_beta[-n_pc:], linearize=True, v=self.v_above_rated[1:]
+        )
+
+
+def DISCON_dict(turbine, controller, txt_filename=None):
+    DISCON_dict = {}
+    DISCON_dict["PC_GS_angles"] = np.linspace(0.0, 0.4, len(controller.pc_gain_schedule.Kp))
+    DISCON_dict["PC_GS_KP"] = controller.pc_gain_schedule.Kp
+    DISCON_dict["PC_GS_KI"] = controller.pc_gain_schedule.Ki
+    DISCON_dict["PC_RefSpd"] = turbine.rated_rotor_speed
+    return DISCON_dict
+
+
+def omega_pc_from_case(case):
+    # Invert the stand-in gain schedule at the first above rated wind speed, zeta_pc = 0.7
+    kp = np.atleast_1d(case.get(("DISCON_in", "PC_GS_KP"), [-0.084]))[0]
+    A, B_beta = standin_plant(np.linspace(10.59, 25.0, 16)[1])
+    return (kp * B_beta - A) / (2 * 0.7)
+
+
+class CaseGen_IEC(object):
+    def __init__(self):
+        self.dlc_inputs = {}
+        self.case_name_base = "case"
+        self.wind_dir = ""
+        self.TMax = 800.0
+
+    def execute(self, case_inputs={}):
+        costs["turbsim"]()
+
+        case_list = []
+        case_name_list = []
+        dlc_list = []
+        for i_dlc, dlc in enumerate(self.dlc_inputs["DLC"]):
+            seeds = self.dlc_inputs["Seeds"][i_dlc]
+            for U in self.dlc_inputs["U"][i_dlc]:
+                for seed in seeds:
+                    case = {}
+                    for key, value in case_inputs.items():
+                        case[key] = value["vals"][0]
+                    case[("InflowWind", "HWindSpeed")] = U
+                    wind_file = os.path.join(self.wind_dir, f"{self.case_name_base}_U{U}_Seed{seed}.bts")
+                    if not os.path.isfile(wind_file):
+                        # Small placeholder, TurbSimFile synthesizes the wind from the name
+                        os.makedirs(self.wind_dir, exist_ok=True)
+                        with open(wind_file, "w") as f:
+                            f.write(f"U {U} seed {seed}\n")
+                    case[("InflowWind", "FileName_BTS")] = wind_file
+                    case_list.append(case)
+                    case_name_list.append(f"{self.case_name_base}_{len(case_list) - 1}")
+                    dlc_list.append(dlc)
+
+        return case_list, case_name_list, dlc_list
+
+
+def CaseGen_General(case_inputs, dir_matrix="", namebase="", save_matrix=True):
+    return [], []
+
+
+class TurbSimFile(dict):
+    """
+    Turbulent inflow read from a TurbSim file, synthesized from the file name.
+    """
+
+    dt = 0.05
+    TMax = 800.0
+
+    def __init__(self, filename=None):
+        super(TurbSimFile, self).__init__()
+        self.filename = str(filename)
+        match = re.search(r"_U([0-9.]+)_", os.path.basename(self.filename))
+        self.U = float(match.group(1)) if match else 16.0
+        self["t"] = np.arange(0.0, self.TMax, self.dt)
+
+    def compute_rot_avg(self, R):
+        rng = seeded_rng(self.filename, R)
+        n_t = len(self["t"])
+        # Turbulence as low-pass filtered noise with ~12% intensity
+        noise = rng.standard_normal((3, n_t))
+        alpha = 0.02
+        turbulence = lfilter([alpha], [1.0, alpha - 1.0], noise, axis=1)
+        turbulence *= 0.12 * self.U / np.std(turbulence[0])
+        self["rot_avg"] = turbulence
+        self["rot_avg"][0] += self.U
+
+
+def synthetic_response(t, wind, omega_pc, nonlinear=False):
+    """
+    Channels of a closed-loop floating turbine response to rotor-averaged
+    wind. A faster pitch loop (larger omega_pc) tracks rotor speed better but
+    moves the platform and tower more.
+    """
+    omega_pc = float(np.squeeze(omega_pc))
+    dt = t[1] - t[0]
+    wind_dev = wind - np.mean(wind)
+    alpha = min(1.0, 2 * np.pi * omega_pc * dt)
+    tracked = lfilter([alpha], [1.0, alpha - 1.0], wind_dev)
+    speed_error = wind_dev - tracked
+    if nonlinear:
+        speed_error = speed_error + 0.01 * speed_error ** 2
+
+    out = {}
+    out["Time"] = t
+    out["RtVAvgxh"] = wind
+    out["GenSpeed"] = 7.56 + 0.35 * speed_error
+    out["BldPitch1"] = 10.0 + 1.5 * tracked
+    out["PtfmPitch"] = 3.0 + (0.4 + 2.0 * omega_pc) * tracked
+    out["TwrBsMyt"] = 1.e5 * (1.0 + (0.2 + 0.5 * omega_pc) * tracked / np.mean(wind))
+    return out
+
+
+class LinearFAST(object):
+    def __init__(self, FAST_ver="OpenFAST", dev_branch=True, **kwargs):
+        self.wind_speeds = []
+        self.cores = 1
+
+    def gen_linear_model(self):
+        costs["linearization"](len(self.wind_speeds))
+        self.case_name_list = [f"lin_{i}" for i in range(len(self.wind_speeds))]
+
+
+class LinearControlModel(object):
+    def __init__(self, controller, fn_param=None):
+        self.omega_pc = controller.omega_pc
+
+
+class LinearTurbineModel(object):
+    def __init__(self, lin_file_dir, lin_file_names, nlin=12, reduceStates=False, **kwargs):
+        self.lin_file_dir = lin_file_dir
+        self.lin_file_names = lin_file_names
+
+    def solve(self, disturbance, Plot=False, open_loop=True, controller=None):
+        costs["linear"]()
+        omega_pc = controller.omega_pc if controller is not None else 0.15
+        out = synthetic_response(disturbance["Time"], disturbance["Wind"], omega_pc)
+        return out, None, None
+
+
+class runFAST_pywrapper_batch(object):
+    def __init__(self, FAST_ver="OpenFAST", dev_branch=True, **kwargs):
+        self.case_list = []
+        self.case_name_list = []
+        self.channels = {}
+
+    def run_case(self, case, case_name):
+        costs["openfast"]()
+        ts_file = TurbSimFile(case[("InflowWind", "FileName_BTS")])
+        ts_file.compute_rot_avg(120.0)
+        out = synthetic_response(ts_file["t"], ts_file["rot_avg"][0, :], omega_pc_from_case(case), nonlinear=True)
+        if getattr(self, "post", None) is None:
+            return out
+
+        # Write every requested channel like OpenFAST would and read it back
+        rng = seeded_rng(case_name)
+        channels = {"Time": out["Time"]}
+        for chan in list(out) + [chan for chan, on in self.channels.items() if on]:
+            channels[chan] = out[chan] if chan in out else rng.standard_normal(len(out["Time"]))
+        os.makedirs(self.FAST_runDirectory, exist_ok=True)
+        fname = os.path.join(self.FAST_runDirectory, case_name + ".outb")
+        write_outb(fname, channels)
+        return self.post(fname)
+
+    def run_serial(self):
+        return [self.run_case(case, case_name) for case, case_name in zip(self.case_list, self.case_name_list)]
+
+    def run_multi(self, cores=None):
+        return self.run_serial()
+
+    def run_mpi(self, mpi_comm_map_down=None):
+        return self.run_serial()
+
+
+def write_outb(fname, channels, file_id=2):
+    """
+    Write a dict of time series, with "Time" first, in the OpenFAST binary
+    output format. file_id 2 packs the channels to int16, 3 keeps float64.
+    """
+    names = [name for name in channels if name != "Time"]
+    t = np.asarray(channels["Time"], dtype=float)
+    data = np.column_stack([channels[name] for name in names]).astype(float)
+    n_t, n_chans = data.shape
+
+    if file_id == 3:
+        col_scl = np.ones(n_chans, dtype=np.float32)
+        col_off = np.zeros(n_chans, dtype=np.float32)
+        packed = data.astype("<f8")
+    else:
+        span = data.max(axis=0) - data.min(axis=0)
+        col_scl = np.where(span > 0, 65534.0 / np.where(span > 0, span, 1.0), 1.0).astype(np.float32)
+        col_off = (-32767.0 - data.min(axis=0) * col_scl).astype(np.float32)
+        packed = np.clip(np.round(data * col_scl + col_off), -32768, 32767).astype("<i2")
+
+    def padded(text):
+        return text.ljust(10)[:10].encode()
+
+    with open(fname, "wb") as f:
+        f.write(np.array([file_id], dtype="<i2").tobytes())
+        f.write(np.array([n_chans, n_t], dtype="<i4").tobytes())
+        f.write(np.array([t[0], t[1] - t[0]], dtype="<f8").tobytes())
+        if file_id != 3:
+            f.write(col_scl.astype("<f4").tobytes())
+            f.write(col_off.astype("<f4").tobytes())
+        description = b"Benchmark stand-in output"
+        f.write(np.array([len(description)], dtype="<i4").tobytes())
+        f.write(description)
+        for name in ["Time"] + names:
+            f.write(padded(name))
+        for name in ["Time"] + names:
+            f.write(padded("(-)"))
+        f.write(packed.tobytes())
+
+
+def FAST_IO_timeseries(fname):
+    raise NotImplementedError("FAST_IO_timeseries is not provided by the benchmark stand-ins.")
+
+
+## FLORIS, plant study
+
+
+class FlorisInterface(object):
+    def __init__(self, input_file=None, input_dict=None):
+        self.input_file = input_file
+        self.gch = False
+        self.layout_x = np.zeros(1)
+        self.layout_y = np.zeros(1)
+
+    def set_gch(self, enable=True):
+        self.gch = enable
+
+    def reinitialize_flow_field(self, layout_array=None, wind_speed=None, wind_direction=None, **kwargs):
+        if layout_array is not None:
+            self.layout_x = np.array(layout_array[0], dtype=float)
+            self.layout_y = np.array(layout_array[1], dtype=float)
+
+    def calculate_wake(self, yaw_angles=None, no_wake=False):
+        costs["floris"]()
+
+    def wake_losses(self, wd):
+        """
+        Fraction of the free stream speed each turbine sees, for each wind
+        direction, from a top-hat Jensen wake.
+        """
+        D = 240.0
+        k = 0.05 if self.gch else 0.075
+        theta = np.deg2rad(270.0 - np.asarray(wd, dtype=float))[:, np.newaxis]
+        # Coordinates along and across the wind for every direction
+        along = self.layout_x * np.cos(theta) + self.layout_y * np.sin(theta)
+        across = -self.layout_x * np.sin(theta) + self.layout_y * np.cos(theta)
+        dx = along[:, np.newaxis, :] - along[:, :, np.newaxis]
+        dy = np.abs(across[:, np.newaxis, :] - across[:, :, np.newaxis])
+        wake_radius = D / 2 + k * np.maximum(dx, 0.0)
+        waked = (dx > 0.0) & (dy < wake_radius)
+        deficit = np.where(waked, (1.0 - np.sqrt(1.0 - 0.8)) * (D / 2 / wake_radius) ** 2, 0.0)
+        return 1.0 - np.sqrt(np.sum(deficit ** 2, axis=1))
+
+
+def turbine_power(ws):
+    ws = np.asarray(ws, dtype=float)
+    power = 15.e6 * np.clip((ws - 3.0) / (10.59 - 3.0), 0.0, 1.0) ** 3
+    return np.where(ws > 25.0, 0.0, power)
+
+
+class YawOptimizationWindRose(object):
+    def __init__(self, fi, wd, ws, minimum_ws=3.0, **kwargs):
+        self.fi = fi
+        self.wd = np.asarray(wd, dtype=float)
+        self.ws = np.asarray(ws, dtype=float)
+        self.minimum_ws = minimum_ws
+
+    def calc_baseline_power(self):
+        costs["floris"](len(self.wd))
+        speed_fraction = self.fi.wake_losses(self.wd)
+        n_turbines = speed_fraction.shape[1]
+        active = self.ws >= self.minimum_ws
+
+        df_base = {}
+        df_base["wd"] = self.wd
+        df_base["ws"] = self.ws
+        df_base["power_no_wake"] = np.where(active, n_turbines * turbine_power(self.ws), 0.0)
+        df_base["power_baseline"] = np.where(
+            active, np.sum(turbine_power(self.ws[:, np.newaxis] * speed_fraction), axis=1), 0.0
+        )
+        return df_base
+
+
+class WindRoseFrame(object):
+    def __init__(self, wd, ws, freq_val):
+        self.wd = wd
+        self.ws = ws
+        self.freq_val = freq_val
+
+
+class WindRose(object):
+    def make_wind_rose_from_weibull(self, wd=np.arange(0, 360, 5.0), ws=np.arange(0, 26, 1.0)):
+        wd_grid, ws_grid = np.meshgrid(np.asarray(wd, dtype=float), np.asarray(ws, dtype=float), indexing="ij")
+        # Weibull with k=2 and a 8 m/s scale, uniform in direction
+        freq = (2.0 / 8.0) * (ws_grid / 8.0) * np.exp(-((ws_grid / 8.0) ** 2))
+        freq = freq / np.sum(freq)
+        return WindRoseFrame(wd_grid.ravel(), ws_grid.ravel(), freq.ravel())
+
+
+class PowerRose(object):
+    def make_power_rose_from_user_data(self, name, df_windrose, power_no_wake, power_baseline, power_opt=None):
+        self.name = name
+        freq = df_windrose.freq_val
+        # Energy in GWh per year
+        self.total_no_wake = np.sum(freq * power_no_wake) * 8760.0 / 1.e9
+        self.total_baseline = np.sum(freq * power_baseline) * 8760.0 / 1.e9
+
+
+## Multifidelity base classes, used when the WEIS branch is not installed
+
+
+class BaseModel(object):
+    """
+    The parts of `weis.multifidelity.models.base_model.BaseModel` the studies
+    and the stand-in trust region use. Nothing is saved to disk.
+    """
+
+    def __init__(self, desvars_init, warmstart_file=None, calls_between_saving=1):
+        self.desvars_init = {}
+        for key, value in desvars_init.items():
+            if isinstance(value, dict):
+                value = value["values"]
+            self.desvars_init[key] = np.atleast_1d(np.array(value, dtype=float))
+        self.warmstart_file = warmstart_file
+        self.calls_between_saving = calls_between_saving
+        self.saved_desvars = []
+        self.saved_outputs = []
+
+    def flatten_desvars(self, desvars):
+        flattened = []
+        for key in self.desvars_init:
+            value = desvars[key]
+            if isinstance(value, dict):
+                value = value["values"]
+            flattened.append(np.atleast_1d(np.array(value, dtype=float)))
+        return np.concatenate(flattened)
+
+    def unflatten_desvars(self, flattened_desvars):
+        desvars = {}
+        i = 0
+        for key, value in self.desvars_init.items():
+            desvars[key] = np.array(flattened_desvars[i : i + value.size]).reshape(value.shape)
+            i += value.size
+        return desvars
+
+    def compute(self, desvars):
+        raise NotImplementedError()
+
+    def run(self, flattened_desvars):
+        outputs = self.compute(self.unflatten_desvars(flattened_desvars))
+        self.saved_desvars.append(np.array(flattened_desvars))
+        self.saved_outputs.append(outputs)
+        return outputs
+
+
+class SimpleTrustRegion(object):
+    """
+    Trust region loop with the same call pattern as the WEIS one: initial
+    samples of both models, then per iteration an optimization of the
+    corrected low-fidelity model inside the trust region and one
+    high-fidelity evaluation. It is not WEIS's algorithm, only a stand-in
+    to time the models and their wrappers inside such a loop.
+    """
+
+    def __init__(self, model_low, model_high, bounds, disp=False, trust_radius=0.2, num_initial_points=5, **kwargs):
+        self.model_low = model_low
+        self.model_high = model_high
+        self.bounds = np.vstack([np.atleast_2d(bounds[key]) for key in model_low.desvars_init])
+        self.trust_radius = trust_radius
+        self.num_initial_points = num_initial_points
+        self.objective = None
+        self.objective_scaler = 1.0
+        self.constraints = []
+        self.x = np.mean(self.bounds, axis=1)
+
+    def add_objective(self, name, scaler=1.0):
+        self.objective = name
+        self.objective_scaler = scaler
+
+    def add_constraint(self, name, lower=None, upper=None, equals=None):
+        self.constraints.append((name, lower, upper, equals))
+
+    def set_initial_point(self, x):
+        self.x = np.array(x, dtype=float)
+
+    def optimize(self, plot=False, num_iterations=5, num_basinhop_iterations=False, **kwargs):
+        from scipy.optimize import minimize
+
+        rng = np.random.default_rng(123)
+        lower, upper = self.bounds[:, 0], self.bounds[:, 1]
+        for i in range(self.num_initial_points):
+            x = lower + (upper - lower) * rng.random(len(lower))
+            self.model_low.run(x)
+            self.model_high.run(x)
+
+        def corrected(x, name, correction):
+            return np.squeeze(self.model_low.run(x)[name]) + correction[name]
+
+        for i in range(num_iterations):
+            outputs_low = self.model_low.run(self.x)
+            outputs_high = self.model_high.run(self.x)
+            correction = {}
+            # Like WEIS, only the objective and constraints are corrected
+            for name in [self.objective] + [constraint[0] for constraint in self.constraints]:
+                correction[name] = np.squeeze(outputs_high[name]) - np.squeeze(outputs_low[name])
+
+            scale = self.trust_radius * (upper - lower)
+            sub_bounds = list(zip(np.maximum(lower, self.x - scale), np.minimum(upper, self.x + scale)))
+            constraints = []
+            for name, lo, up, eq in self.constraints:
+                if up is not None:
+                    constraints.append({"type": "ineq", "fun": lambda x, n=name, u=up: u - corrected(x, n, correction)})
+                if lo is not None:
+                    constraints.append({"type": "ineq", "fun": lambda x, n=name, l=lo: corrected(x, n, correction) - l})
+
+            result = minimize(
+                lambda x: self.objective_scaler * corrected(x, self.objective, correction),
+                self.x,
+                method="SLSQP",
+                bounds=sub_bounds,
+                constraints=constraints,
+                options={"maxiter": 20},
+            )
+
+            predicted = self.objective_scaler * corrected(self.x, self.objective, correction) - result.fun
+            actual = self.objective_scaler * (
+                np.squeeze(outputs_high[self.objective]) - np.squeeze(self.model_high.run(result.x)[self.objective])
+            )
+            ratio = actual / predicted if predicted != 0.0 else 0.0
+            if ratio > 0.0:
+                self.x = result.x
+            self.trust_radius *= 2.0 if ratio > 0.75 else (0.25 if ratio < 0.25 else 1.0)
+
+        return self.x
+
+
+## Registration
+
+
+def standin_weis_dir():
+    """
+    Folder laid out like a WEIS checkout with the files MF_Turbine opens.
+    """
+    weis_dir = tempfile.mkdtemp(prefix="mf_benchmarks_")
+    os.makedirs(os.path.join(weis_dir, "weis"))
+    open(os.path.join(weis_dir, "weis", "__init__.py"), "w").close()
+
+    tune_dir = os.path.join(weis_dir, "ROSCO_toolbox", "Tune_Cases")
+    os.makedirs(tune_dir)
+    tune_case = {
+        "path_params": {},
+        "turbine_params": {"rotor_inertia": 3.5e8},
+        "controller_params": {"omega_pc": 0.15, "zeta_pc": 0.7},
+    }
+    with open(os.path.join(tune_dir, "IEA15MW.yaml"), "w") as f:
+        yaml.safe_dump(tune_case, f)
+
+    return weis_dir
+
+
+def register(name, **attrs):
+    module = types.ModuleType(name)
+    module.__path__ = []
+    # A spec, so that `importlib.util.find_spec` works on the stand-ins
+    module.__spec__ = importlib.machinery.ModuleSpec(name, None, is_package=True)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    parent, _, child = name.rpartition(".")
+    if parent:
+        if parent not in sys.modules:
+            register(parent)
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+def install():
+    """
+    Register the stand-ins in `sys.modules`. The WEIS multifidelity base
+    model and trust region are kept if they can be imported, so their
+    overhead is part of the benchmarks. Returns a dict describing the setup.
+    """
+    try:
+        from weis.multifidelity.models.base_model import BaseModel as base_model
+        from weis.multifidelity.methods.trust_region import SimpleTrustRegion as trust_region
+        real_multifidelity = True
+    except ImportError:
+        base_model = BaseModel
+        trust_region = SimpleTrustRegion
+        real_multifidelity = False
+
+    # Keep OpenMDAO from picking up the single rank mpi4py stand-in
+    os.environ["OPENMDAO_USE_MPI"] = "0"
+
+    weis_dir = standin_weis_dir()
+
+    if not real_multifidelity:
+        register("weis", __file__=os.path.join(weis_dir, "weis", "__init__.py"))
+        register("weis.multifidelity.models.base_model", BaseModel=base_model)
+        register("weis.multifidelity.methods.trust_region", SimpleTrustRegion=trust_region)
+
+    # Blade study
+    register("mpi4py", MPI=types.SimpleNamespace(COMM_WORLD=SingleRankComm()))
+    register("wisdem.commonse.mpi_tools", MPI=None)
+    register("weis.glue_code.runWEIS", run_weis=run_weis)
+    register("weis.aeroelasticse.Util.FileTools", load_yaml=load_yaml, save_yaml=save_yaml)
+    register(
+        "wisdem.ccblade.ccblade",
+        CCBlade=not_provided("wisdem.ccblade.ccblade.CCBlade"),
+        CCAirfoil=not_provided("wisdem.ccblade.ccblade.CCAirfoil"),
+    )
+    register("wisdem.ccblade._bem")
+    register("wisdem.ccblade.ccblade_component", CCBladeTwist=not_provided("CCBladeTwist"))
+    register("wisdem.rotorse.rotor_power", RotorPower=not_provided("RotorPower"), NoStallConstraint=not_provided("NoStallConstraint"))
+    register("wisdem.commonse.turbine_class", TurbineClass=not_provided("TurbineClass"))
+    register("wisdem.glue_code.gc_WT_DataStruc", WindTurbineOntologyOpenMDAO=not_provided("WindTurbineOntologyOpenMDAO"))
+    register("wisdem.glue_code.gc_WT_InitModel", yaml2openmdao=not_provided("yaml2openmdao"))
+    register("weis.glue_code.gc_LoadInputs", WindTurbineOntologyPythonWEIS=not_provided("WindTurbineOntologyPythonWEIS"))
+    register("weis.glue_code.gc_PoseOptimization", PoseOptimizationWEIS=not_provided("PoseOptimizationWEIS"))
+
+    # Controls study
+    register("weis.aeroelasticse.runFAST_pywrapper", runFAST_pywrapper_batch=runFAST_pywrapper_batch)
+    register("weis.aeroelasticse.CaseGen_General", CaseGen_General=CaseGen_General)
+    register("weis.aeroelasticse.CaseGen_IEC", CaseGen_IEC=CaseGen_IEC)
+    register(
+        "weis.aeroelasticse.FAST_reader",
+        InputReader_Common=not_provided("InputReader_Common"),
+        InputReader_OpenFAST=not_provided("InputReader_OpenFAST"),
+        InputReader_FAST7=not_provided("InputReader_FAST7"),
+    )
+    register("weis.aeroelasticse.LinearFAST", LinearFAST=LinearFAST)
+    register("weis.aeroelasticse.FAST_post", FAST_IO_timeseries=FAST_IO_timeseries)
+    register("weis.aeroelasticse.Turbsim_mdao.turbsim_file", TurbSimFile=TurbSimFile)
+    register("weis.control.LinearModel", LinearTurbineModel=LinearTurbineModel, LinearControlModel=LinearControlModel)
+    register("pCrunch.Analysis")
+    register("pCrunch")
+    register("pCrunch.pdTools")
+    register("pCrunch.Processing")
+    register("ROSCO_toolbox.utilities", DISCON_dict=DISCON_dict)
+    register("ROSCO_toolbox.controller", Controller=Controller, ControllerTypes=ControllerTypes)
+    register("ROSCO_toolbox.turbine", Turbine=Turbine)
+
+    # Plant study
+    register("floris.tools.floris_interface", FlorisInterface=FlorisInterface)
+    register("floris.tools.wind_rose", WindRose=WindRose)
+    register("floris.tools.power_rose", PowerRose=PowerRose)
+    register("floris.tools.cut_plane")
+    register("floris.tools.visualization")
+    register("floris.tools.optimization.scipy.yaw_wind_rose", YawOptimizationWindRose=YawOptimizationWindRose)
+
+    return {"weis_dir": weis_dir, "real_multifidelity": real_multifidelity}
+
+
+class SingleRankComm(object):
+    def Get_rank(self):
+        return 0
+
+    def Get_size(self):
+        return 1
+
+    def Barrier(self):
+        pass
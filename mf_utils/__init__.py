@@ -0,0 +1,3 @@
+"""
+Helpers shared by the blade, controls and plant case studies.
+"""
@@ -0,0 +1,251 @@
+"""
+Content-addressed cache of model evaluations shared by all run scripts.
+
+A cached result is keyed on a hash of the model class, the Python sources of
+its models package, the versions of the solver packages, the contents of the
+model's input files (turbine yaml, modeling options, FLORIS json, ...), any
+extra settings such as the wind-rose grid, the model's `idx_start` and the
+design vector. Results live in a single SQLite file, so the low-, high- and
+multifidelity scripts of a study, and every MPI rank, reuse each other's
+evaluations. Once the file grows past `max_size` bytes the least recently used
+results are evicted.
+
+Caching is off unless asked for. The run scripts use the file named by the
+`MF_EVAL_CACHE` environment variable (see `env_cache`). The file has to be on
+a local disk: SQLite's WAL mode relies on shared memory that network and
+parallel filesystems (NFS, Lustre, GPFS) don't provide, so ranks on several
+nodes can't share one cache file. A lookup takes about 1-2 ms, so the cache
+only pays off for models slower than that, not e.g. the Jensen farm model.
+"""
+import os
+import time
+import pickle
+import sqlite3
+import hashlib
+import inspect
+import importlib.metadata
+from contextlib import closing
+import numpy as np
+
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+default_cache_file = os.path.join(repo_dir, "eval_cache.sqlite")
+default_max_size = 2 * 1024 ** 3
+
+# Packages whose version goes into every cache key
+versioned_packages = ["numpy", "scipy", "openmdao", "wisdem", "weis", "rosco", "rosco_toolbox", "floris"]
+
+# Digests of files that were already hashed, keyed on (path, size, mtime)
+_file_digests = {}
+
+
+def file_digest(fname):
+    fname = os.path.realpath(fname)
+    stat = os.stat(fname)
+    file_id = (fname, stat.st_size, stat.st_mtime_ns)
+    if file_id not in _file_digests:
+        sha = hashlib.sha256()
+        with open(fname, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha.update(chunk)
+        _file_digests[file_id] = sha.hexdigest()
+    return _file_digests[file_id]
+
+
+def has_text(values):
+    # Whether a (possibly nested) list holds strings or dicts, which can't go into a float array
+    for v in values:
+        if isinstance(v, (str, dict)) or (isinstance(v, (list, tuple)) and has_text(v)):
+            return True
+    return False
+
+
+def update_hash(sha, value):
+    """
+    Feed a (possibly nested) dict, list or array into a hashlib object in a
+    way that does not depend on dict ordering. Anything with `keys()`, such
+    as an OpenMDAO input vector, is treated like a dict.
+    """
+    if hasattr(value, "keys"):
+        for key in sorted(value.keys(), key=str):
+            sha.update(str(key).encode())
+            update_hash(sha, value[key])
+    elif isinstance(value, str):
+        sha.update(value.encode())
+    elif isinstance(value, (list, tuple)) and has_text(value):
+        for v in value:
+            update_hash(sha, v)
+    else:
+        array = np.asarray(value, dtype=float)
+        sha.update(str(array.shape).encode())
+        sha.update(np.ascontiguousarray(array).tobytes())
+
+
+def desvars_digest(desvars):
+    sha = hashlib.sha256()
+    update_hash(sha, desvars)
+    return sha.hexdigest()
+
+
+def package_versions():
+    versions = {}
+    for name in versioned_packages:
+        try:
+            versions[name] = importlib.metadata.version(name)
+        except importlib.metadata.PackageNotFoundError:
+            versions[name] = "not installed"
+    return versions
+
+
+def source_digest(cls):
+    """
+    Digest of the Python files in the folder of the module that defines
+    `cls`, i.e. the models package of a study.
+    """
+    folder = os.path.dirname(os.path.realpath(inspect.getsourcefile(cls)))
+    sha = hashlib.sha256()
+    for fname in sorted(os.listdir(folder)):
+        if fname.endswith(".py"):
+            sha.update(fname.encode())
+            sha.update(file_digest(os.path.join(folder, fname)).encode())
+    return sha.hexdigest()
+
+
+def env_cache():
+    """
+    The cache at `$MF_EVAL_CACHE`, or None to run without a cache if it
+    isn't set.
+    """
+    fname = os.environ.get("MF_EVAL_CACHE")
+    if not fname:
+        return None
+    return EvalCache(fname)
+
+
+def model_digest(model_name, input_files=(), extra=None):
+    sha = hashlib.sha256()
+    sha.update(model_name.encode())
+    for fname in input_files:
+        sha.update(file_digest(fname).encode())
+    if extra is not None:
+        update_hash(sha, extra)
+    return sha.hexdigest()
+
+
+class EvalCache(object):
+    """
+    SQLite-backed store of model outputs with size-bounded LRU eviction.
+
+    A new connection is opened for every access so the cache can be shared
+    between forked workers and MPI ranks on one node. Concurrent writers are
+    serialized by SQLite. `fname` must be on a local disk, see above.
+    """
+
+    def __init__(self, fname=default_cache_file, max_size=default_max_size):
+        self.fname = fname
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        with closing(self.connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS evals ("
+                "key TEXT PRIMARY KEY, model TEXT, outputs BLOB, "
+                "size INTEGER, last_access REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS evals_lru ON evals (last_access)")
+
+    def connect(self):
+        conn = sqlite3.connect(self.fname, timeout=120.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get(self, key):
+        with closing(self.connect()) as conn, conn:
+            row = conn.execute("SELECT outputs FROM evals WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE evals SET last_access = ? WHERE key = ?", (time.time(), key))
+
+        self.hits += 1
+        return pickle.loads(row[0])
+
+    def put(self, key, model_name, outputs):
+        blob = pickle.dumps(outputs, protocol=pickle.HIGHEST_PROTOCOL)
+        # Storing it would evict everything else, and then itself
+        if len(blob) > self.max_size:
+            return
+        with closing(self.connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO evals VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, blob, len(blob), time.time()),
+            )
+            self.evict(conn)
+
+    def evict(self, conn):
+        total_size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM evals").fetchone()[0]
+        if total_size <= self.max_size:
+            return
+
+        stale_keys = []
+        for key, size in conn.execute("SELECT key, size FROM evals ORDER BY last_access"):
+            if total_size <= self.max_size:
+                break
+            stale_keys.append((key,))
+            total_size -= size
+        conn.executemany("DELETE FROM evals WHERE key = ?", stale_keys)
+
+    def clear(self):
+        with closing(self.connect()) as conn, conn:
+            conn.execute("DELETE FROM evals")
+
+
+def all_finite(outputs):
+    # Whether all numeric values of an outputs dict are finite
+    for value in outputs.values():
+        try:
+            if not np.all(np.isfinite(np.asarray(value, dtype=float))):
+                return False
+        except (TypeError, ValueError):
+            continue
+    return True
+
+
+def cache_model(model, input_files=(), extra=None, cache=None):
+    """
+    Route `model.compute` through an evaluation cache.
+
+    `input_files` and `extra` should cover everything besides the design
+    vector, the model code, the package versions and `model.idx_start` that
+    changes the model outputs. `model.last_compute_cached` tells whether the
+    latest call was served from the cache. Outputs with inf or NaN values are
+    returned but not stored.
+    """
+    if cache is None or cache is True:
+        cache = EvalCache()
+
+    model_name = type(model).__name__
+    sha = hashlib.sha256()
+    sha.update(model_digest(model_name, input_files, extra).encode())
+    sha.update(source_digest(type(model)).encode())
+    update_hash(sha, package_versions())
+    if getattr(model, "idx_start", None) is not None:
+        update_hash(sha, {"idx_start": model.idx_start})
+    static_digest = sha.hexdigest()
+    compute = model.compute
+
+    def cached_compute(desvars):
+        key = hashlib.sha256((static_digest + desvars_digest(desvars)).encode()).hexdigest()
+        outputs = cache.get(key)
+        model.last_compute_cached = outputs is not None
+        if outputs is None:
+            outputs = compute(desvars)
+            if all_finite(outputs):
+                cache.put(key, model_name, outputs)
+        return outputs
+
+    model.compute = cached_compute
+    model.eval_cache = cache
+    model.last_compute_cached = False
+    return model
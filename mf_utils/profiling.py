@@ -0,0 +1,229 @@
+"""
+Per-call profiling of model evaluations.
+
+`profile_model` wraps `model.compute` like `cache_model` does and records the
+wall time, CPU time, CPU time of child processes (OpenFAST, TurbSim, ...),
+peak resident memory and whether the call was served from the evaluation
+cache.
+
+On Linux the peak resident memory is that of the call: the peak of the
+process is reset before each call through /proc/self/clear_refs and read from
+/proc/self/status after it. Elsewhere only the peak of the process so far is
+available (ru_maxrss), which never goes down, and the events say so with
+"peak_rss_scope". Child processes only report the peak of the largest child
+so far. Events are appended to a JSON-lines file as they happen, so a killed
+optimization still leaves its trace behind, and can be converted to the
+Chrome trace format to look at in chrome://tracing or Perfetto.
+
+The events are tagged with a fidelity level, e.g. "low" and "high", and
+`Profiler.summary` aggregates them per level, including the ratio of high to
+low fidelity cost the trust region actually sees.
+
+Profiling is off unless asked for. The run scripts profile into the file
+named by the `MF_PROFILE` environment variable, see `env_profiler`.
+"""
+import os
+import sys
+import json
+import time
+import resource
+import threading
+
+
+def max_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is in kB on Linux and in bytes on macOS
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / 1024.0 ** 2 if sys.platform == "darwin" else rss / 1024.0
+
+
+def reset_peak_rss():
+    """
+    Reset the peak resident memory of this process to the current one, so
+    `peak_rss_mb` gives the peak from here on. Returns False where that isn't
+    supported (not Linux, or Linux before 4.0).
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return peak_rss_mb() is not None
+
+
+def peak_rss_mb():
+    # Peak resident memory since the last reset_peak_rss, None without /proc
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+def children_cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Profiler(object):
+    """
+    Collects the profiling events of all models it's attached to.
+
+    With `fname` set, every event is also appended to that JSON-lines file.
+    Ranks and forked workers each append whole lines, so they can share a file.
+    """
+
+    def __init__(self, fname=None):
+        self.fname = fname
+        self.events = []
+        self.t_start = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def record(self, event):
+        with self.lock:
+            self.events.append(event)
+            if self.fname is not None:
+                with open(self.fname, "a") as f:
+                    f.write(json.dumps(event) + "\n")
+
+    def summary(self):
+        """
+        Totals and means per fidelity level. The mean times only count calls
+        that were actually computed, not the cache hits.
+        """
+        levels = {}
+        for event in self.events:
+            level = levels.setdefault(
+                event["fidelity"],
+                {"models": [], "calls": 0, "cache_hits": 0, "wall": 0.0, "cpu": 0.0, "children_cpu": 0.0, "peak_rss_mb": 0.0,
+                 "children_peak_rss_mb": 0.0},
+            )
+            if event["model"] not in level["models"]:
+                level["models"].append(event["model"])
+            level["calls"] += 1
+            level["peak_rss_mb"] = max(level["peak_rss_mb"], event["peak_rss_mb"])
+            level["children_peak_rss_mb"] = max(level["children_peak_rss_mb"], event["children_peak_rss_mb"])
+            if event["cache_hit"]:
+                level["cache_hits"] += 1
+                continue
+            level["wall"] += event["wall"]
+            level["cpu"] += event["cpu"]
+            level["children_cpu"] += event["children_cpu"]
+
+        for level in levels.values():
+            n_computed = level["calls"] - level["cache_hits"]
+            level["mean_wall"] = level["wall"] / n_computed if n_computed else 0.0
+
+        if "low" in levels and "high" in levels and levels["low"]["mean_wall"] > 0.0:
+            levels["high"]["cost_ratio"] = levels["high"]["mean_wall"] / levels["low"]["mean_wall"]
+
+        return levels
+
+    def print_summary(self):
+        for fidelity, level in self.summary().items():
+            print(
+                f"{fidelity} fidelity ({', '.join(level['models'])}): {level['calls']} calls, "
+                f"{level['cache_hits']} cache hits, {level['wall']:.2f} s wall, {level['cpu']:.2f} s cpu, "
+                f"{level['children_cpu']:.2f} s in child processes, {level['mean_wall']:.3f} s per computed call, "
+                f"peak memory {level['peak_rss_mb']:.0f} MB, {level['children_peak_rss_mb']:.0f} MB in child processes"
+            )
+            if "cost_ratio" in level:
+                print(f"high to low fidelity cost ratio: {level['cost_ratio']:.1f}")
+
+    def write_chrome_trace(self, fname):
+        write_chrome_trace(self.events, fname)
+
+
+def env_profiler():
+    """
+    A profiler that writes to `$MF_PROFILE`, or None if it isn't set.
+    """
+    fname = os.environ.get("MF_PROFILE")
+    if not fname:
+        return None
+    return Profiler(fname)
+
+
+def finish_profiler(profiler):
+    """
+    Print the summary of a profiler from `env_profiler` and write its Chrome
+    trace next to its events, as `<name>_trace.json`. Does nothing for None.
+    """
+    if profiler is None:
+        return
+    profiler.print_summary()
+    profiler.write_chrome_trace(os.path.splitext(profiler.fname)[0] + "_trace.json")
+
+
+def load_events(fname):
+    with open(fname) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_chrome_trace(events, fname):
+    """
+    Write events as a Chrome trace, with one row per process and fidelity.
+    """
+    trace_events = []
+    for event in events:
+        trace_events.append(
+            {
+                "name": event["model"],
+                "cat": event["fidelity"],
+                "ph": "X",
+                "ts": 1e6 * event["start"],
+                "dur": 1e6 * event["wall"],
+                "pid": event["pid"],
+                "tid": event["fidelity"],
+                "args": {key: event[key] for key in ("cpu", "children_cpu", "peak_rss_mb", "peak_rss_scope", "children_peak_rss_mb", "cache_hit", "call")},
+            }
+        )
+    with open(fname, "w") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+
+
+def profile_model(model, fidelity, profiler):
+    """
+    Record every call of `model.compute` in `profiler`, tagged with
+    `fidelity`. Apply it after `cache_model` so cache hits are recognized.
+    Calls that run at the same time in threads of one process share their
+    peak memory.
+    """
+    model_name = type(model).__name__
+    compute = model.compute
+    n_calls = [0]
+
+    def profiled_compute(desvars):
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        children_start = children_cpu_time()
+        per_call = reset_peak_rss()
+
+        outputs = compute(desvars)
+
+        wall = time.perf_counter() - start
+        peak_rss = peak_rss_mb() if per_call else max_rss_mb()
+        profiler.record(
+            {
+                "model": model_name,
+                "fidelity": fidelity,
+                "call": n_calls[0],
+                "pid": os.getpid(),
+                "start": start - profiler.t_start,
+                "wall": wall,
+                "cpu": time.process_time() - cpu_start,
+                "children_cpu": children_cpu_time() - children_start,
+                "peak_rss_mb": peak_rss,
+                "peak_rss_scope": "call" if per_call else "process",
+                "children_peak_rss_mb": max_rss_mb(resource.RUSAGE_CHILDREN),
+                "cache_hit": bool(getattr(model, "last_compute_cached", False)),
+            }
+        )
+        n_calls[0] += 1
+        return outputs
+
+    model.compute = profiled_compute
+    model.profiler = profiler
+    return model
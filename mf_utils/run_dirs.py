@@ -0,0 +1,72 @@
+"""
+Per-evaluation scratch folders, so concurrent finite difference or sampling
+evaluations of file-based models don't overwrite each other's files.
+"""
+import os
+import shutil
+import tarfile
+from .eval_cache import desvars_digest
+
+
+# Outputs that are large and rarely looked at after an evaluation
+bulky_extensions = (".outb", ".out", ".bts", ".vtk", ".lin")
+
+
+def evaluation_dir(base_dir, tag, desvars, rank=0):
+    """
+    Create and return the scratch folder of one evaluation, keyed on the
+    design and the MPI rank that runs it.
+    """
+    eval_dir = os.path.join(base_dir, f"{tag}_{desvars_digest(desvars)[:16]}_rank{rank}")
+    os.makedirs(eval_dir, exist_ok=True)
+    return eval_dir
+
+
+def finish_evaluation_dir(eval_dir, cleanup=None):
+    """
+    Clean up a scratch folder after its outputs were read.
+
+    cleanup=None keeps everything, "archive" packs the bulky outputs into
+    `outputs.tar.gz` inside the folder and "delete" removes the whole folder.
+    """
+    if cleanup is None:
+        return
+
+    if cleanup == "delete":
+        shutil.rmtree(eval_dir, ignore_errors=True)
+
+    elif cleanup == "archive":
+        bulky_files = []
+        for root, dirs, files in os.walk(eval_dir):
+            for fname in files:
+                if fname.endswith(bulky_extensions):
+                    bulky_files.append(os.path.join(root, fname))
+
+        if bulky_files:
+            with tarfile.open(os.path.join(eval_dir, "outputs.tar.gz"), "w:gz") as tar:
+                for fname in bulky_files:
+                    tar.add(fname, arcname=os.path.relpath(fname, eval_dir))
+            for fname in bulky_files:
+                os.remove(fname)
+
+    else:
+        raise ValueError(f"Unknown cleanup option {cleanup}, use None, 'archive' or 'delete'.")
+
+
+def rebase_paths(options, base_dir):
+    """
+    Make the relative paths in the nested dicts and lists of `options` absolute
+    against `base_dir`, in place, e.g. before an options file is copied to an
+    evaluation folder. Only strings that name an existing file or folder in
+    `base_dir` are paths, so names like `FAST_namingOut` and paths relative to
+    other entries, like `FAST_InputFile`, are left alone.
+    """
+    items = options.items() if isinstance(options, dict) else enumerate(options)
+    for key, value in items:
+        if isinstance(value, (dict, list)):
+            rebase_paths(value, base_dir)
+        elif isinstance(value, str) and value and not os.path.isabs(value):
+            path = os.path.join(base_dir, value)
+            if os.path.exists(path):
+                options[key] = os.path.normpath(path)
+    return options
@@ -0,0 +1,22 @@
+"""
+The three studies all call their package `models`, so test modules load a
+study's modules under a name of their own, like the benchmarks do. Only
+modules that don't need WISDEM, WEIS, ROSCO or FLORIS can be loaded here.
+"""
+import os
+import sys
+import types
+import importlib
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if repo_dir not in sys.path:
+    sys.path.insert(0, repo_dir)
+
+
+def load_study_module(study_folder, module_name):
+    package_name = "test_" + study_folder
+    if package_name not in sys.modules:
+        package = types.ModuleType(package_name)
+        package.__path__ = [os.path.join(repo_dir, study_folder, "models")]
+        sys.modules[package_name] = package
+    return importlib.import_module(package_name + "." + module_name)
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from scipy.optimize import brentq
+from conftest import load_study_module
+
+bem_batch = load_study_module("01_blade_design", "bem_batch")
+
+
+def test_bracketed_root_matches_brentq():
+    # Several roots in most brackets, so any other root finder would pick different ones
+    rng = np.random.default_rng(0)
+    shift = rng.uniform(-0.5, 0.5, 500)
+    freq = rng.uniform(5.0, 30.0, 500)
+    upper = rng.uniform(0.5, 3.0, 500)
+    f = lambda x: np.sin(freq * x) + shift + 0.1 * x
+    keep = f(-1.0) * f(upper) < 0
+    shift, freq, upper = shift[keep], freq[keep], upper[keep]
+    lower = np.full(len(upper), -1.0)
+
+    roots = bem_batch.bracketed_root(f, lower, upper, f(lower), f(upper))
+    expected = [
+        brentq(lambda x: np.sin(w * x) + c + 0.1 * x, -1.0, b)
+        for w, c, b in zip(freq, shift, upper)
+    ]
+    np.testing.assert_array_equal(roots, expected)
+
+
+def synthetic_rotor(CCBlade, CCAirfoil, **kwargs):
+    # Thin airfoils with an abrupt stall, which gives multiple BEM solutions at some stations
+    r = np.linspace(2.5, 62.0, 30)
+    s = (r - r[0]) / (r[-1] - r[0])
+    aoa = np.linspace(-180, 180, 361)
+    af = [
+        CCAirfoil(aoa, [], np.where(np.abs(aoa) < 14, 0.1 * (aoa + 2), 1.2 * np.sin(2 * np.deg2rad(aoa))),
+            0.008 + 0.01 * (1 - si) + 1.2 * np.sin(np.deg2rad(aoa)) ** 2)
+        for si in s
+    ]
+    return CCBlade(r, 4.5 - 3.0 * s, 14 * (1 - s) ** 2 - 2, af, 1.5, 63.0, 3, 1.225, 1.81206e-5, hubHt=90.0, nSector=4, **kwargs)
+
+
+@pytest.mark.parametrize(
+    "options",
+    [dict(precone=2.5, tilt=5.0, shearExp=0.2), dict(shearExp=0.0, usecd=False, hubloss=False, wakerotation=False)],
+)
+def test_batch_bem_matches_ccblade(options):
+    ccblade = pytest.importorskip("wisdem.ccblade.ccblade")
+    from wisdem.ccblade import _bem
+
+    rotor = synthetic_rotor(ccblade.CCBlade, ccblade.CCAirfoil, **options)
+    Uinf, pitch = 8.0, 0.5
+    Omega = Uinf * 7.5 / rotor.Rtip * 30.0 / np.pi
+
+    azimuth = np.linspace(0.0, 2 * np.pi, rotor.nSector + 1)[:-1]
+    inflow = [
+        _bem.windcomponents(rotor.r, rotor.precurve, rotor.presweep, rotor.precone, rotor.yaw, rotor.tilt, az, Uinf, Omega,
+            rotor.hubHt, rotor.shearExp)
+        for az in azimuth
+    ]
+    args = (rotor.r, rotor.precurve, rotor.presweep, rotor.precone, rotor.Rhub, rotor.Rtip, rotor.precurveTip, rotor.presweepTip)
+    dQ_dTp = [_bem.thrusttorque(np.zeros(len(rotor.r)), Tp, *args)[3] for Tp in np.eye(len(rotor.r))]
+    bem = bem_batch.BatchBEM(rotor, Uinf, Omega, pitch, [v[0] for v in inflow], [v[1] for v in inflow], dQ_dTp)
+
+    rng = np.random.default_rng(1)
+    chord = rotor.chord[:, np.newaxis] * (1.0 + 0.2 * rng.uniform(-1.0, 1.0, (len(rotor.r), 20)))
+    twist = np.rad2deg(rotor.theta)[:, np.newaxis] + 2.0 * rng.uniform(-1.0, 1.0, (len(rotor.r), 20))
+    CP, P = bem.evaluate(chord, np.deg2rad(twist))
+
+    for i in range(chord.shape[1]):
+        rotor.chord = chord[:, i]
+        rotor.theta = np.deg2rad(twist[:, i])
+        outputs, _ = rotor.evaluate([Uinf], [Omega], [pitch], coefficients=True)
+        np.testing.assert_allclose(CP[i], outputs["CP"][0], rtol=1e-12)
+        np.testing.assert_allclose(P[i], outputs["P"][0], rtol=1e-12)
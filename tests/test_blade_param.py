@@ -0,0 +1,59 @@
+import numpy as np
+from scipy.interpolate import PchipInterpolator
+from conftest import load_study_module
+
+blade_param = load_study_module("01_blade_design", "blade_param")
+
+s_opt = np.array([0.0, 0.1, 0.3, 0.5, 0.7, 0.9, 1.0])
+s = np.linspace(0.0, 1.0, 30)
+
+
+def central_fd(f, y, step=1.0e-7):
+    jac = np.zeros((len(f(y)), len(y)))
+    for i in range(len(y)):
+        dy = np.zeros_like(y)
+        dy[i] = step
+        jac[:, i] = (f(y + dy) - f(y - dy)) / (2 * step)
+    return jac
+
+
+def test_pchip_basis_matches_scipy():
+    basis = blade_param.PchipBasis(s_opt, s)
+    rng = np.random.default_rng(0)
+    y = rng.random((len(s_opt), 5))
+
+    expected = np.column_stack([PchipInterpolator(s_opt, y[:, i])(s) for i in range(y.shape[1])])
+    np.testing.assert_allclose(basis(y), expected, rtol=1.0e-12, atol=1.0e-12)
+    np.testing.assert_allclose(basis(y[:, 0]), expected[:, 0], rtol=1.0e-12, atol=1.0e-12)
+
+
+def test_pchip_jacobian_matches_finite_differences():
+    basis = blade_param.PchipBasis(s_opt, s)
+    rng = np.random.default_rng(1)
+    for y in [np.linspace(1.0, 0.2, len(s_opt)), 0.5 + rng.random(len(s_opt))]:
+        np.testing.assert_allclose(basis.jacobian(y), central_fd(basis, y), rtol=1.0e-5, atol=1.0e-7)
+
+
+def test_twist_jacobian_matches_finite_differences():
+    # The chain used by CCBlade.compute_partials, without CCBlade
+    basis = blade_param.PchipBasis(s_opt, s)
+    twist_lower = np.full(len(s_opt), -0.1)
+    twist_upper = np.linspace(0.4, 0.05, len(s_opt))
+    gain = np.array([0.6, 0.55, 0.5, 0.45, 0.5, 0.4, 0.3])
+
+    def twist(g):
+        return np.rad2deg(basis(blade_param.twist_from_gain(g, twist_lower, twist_upper)))
+
+    twist_opt = blade_param.twist_from_gain(gain, twist_lower, twist_upper)
+    analytic = np.rad2deg(basis.jacobian(twist_opt) * (twist_upper - twist_lower))
+    np.testing.assert_allclose(analytic, central_fd(twist, gain), rtol=1.0e-5, atol=1.0e-6)
+
+
+def test_twist_from_gain_broadcasts_over_designs():
+    twist_lower = np.array([-0.1, 0.0, 0.1])
+    twist_upper = np.array([0.3, 0.2, 0.4])
+    gains = np.array([[0.0, 1.0], [0.5, 0.25], [1.0, 0.0]])
+
+    twist = blade_param.twist_from_gain(gains, twist_lower, twist_upper)
+    for i in range(gains.shape[1]):
+        np.testing.assert_allclose(twist[:, i], blade_param.twist_from_gain(gains[:, i], twist_lower, twist_upper))
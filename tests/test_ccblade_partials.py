@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from conftest import load_study_module
+
+chord_key = "blade.opt_var.chord_opt_gain"
+twist_key = "blade.opt_var.twist_opt_gain"
+
+
+def synthetic_store(ccblade_store, folder, n=30):
+    # Thin airfoils with a smooth stall on a 120 m blade, at an operating point below rated
+    s = np.linspace(0.0, 1.0, n)
+    aoa = np.linspace(-180.0, 180.0, 361)
+    cl = np.tile((1.2 * np.sin(2 * np.deg2rad(aoa)) + 0.2 * np.sin(np.deg2rad(aoa)))[np.newaxis, :, np.newaxis], (n, 1, 1))
+    cd = (0.01 + 0.02 * (1 - s))[:, np.newaxis, np.newaxis] + 1.2 * np.sin(np.deg2rad(aoa))[np.newaxis, :, np.newaxis] ** 2
+    arrays = dict(
+        r=3.0 + 117.0 * s, s=s, chord_original=5.0 - 3.5 * s, twist=15.0 * (1 - s) ** 2 - 1.0,
+        precurve=np.zeros(n), presweep=np.zeros(n),
+        airfoils_aoa=aoa, airfoils_Re=np.array([1.0e7]), airfoils_cl=cl, airfoils_cd=cd, airfoils_cm=np.zeros_like(cl),
+        s_opt_chord=np.linspace(0.0, 1.0, 6), s_opt_twist=np.linspace(0.0, 1.0, 6),
+        chord_opt_gain=np.ones(6), twist_opt_gain=np.full(6, 0.5),
+        twist_lower=np.deg2rad([10.0, 5.0, 0.0, -2.0, -4.0, -5.0]), twist_upper=np.deg2rad([20.0, 15.0, 8.0, 5.0, 3.0, 2.0]),
+    )
+    scalars = dict(
+        Rhub=3.0, Rtip=120.0, nBlades=3, rho=1.225, mu=1.81e-5, precone=-4.0, tilt=6.0, yaw=0.0, shearExp=0.12,
+        hub_height=150.0, nSector=4, precurveTip=0.0, presweepTip=0.0, tiploss=True, hubloss=True, wakerotation=True,
+        usecd=True, Uhub=8.0, tsr=9.0, pitch=0.0,
+    )
+    ccblade_store.save_ccblade_store(ccblade_store.ccblade_store_folder(n, folder), arrays, scalars)
+
+
+def test_compute_partials_match_finite_differences(tmp_path):
+    # CCBlade gives the twist derivatives per degree, the twist gains act in radians
+    pytest.importorskip("wisdem.ccblade.ccblade")
+    pytest.importorskip("weis")
+    prod_functions = load_study_module("01_blade_design", "prod_functions")
+    synthetic_store(load_study_module("01_blade_design", "ccblade_store"), str(tmp_path))
+
+    # PCHIP has a kink where neighboring control points are equal, so no gain equals an exported one of 1.0 or 0.5
+    desvars = {twist_key: np.array([0.55, 0.6, 0.45, 0.4]), chord_key: np.array([1.1, 1.25, 1.15])}
+    idx_start = {twist_key: {"values": desvars[twist_key], "idx_start": 2}, chord_key: {"values": desvars[chord_key], "idx_start": 3}}
+    model = prod_functions.CCBlade(idx_start, store_folder=str(tmp_path))
+    partials = model.compute_partials(desvars)
+
+    step = 1.0e-6
+    for key in [chord_key, twist_key]:
+        for of in ["CP", "power"]:
+            fd = np.zeros(len(desvars[key]))
+            for i in range(len(fd)):
+                designs = []
+                for sign in [1.0, -1.0]:
+                    design = dict(desvars)
+                    design[key] = desvars[key] + sign * step * (np.arange(len(fd)) == i)
+                    designs.append(design)
+                outputs = model.compute_batch(designs)[of]
+                fd[i] = (outputs[0] - outputs[1]) / (2 * step)
+            assert np.max(np.abs(fd)) > 0.0
+            np.testing.assert_allclose(partials[of][key], fd, rtol=1.0e-4, atol=1.0e-6 * np.max(np.abs(fd)))
@@ -0,0 +1,118 @@
+import os
+import types
+import pickle
+import sqlite3
+import multiprocessing
+from contextlib import closing
+import numpy as np
+import pytest
+from mf_utils import eval_cache
+from mf_utils.eval_cache import EvalCache, cache_model
+
+
+class CountingModel(object):
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.calls = 0
+
+    def compute(self, desvars):
+        self.calls += 1
+        return dict(self.outputs)
+
+
+def test_non_finite_outputs_are_not_cached(tmp_path):
+    cache = EvalCache(str(tmp_path / "cache.sqlite"))
+    desvars = {"x": np.array([1.0])}
+
+    model = cache_model(CountingModel({"f": 1.0, "g": np.array([np.inf])}), cache=cache)
+    model.compute(desvars)
+    model.compute(desvars)
+    assert model.calls == 2 and not model.last_compute_cached
+
+    model = cache_model(CountingModel({"f": 1.0, "g": np.array([2.0])}), cache=cache)
+    model.compute(desvars)
+    model.compute(desvars)
+    assert model.calls == 1 and model.last_compute_cached
+
+
+def test_keys_change_with_the_input_files(tmp_path):
+    cache = EvalCache(str(tmp_path / "cache.sqlite"))
+    desvars = {"x": np.array([1.0, 2.0])}
+    options = tmp_path / "modeling_options.yaml"
+    mtimes = iter(range(1, 100))
+
+    def cached_model(text):
+        # The same size every time, a new modification time like an edit would give
+        options.write_text(text)
+        os.utime(options, ns=(0, next(mtimes) * 10 ** 9))
+        return cache_model(CountingModel({"f": 1.0}), [str(options)], extra={"n_span": 30}, cache=cache)
+
+    model = cached_model("TMax: 600")
+    model.compute(desvars)
+    assert model.calls == 1 and not model.last_compute_cached
+
+    model = cached_model("TMax: 800")
+    model.compute(desvars)
+    assert model.calls == 1 and not model.last_compute_cached
+
+    # Back to the first contents, the first result is found again
+    model = cached_model("TMax: 600")
+    model.compute(desvars)
+    assert model.calls == 0 and model.last_compute_cached
+
+    # The extra settings and the design are part of the key too
+    model = cache_model(CountingModel({"f": 1.0}), [str(options)], extra={"n_span": 40}, cache=cache)
+    model.compute(desvars)
+    assert not model.last_compute_cached
+    model.compute({"x": np.array([1.0, 2.5])})
+    assert model.calls == 2
+
+
+def test_least_recently_used_results_are_evicted(tmp_path, monkeypatch):
+    clock = iter(range(1000))
+    monkeypatch.setattr(eval_cache, "time", types.SimpleNamespace(time=lambda: float(next(clock))))
+    outputs = {"f": np.zeros(100)}
+    size = len(pickle.dumps(outputs, protocol=pickle.HIGHEST_PROTOCOL))
+    cache = EvalCache(str(tmp_path / "cache.sqlite"), max_size=3 * size)
+
+    for key in ["a", "b", "c"]:
+        cache.put(key, "Model", outputs)
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") is not None
+    cache.put("d", "Model", outputs)
+    assert [key for key in "abcd" if cache.get(key) is not None] == ["a", "c", "d"]
+
+    # A result larger than the whole cache isn't stored and doesn't evict the others
+    cache.put("e", "Model", {"f": np.zeros(1000)})
+    assert [key for key in "abcde" if cache.get(key) is not None] == ["a", "c", "d"]
+    with closing(sqlite3.connect(cache.fname)) as conn:
+        assert conn.execute("SELECT SUM(size) FROM evals").fetchone()[0] <= 3 * size
+
+
+def write_results(fname, worker, n):
+    cache = EvalCache(fname)
+    for i in range(n):
+        cache.put(f"{worker}-{i}", "Model", {"f": np.full(50, float(i))})
+        assert cache.get(f"{worker}-{i}")["f"][0] == i
+
+
+def test_concurrent_writers(tmp_path):
+    if "fork" not in multiprocessing.get_all_start_methods():
+        pytest.skip("needs forked worker processes")
+    fname = str(tmp_path / "cache.sqlite")
+    EvalCache(fname)
+
+    workers = [multiprocessing.get_context("fork").Process(target=write_results, args=(fname, w, 40)) for w in range(6)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+    assert [worker.exitcode for worker in workers] == [0] * len(workers)
+
+    cache = EvalCache(fname)
+    for w in range(len(workers)):
+        for i in range(40):
+            assert cache.get(f"{w}-{i}")["f"][-1] == i
+    with closing(sqlite3.connect(fname)) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("SELECT COUNT(*) FROM evals").fetchone()[0] == 40 * len(workers)
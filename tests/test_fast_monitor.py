@@ -0,0 +1,133 @@
+import os
+import sys
+import subprocess
+import numpy as np
+from conftest import load_study_module
+
+fast_monitor = load_study_module("02_controls_opt", "fast_monitor")
+fast_output = load_study_module("02_controls_opt", "fast_output")
+load_metrics = load_study_module("02_controls_opt", "load_metrics")
+
+# Writes <case>.out like OpenFAST, in chunks: GenSpeed ramps up from 7 rpm at 0.01 rpm/s
+fake_openfast = '''
+import sys, time
+import numpy as np
+base = sys.argv[1][:-4]
+t = np.arange(0., 600., 0.1)
+with open(base + '.out', 'w') as f:
+    f.write('Fake OpenFAST\\n\\nTime\\tGenSpeed\\tPtfmPitch\\n(s)\\t(rpm)\\t(deg)\\n')
+    for i0 in range(0, len(t), 500):
+        for ti in t[i0:i0 + 500]:
+            f.write('%.3f\\t%.5f\\t%.5f\\n' % (ti, 7. + 0.01 * ti, 2.))
+        f.flush()
+        time.sleep(0.05)
+'''
+
+# Stationary after an initial transient, with the largest GenSpeed of the run near the end
+fake_openfast_transient = '''
+import sys, time
+import numpy as np
+base = sys.argv[1][:-4]
+rng = np.random.default_rng(0)
+t = np.arange(0., 800., 0.05)
+def ar(a):
+    y = np.zeros(len(t))
+    e = rng.standard_normal(len(t))
+    for i in range(1, len(t)):
+        y[i] = a * y[i - 1] + e[i]
+    return y
+transient = np.exp(-t / 30.)
+channels = [7.5 + 0.05 * ar(0.98) - 0.5 * transient + 4. * (np.abs(t - 750.) < 0.5),
+    2. + 0.5 * ar(0.98) + 4. * transient, 5.e4 + 1.e4 * ar(0.9) + 4.e4 * transient]
+with open(base + '.out', 'w') as f:
+    f.write('Fake OpenFAST\\n\\nTime\\tGenSpeed\\tPtfmPitch\\tTwrBsMyt\\n(s)\\t(rpm)\\t(deg)\\t(kN-m)\\n')
+    for i0 in range(0, len(t), 400):
+        for i in range(i0, min(len(t), i0 + 400)):
+            f.write('%.3f\\t%.5f\\t%.5f\\t%.3f\\n' % (t[i], channels[0][i], channels[1][i], channels[2][i]))
+        f.flush()
+        time.sleep(0.02)
+'''
+adaptive = {"tol": 0.1, "del_channels": [["TwrBsMyt", 4]], "stat_channels": ["GenSpeed", "PtfmPitch"]}
+
+
+def write_fake_openfast(tmp_path, source=fake_openfast):
+    script = tmp_path / "fake_openfast.py"
+    script.write_text(source)
+    exe = tmp_path / "openfast"
+    exe.write_text('#!/bin/sh\nexec {} {} "$@"\n'.format(sys.executable, script))
+    os.chmod(exe, 0o755)
+    fst = tmp_path / "case.fst"
+    fst.write_text("")
+    return str(exe), str(fst)
+
+
+def test_launcher_stops_runs_out_of_bounds(tmp_path):
+    exe, fst = write_fake_openfast(tmp_path)
+    launcher = fast_monitor.write_launcher(str(tmp_path / "run"), exe, {"GenSpeed": 9.}, margin=0.1, poll_interval=0.02)
+    assert subprocess.run([launcher, fst]).returncode == 0
+
+    stop = fast_monitor.read_stopped(fst)["stop"]
+    assert stop["reason"] == "limit" and stop["channel"] == "GenSpeed"
+    assert 290. <= stop["time"] < 300.
+
+    # The reader of monitored runs returns the time series up to the stop
+    out = fast_output.OutbReader(["GenSpeed"], monitored=True)(fst[:-4] + ".outb")
+    assert out["stopped_early"]
+    assert out["Time"][-1] < 599.
+    assert np.max(out["GenSpeed"]) > 9.9
+
+
+def test_launcher_keeps_runs_within_bounds(tmp_path):
+    exe, fst = write_fake_openfast(tmp_path)
+    launcher = fast_monitor.write_launcher(str(tmp_path / "run"), exe, {"GenSpeed": 20.}, margin=0.1, poll_interval=0.02)
+    assert subprocess.run([launcher, fst]).returncode == 0
+
+    assert fast_monitor.read_stopped(fst) is None
+    rows = fast_monitor.OutTail(fst[:-4] + ".out").read()
+    assert len(rows) == 6000
+
+
+def read_out(fname):
+    # Text output of a complete run, as a dict like read_outb
+    tail = fast_monitor.OutTail(fname)
+    rows = tail.read()
+    return {chan: rows[:, i] for i, chan in enumerate(tail.channels)}
+
+
+def adaptive_metrics(fst, settings):
+    # Run fst monitored with the adaptive settings and return its output and metrics
+    launcher = fast_monitor.write_launcher(os.path.dirname(fst), os.path.join(os.path.dirname(fst), "openfast"), {}, \
+        poll_interval=0.02, adaptive=settings)
+    assert subprocess.run([launcher, fst]).returncode == 0
+
+    out = fast_output.OutbReader(["GenSpeed", "PtfmPitch", "TwrBsMyt"], fallback=read_out, monitored=True)(fst[:-4] + ".out")
+    metrics = load_metrics.LoadMetrics(1)
+    metrics.update_max(0, out["untrimmed_max"])
+    metrics.update_case(0, out)
+    return out, metrics.outputs()
+
+
+def test_adaptive_runs_stop_once_converged(tmp_path):
+    exe, fst = write_fake_openfast(tmp_path, fake_openfast_transient)
+    out, outputs = adaptive_metrics(fst, adaptive)
+
+    assert out["stop"]["reason"] == "converged" and not out["stopped_early"]
+    assert 0. < out["transient"] < out["Time"][0] + 1.
+    assert out["Time"][-1] < 700.
+    assert outputs["GenSpeed_Max"] < 9.
+
+
+def test_adaptive_runs_keep_constrained_maxima(tmp_path):
+    # With constrained maxima, the runs aren't stopped and the maxima are those of the full run
+    exe, fst = write_fake_openfast(tmp_path, fake_openfast_transient)
+    out, outputs = adaptive_metrics(fst, dict(adaptive, max_channels=["GenSpeed", "PtfmPitch"]))
+    assert fast_monitor.read_stopped(fst) is None
+    assert out["transient"] > 0.
+
+    full = read_out(fst[:-4] + ".out")
+    assert len(full["Time"]) == 16000
+    full_metrics = load_metrics.LoadMetrics(1)
+    full_metrics.update_case(0, full)
+    for key in ["GenSpeed_Max", "PtfmPitch_Max"]:
+        assert outputs[key] == full_metrics.outputs()[key]
+    assert outputs["GenSpeed_Max"] > 11.
@@ -0,0 +1,149 @@
+import types
+import numpy as np
+import control
+from conftest import load_study_module
+
+level2_solvers = load_study_module("02_controls_opt", "level2_solvers")
+
+wind_input = "IfW Extended input: horizontal wind speed (steady/uniform wind), m/s"
+
+
+class FakeLinearTurbine(object):
+    """
+    The parts of weis.control.LinearModel.LinearTurbineModel the level 2 solvers
+    use, on random stable state space models at three wind speeds. The controller
+    feeds the outputs back to the pitch input with a static gain.
+    """
+
+    def __init__(self, seed, n=6, p=4):
+        rng = np.random.default_rng(seed)
+        self.u_h = np.array([14.0, 16.0, 18.0])
+        nop = len(self.u_h)
+        self.A_ops = np.zeros((n, n, nop))
+        self.B_ops = np.zeros((n, 2, nop))
+        self.C_ops = np.zeros((p, n, nop))
+        self.D_ops = np.zeros((p, 2, nop))
+        for k in range(nop):
+            self.A_ops[:, :, k] = -np.diag(rng.uniform(0.2, 1.0, n)) + 0.1 * rng.standard_normal((n, n))
+            self.B_ops[:, :, k] = rng.standard_normal((n, 2))
+            self.C_ops[:, :, k] = rng.standard_normal((p, n))
+            # Direct feedthrough of the wind only, so the pitch feedback has no algebraic loop
+            self.D_ops[:, 0, k] = 0.1 * rng.standard_normal(p)
+        self.u_ops = np.vstack([self.u_h, [0.1, 0.15, 0.2]])
+        self.y_ops = rng.standard_normal((p, nop))
+        self.x_ops = np.zeros((n, nop))
+        self.ind_fast_inps = np.arange(2)
+        self.ind_fast_outs = np.arange(p)
+        self.DescCntrlInpt = [wind_input, "ED Extended input: collective blade-pitch command, rad"]
+        self.DescOutput = ["ED GenSpeed, (rpm)", "ED TwrBsMyt, (kN-m)", "ED PtfmPitch, (deg)", "ED RotSpeed, (rpm)"][:p]
+
+    def add_control(self, linCont):
+        A, B, C, D = self.P_op.A, self.P_op.B, self.P_op.C, self.P_op.D
+        B_pitch = B[:, [1]]
+        P_cl = control.StateSpace(A - B_pitch @ linCont.K @ C, B - B_pitch @ linCont.K @ D, C, D)
+        P_cl.OutputName = self.DescOutput
+        return P_cl
+
+    def solve(self, disturbance, Plot=False, open_loop=True, controller=None):
+        # Like LinearTurbineModel.solve in closed loop
+        tt, u_h = disturbance["Time"], disturbance["Wind"]
+        self.ops, self.P_op = self.get_plant_op(u_h, False)
+        P_cl = self.add_control(controller)
+
+        u_lin = np.zeros((len(self.DescCntrlInpt), len(tt)))
+        u_lin[self.DescCntrlInpt.index(wind_input), :] = u_h - self.ops["uh"]
+        y = self.ops["y"].reshape(-1, 1) + control.forced_response(P_cl, T=tt, U=u_lin).outputs
+
+        OutList = [out_name.split()[1][:-1] for out_name in P_cl.OutputName]
+        OutData = {chan: y[i] for i, chan in enumerate(OutList)}
+        OutData["Time"] = tt
+        return OutData, OutList, P_cl
+
+
+def controllers(p, gains=(0.05, 0.1, 0.2)):
+    return [types.SimpleNamespace(K=gain * np.ones((1, p))) for gain in gains]
+
+
+def disturbance(seed, mean_wind):
+    rng = np.random.default_rng(seed)
+    tt = np.arange(0.0, 100.0, 0.05)
+    wind = mean_wind + np.sin(0.2 * tt) + 0.3 * rng.standard_normal(len(tt))
+    return {"Time": tt, "Wind": wind}
+
+
+def closed_loop_reference(lin_model, linCont, dist):
+    # Closed loop response with control.forced_response at the operating point of the mean wind
+    tt, u_h = dist["Time"], dist["Wind"]
+    ops, P_op = level2_solvers.get_plant_op(lin_model, u_h)
+    lin_model.P_op = P_op
+    P_cl = lin_model.add_control(linCont)
+    u_lin = np.zeros((2, len(tt)))
+    u_lin[0] = u_h - ops["uh"]
+    return ops["y"].reshape(-1, 1) + control.forced_response(P_cl, T=tt, U=u_lin).outputs
+
+
+def test_closed_loop_batch_matches_forced_response():
+    for seed in range(3):
+        lin_model = FakeLinearTurbine(seed)
+        linConts = controllers(4)
+        dist = disturbance(seed, 16.0)
+
+        l2_outs = level2_solvers.solve_closed_loop_batch(lin_model, linConts, dist)
+        assert len(l2_outs) == len(linConts)
+        for linCont, l2_out in zip(linConts, l2_outs):
+            y_ref = closed_loop_reference(lin_model, linCont, dist)
+            assert sorted(l2_out) == ["GenSpeed", "PtfmPitch", "RotSpeed", "Time", "TwrBsMyt"]
+            # The disturbance moves the outputs well away from the operating point
+            assert np.std(y_ref[0]) > 1.0e-2
+            for i, chan in enumerate(["GenSpeed", "TwrBsMyt", "PtfmPitch", "RotSpeed"]):
+                np.testing.assert_allclose(l2_out[chan], y_ref[i], rtol=1.0e-9, atol=1.0e-9 * np.max(np.abs(y_ref[i])))
+
+
+def test_level2_solver_paths_agree():
+    # compute solves with LinearTurbineModel.solve, compute_batch with solve_closed_loop_batch
+    lin_model = FakeLinearTurbine(7)
+    linConts = controllers(4)
+    dist = disturbance(7, 16.0)
+
+    l2_cases = level2_solvers.solve_level2_cases(lin_model, linConts, dist)
+    l2_batch = level2_solvers.solve_closed_loop_batch(lin_model, linConts, dist)
+    for l2_case, l2_out in zip(l2_cases, l2_batch):
+        assert sorted(l2_case) == sorted(l2_out)
+        for chan in l2_case:
+            np.testing.assert_allclose(l2_out[chan], l2_case[chan], rtol=1.0e-9, atol=1.0e-9 * np.max(np.abs(l2_case[chan])))
+
+
+def test_level2_solver_paths_use_the_operating_point_table():
+    # Mean wind between the linearized wind speeds, where the table interpolates
+    lin_model = FakeLinearTurbine(3)
+    linConts = controllers(4)
+    dist = disturbance(3, 15.3)
+
+    # LinearTurbineModel's own lookup isn't used by either path
+    def model_get_plant_op(u_h, reduce_states):
+        raise AssertionError("LinearTurbineModel.get_plant_op was called")
+
+    lin_model.get_plant_op = model_get_plant_op
+    table = lin_model.op_table = level2_solvers.OperatingPointTable(lin_model)
+    lookups = []
+    interpolate = table.interpolate
+    table.interpolate = lambda wind_speeds: lookups.append(wind_speeds) or interpolate(wind_speeds)
+
+    l2_cases = level2_solvers.solve_level2_cases(lin_model, linConts, dist)
+    assert len(lookups) == len(linConts)
+    l2_batch = level2_solvers.solve_closed_loop_batch(lin_model, linConts, dist)
+    assert len(lookups) == len(linConts) + 1
+    np.testing.assert_allclose(lookups, np.mean(dist["Wind"]))
+    assert lin_model.op_table is table
+
+    # Both match the closed loop of the matrices blended between 14 and 16 m/s
+    w = (np.mean(dist["Wind"]) - 14.0) / 2.0
+    blended = FakeLinearTurbine(3)
+    for name in ["A_ops", "B_ops", "C_ops", "D_ops", "u_ops", "y_ops", "x_ops"]:
+        value = getattr(blended, name)
+        setattr(blended, name, np.repeat(((1 - w) * value[..., 0] + w * value[..., 1])[..., np.newaxis], 3, axis=-1))
+    for linCont, l2_case, l2_out in zip(linConts, l2_cases, l2_batch):
+        y_ref = closed_loop_reference(blended, linCont, dist)
+        for i, chan in enumerate(["GenSpeed", "TwrBsMyt", "PtfmPitch", "RotSpeed"]):
+            np.testing.assert_allclose(l2_case[chan], y_ref[i], rtol=1.0e-9, atol=1.0e-9 * np.max(np.abs(y_ref[i])))
+            np.testing.assert_allclose(l2_out[chan], y_ref[i], rtol=1.0e-9, atol=1.0e-9 * np.max(np.abs(y_ref[i])))
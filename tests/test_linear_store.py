@@ -0,0 +1,98 @@
+import json
+import numpy as np
+import pytest
+from conftest import load_study_module
+
+linear_store = load_study_module("02_controls_opt", "linear_store")
+
+
+class LinearModel(object):
+    # Attributes like a parsed LinearTurbineModel, with the types they come in
+    def __init__(self, seed, n=5, m=3, p=4, n_ops=3):
+        rng = np.random.default_rng(seed)
+        self.A_ops = rng.standard_normal((n, n, n_ops))
+        self.B_ops = rng.standard_normal((n, m, n_ops))
+        self.C_ops = rng.standard_normal((p, n, n_ops))
+        self.D_ops = rng.standard_normal((p, m, n_ops))
+        self.u_ops = rng.standard_normal((m, n_ops))
+        self.y_ops = rng.standard_normal((p, n_ops))
+        self.x_ops = rng.standard_normal((n, n_ops))
+        self.u_h = np.array([14.0, 16.0, 18.0])
+        self.ind_fast_inps = np.array([0, 2, 5])
+        self.ind_fast_outs = np.arange(p, dtype=np.int32)
+        self.DescCntrlInpt = ["IfW Extended input: horizontal wind speed", "ED Generator torque, Nm", "ED Blade pitch, rad"]
+        self.DescStates = ["ED 1st tower fore-aft bending mode DOF, m", "ED Variable speed generator DOF, rad"] + ["State"] * (n - 2)
+        self.DescOutput = ["ED GenSpeed, (rpm)", "ED TwrBsMyt, (kN-m)", "ED PtfmPitch, (deg)", "ED RotSpeed, (rpm)"]
+        self.StateDerivOrder = [2, 2, 1, 1, 1]
+        self.n_lin_cases = np.int64(n_ops)
+        self.omega_rpm = np.float64(7.55)
+        self.reduceStates = False
+        self.settings = {"TMax": 600.0, "NLinTimes": 12, "dofs": ["GenDOF", "TwFADOF1"]}
+
+        # Only the state of the latest solve, not stored
+        self.ops = {"uh": 16.0}
+        self.P_op = object()
+        self.op_table = object()
+
+
+def test_round_trip_is_lossless(tmp_path):
+    lin_model = LinearModel(0)
+    fname = linear_store.linear_store_file(str(tmp_path / "store"), "0123456789abcdef" * 4)
+    linear_store.save_linear_model(lin_model, fname)
+    loaded = linear_store.load_linear_model(fname, LinearModel)
+
+    assert type(loaded) is LinearModel
+    expected = {name: value for name, value in vars(lin_model).items() if name not in linear_store.transient_names}
+    assert sorted(vars(loaded)) == sorted(expected)
+    for name, value in expected.items():
+        if isinstance(value, np.ndarray):
+            assert loaded.__dict__[name].dtype == value.dtype
+            np.testing.assert_array_equal(loaded.__dict__[name], value)
+        else:
+            assert loaded.__dict__[name] == value
+
+
+def test_incomplete_or_outdated_entries_are_not_loaded(tmp_path):
+    fname = str(tmp_path / "linear_model.npz")
+    assert linear_store.load_linear_model(fname, LinearModel) is None
+
+    lin_model = LinearModel(1)
+    del lin_model.x_ops
+    with pytest.raises(ValueError):
+        linear_store.save_linear_model(lin_model, fname)
+
+    lin_model = LinearModel(1)
+    lin_model.solver = lambda x: x
+    with pytest.raises(ValueError):
+        linear_store.save_linear_model(lin_model, fname)
+
+    # An entry of another store version
+    lin_model = LinearModel(1)
+    linear_store.save_linear_model(lin_model, fname)
+    with np.load(fname) as stored:
+        arrays = {name: stored[name] for name in stored.files}
+    meta = json.loads(str(arrays["__meta__"]))
+    meta["version"] = linear_store.STORE_VERSION + 1
+    arrays["__meta__"] = np.array(json.dumps(meta))
+    np.savez_compressed(fname, **arrays)
+    assert linear_store.load_linear_model(fname, LinearModel) is None
+
+
+def test_model_tree_digest(tmp_path):
+    model_dir = tmp_path / "IEA-15-240-RWT-UMaineSemi"
+    (model_dir / "Airfoils").mkdir(parents=True)
+    (model_dir / "IEA-15-240-RWT-UMaineSemi.fst").write_text("TMax 600")
+    (model_dir / "Airfoils" / "af_00.dat").write_text("0.1 0.2")
+    digest = linear_store.model_tree_digest(str(model_dir))
+
+    (model_dir / "Airfoils" / "af_00.dat").write_text("0.1 0.3")
+    assert linear_store.model_tree_digest(str(model_dir)) != digest
+    (model_dir / "Airfoils" / "af_00.dat").write_text("0.1 0.2")
+    assert linear_store.model_tree_digest(str(model_dir)) == digest
+
+    # A renamed or added file changes it too
+    (model_dir / "Airfoils" / "af_00.dat").rename(model_dir / "Airfoils" / "af_01.dat")
+    assert linear_store.model_tree_digest(str(model_dir)) != digest
+    (model_dir / "Airfoils" / "af_01.dat").rename(model_dir / "Airfoils" / "af_00.dat")
+    (model_dir / "Airfoils" / "af_02.dat").write_text("")
+    assert linear_store.model_tree_digest(str(model_dir)) != digest
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from scipy.signal import lfilter
+from conftest import load_study_module
+
+load_metrics = load_study_module("02_controls_opt", "load_metrics")
+
+
+def linear_between(reversals, n=7):
+    # Sampled series through the reversals, with monotone samples in between
+    return np.concatenate([np.linspace(a, b, n)[:-1] for a, b in zip(reversals[:-1], reversals[1:])] + [reversals[-1:]])
+
+
+def tower_load(seed, dt=0.05, T=600.0):
+    # Turbulent tower base moment (kN-m) with a rotor harmonic and sensor noise
+    rng = np.random.default_rng(seed)
+    t = np.arange(0.0, T, dt)
+    turbulence = 20.0 * lfilter([0.02], [1.0, -0.98], rng.standard_normal(len(t)))
+    return 8e4 + 3e4 * turbulence + 5e3 * np.sin(2 * np.pi * 0.6 * t) + 1e3 * rng.standard_normal(len(t))
+
+
+def single_del(y, m=4, chunks=1):
+    metrics = load_metrics.LoadMetrics(1, del_channels=[("TwrBsMyt", m)], stat_channels=[])
+    for chunk in np.array_split(y, chunks):
+        metrics.update({"TwrBsMyt": chunk}, 0)
+    return metrics.outputs()["TwrBsMyt_DEL"]
+
+
+def test_del_of_hand_counted_cycles():
+    # 4-6 closes inside 2-8, which closes inside 0-10
+    y = linear_between([0.0, 10.0, 4.0, 6.0, 2.0, 8.0, 0.0])
+    for m in [3, 4, 10]:
+        expected = ((2.0 ** m + 6.0 ** m + 10.0 ** m) / 600.0) ** (1.0 / m)
+        for chunks in [1, 3, len(y)]:
+            np.testing.assert_allclose(single_del(y, m, chunks), expected, rtol=1e-12)
+
+    # 50 periods of a harmonic from trough to trough are 50 full cycles of twice the amplitude
+    t = np.linspace(0.0, 50.0, 2001)
+    y = 3.0 - 2.5 * np.cos(2 * np.pi * t)
+    np.testing.assert_allclose(single_del(y), (50 * 5.0 ** 4 / 600.0) ** 0.25, rtol=1e-12)
+
+
+def test_del_matches_fatpack_and_pcrunch():
+    fatpack = pytest.importorskip("fatpack")
+
+    for seed in range(3):
+        y = tower_load(seed)
+
+        # Rainflow count of the exact reversals, with the residue closed like pCrunch
+        turning = np.flatnonzero(np.diff(np.sign(np.diff(y))) != 0) + 1
+        reversals = np.concatenate((y[:1], y[turning], y[-1:]))
+        cycles, residue = fatpack.find_rainflow_cycles(reversals)
+        residue_cycles, _ = fatpack.find_rainflow_cycles(fatpack.concatenate_reversals(residue, residue))
+        ranges = np.abs(np.diff(np.concatenate((cycles, residue_cycles)), axis=1))
+        reference = (np.sum(ranges ** 4) / 600.0) ** 0.25
+        np.testing.assert_allclose(single_del(y), reference, rtol=1e-12)
+        np.testing.assert_allclose(single_del(y, chunks=17), reference, rtol=1e-12)
+
+        # pCrunch's Loads_Analysis.get_DEL counts 64 load classes in 100 range bins
+        N, S = fatpack.find_range_count(fatpack.find_rainflow_ranges(y), 100)
+        pcrunch = (np.sum(S ** 4 * N) / 600.0) ** 0.25
+        np.testing.assert_allclose(single_del(y), pcrunch, rtol=2e-3)
+
+
+def test_weighted_statistics_of_chunked_cases():
+    y = np.array([tower_load(seed, T=60.0) for seed in range(3)])
+    weights = np.array([0.2, 0.5, 0.3])
+
+    metrics = load_metrics.LoadMetrics(3, weights, del_channels=[("TwrBsMyt", 4)], stat_channels=["TwrBsMyt"])
+    metrics.update({"TwrBsMyt": y[:2, :500]}, [0, 1])
+    metrics.update({"TwrBsMyt": y[2]}, 2)
+    metrics.update({"TwrBsMyt": y[:2, 500:]}, [0, 1])
+
+    case_outputs = metrics.case_outputs()
+    np.testing.assert_allclose(case_outputs["TwrBsMyt_Std"], y.std(axis=1), rtol=1e-10)
+    np.testing.assert_array_equal(case_outputs["TwrBsMyt_Max"], y.max(axis=1))
+    np.testing.assert_allclose(case_outputs["TwrBsMyt_DEL"], [single_del(yi) for yi in y], rtol=1e-12)
+
+    outputs = metrics.outputs()
+    np.testing.assert_allclose(outputs["TwrBsMyt_Std"], np.sqrt(np.dot(weights, y.var(axis=1))), rtol=1e-10)
+    np.testing.assert_allclose(outputs["TwrBsMyt_DEL"], np.dot(weights, case_outputs["TwrBsMyt_DEL"] ** 4) ** 0.25, rtol=1e-12)
+    assert outputs["TwrBsMyt_Max"] == y.max()
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+from conftest import load_study_module
+
+model_reduction = load_study_module("02_controls_opt", "model_reduction")
+
+
+def random_stable_system(seed, n=12, m=2, p=3):
+    rng = np.random.default_rng(seed)
+    A = rng.standard_normal((n, n))
+    A -= (np.max(np.linalg.eigvals(A).real) + 0.2) * np.identity(n)
+    B = rng.standard_normal((n, m))
+    C = rng.standard_normal((p, n)) * np.array([1., 1.e3, 1.e-2])[:, None]
+    return A[:, :, None], B[:, :, None], C[:, :, None]
+
+
+def hinf_norm(A, B, C, omega):
+    # Largest singular value of C (jw I - A)^-1 B over the frequencies, a lower estimate of the H-inf norm
+    I = np.identity(A.shape[0])
+    return max(np.linalg.norm(C @ np.linalg.solve(1j * w * I - A, B), 2) for w in omega)
+
+
+def test_balanced_truncation_error_bound():
+    omega = np.concatenate(([0.], np.logspace(-3, 3, 2000)))
+    for seed in range(3):
+        A_ops, B_ops, C_ops = random_stable_system(seed)
+        y_scale, u_scale = model_reduction.io_scaling(A_ops, B_ops, C_ops)
+        A, B, C = A_ops[:, :, 0], B_ops[:, :, 0] * u_scale, C_ops[:, :, 0] * y_scale[:, None]
+
+        for order in [2, 4, 8]:
+            T, Ti, hsv, error_bound = model_reduction.balanced_basis(A_ops, B_ops, C_ops, order=order)
+            assert T.shape == (A.shape[0], order)
+
+            # Error system of the scaled full and reduced models
+            A_err = np.block([[A, np.zeros((A.shape[0], order))], [np.zeros((order, A.shape[0])), Ti @ A @ T]])
+            B_err = np.vstack([B, Ti @ B])
+            C_err = np.hstack([C, -C @ T])
+            error = hinf_norm(A_err, B_err, C_err, omega)
+
+            # sigma_{r+1} <= ||G - G_r||_inf <= 2 (sigma_{r+1} + ... + sigma_n)
+            assert error <= error_bound * hsv[0] * (1. + 1.e-6)
+            assert error >= 0.9 * hsv[order]
+
+
+def test_balanced_truncation_tolerance():
+    A_ops, B_ops, C_ops = random_stable_system(5)
+    for tol in [1.e-1, 1.e-2, 1.e-3]:
+        T, Ti, hsv, error_bound = model_reduction.balanced_basis(A_ops, B_ops, C_ops, tol=tol)
+        order = T.shape[1]
+
+        # The fewest states that meet the tolerance
+        assert error_bound <= tol
+        assert 2 * hsv[order - 1:].sum() / hsv[0] > tol
+        np.testing.assert_allclose(Ti @ T, np.identity(order), atol=1.e-8)
+
+
+class LinearModel(object):
+    # The state space parts of LinearTurbineModel that reduce_linear_model uses
+    def __init__(self, A_ops, B_ops, C_ops):
+        n, m, n_ops = B_ops.shape
+        self.A_ops, self.B_ops, self.C_ops = A_ops, B_ops, C_ops
+        self.D_ops = np.zeros((C_ops.shape[0], m, n_ops))
+        self.x_ops = np.zeros((n, n_ops))
+        self.DescStates = ['State {}'.format(i) for i in range(n)]
+        self.StateDerivOrder = [2] * n
+
+
+def with_azimuth(A_ops, B_ops, C_ops, seed):
+    # Append an azimuth state, the integral of the rotor speed, which nothing depends on
+    rng = np.random.default_rng(seed)
+    n, m, n_ops = B_ops.shape
+    A = np.zeros((n + 1, n + 1, n_ops))
+    A[:n, :n] = A_ops
+    A[n, :n] = rng.standard_normal((n, n_ops))
+    B = np.concatenate((B_ops, np.zeros((1, m, n_ops))))
+    C = np.concatenate((C_ops, rng.standard_normal((C_ops.shape[0], 1, n_ops))), axis=1)
+    return A, B, C
+
+
+def test_unstable_states_are_kept():
+    omega = np.concatenate(([0.], np.logspace(-3, 3, 2000)))
+    stable = [random_stable_system(seed) for seed in range(2)]
+    A_ops, B_ops, C_ops = with_azimuth(*[np.concatenate(mats, axis=2) for mats in zip(*stable)], seed=3)
+    lin_model = LinearModel(A_ops, B_ops, C_ops)
+    lin_model.DescStates[-1] = 'ED Variable speed generator DOF (internal DOF index = DOF_GeAz), rad'
+    lin_model.StateDerivOrder[-1] = 1
+    n = A_ops.shape[0]
+    np.testing.assert_array_equal(model_reduction.unstable_states(A_ops), [n - 1])
+
+    for order in [3, 6]:
+        reduced = model_reduction.reduce_linear_model(lin_model, order=order)
+        assert reduced.A_ops.shape == (order + 1, order + 1, 2)
+        assert reduced.reduction['states'] == order + 1
+        assert reduced.reduction['kept_states'] == [lin_model.DescStates[-1]]
+        assert reduced.DescStates == ['Balanced state {}'.format(i + 1) for i in range(order)] + [lin_model.DescStates[-1]]
+        np.testing.assert_array_equal(reduced.StateDerivOrder, [1] * (order + 1))
+        assert lin_model.DescStates[0] == 'State 0' and lin_model.A_ops is A_ops
+
+        # The azimuth is kept as it is, and its mode at zero with it
+        np.testing.assert_array_equal(reduced.A_ops[:, -1], 0.)
+        np.testing.assert_array_equal(reduced.B_ops[-1], 0.)
+
+        # The stable subsystem, with the azimuth rate as an output, meets the error bound
+        A_s, B_s = A_ops[:-1, :-1], B_ops[:-1]
+        C_s = np.concatenate((C_ops[:, :-1], A_ops[-1:, :-1]))
+        y_scale, u_scale = model_reduction.io_scaling(A_s, B_s, C_s)
+        error_bound = reduced.reduction['error_bound'] * reduced.reduction['hsv'][0]
+        for k in range(2):
+            A_r = reduced.A_ops[:-1, :-1, k]
+            B_r = reduced.B_ops[:-1, :, k]
+            C_r = np.concatenate((reduced.C_ops[:, :-1, k], reduced.A_ops[-1:, :-1, k]))
+            A_err = np.block([[A_s[:, :, k], np.zeros((n - 1, order))], [np.zeros((order, n - 1)), A_r]])
+            B_err = np.vstack([B_s[:, :, k], B_r]) * u_scale
+            C_err = np.hstack([C_s[:, :, k], -C_r]) * y_scale[:, None]
+            assert hinf_norm(A_err, B_err, C_err, omega) <= error_bound * (1. + 1.e-6)
+
+
+def test_unstable_systems_are_not_balanced():
+    A_ops, B_ops, C_ops = random_stable_system(4)
+    A_ops = A_ops + 2. * np.identity(A_ops.shape[0])[:, :, None] * np.max(np.abs(A_ops))
+
+    # Every state moves in the unstable modes, so there's nothing to reduce
+    np.testing.assert_array_equal(model_reduction.unstable_states(A_ops), np.arange(A_ops.shape[0]))
+    with pytest.raises(ValueError):
+        model_reduction.balanced_basis(A_ops, B_ops, C_ops, order=4)
+    with pytest.raises(ValueError):
+        model_reduction.reduce_linear_model(LinearModel(A_ops, B_ops, C_ops), order=4)
@@ -0,0 +1,69 @@
+import numpy as np
+from conftest import load_study_module
+
+op_table = load_study_module("02_controls_opt", "op_table")
+
+
+class LinearModel(object):
+    # Operating points of a linear turbine, with the wind speed on the last axis like LinearTurbineModel
+    def __init__(self, u_h, seed=0):
+        rng = np.random.default_rng(seed)
+        nop = len(u_h)
+        self.u_h = np.array(u_h, dtype=float)
+        self.A_ops = rng.standard_normal((4, 4, nop))
+        self.B_ops = rng.standard_normal((4, 2, nop))
+        self.C_ops = rng.standard_normal((3, 4, nop))
+        self.D_ops = rng.standard_normal((3, 2, nop))
+        self.u_ops = rng.standard_normal((2, nop))
+        self.y_ops = rng.standard_normal((3, nop))
+        self.x_ops = rng.standard_normal((4, nop))
+
+    def ops(self, name, k):
+        return getattr(self, name + "_ops")[..., k]
+
+
+def test_interpolation_at_and_between_grid_points():
+    # Unsorted wind speeds, as they can come from the linearization cases
+    lin_model = LinearModel([18.0, 14.0, 16.0])
+    table = op_table.OperatingPointTable(lin_model)
+    np.testing.assert_array_equal(table.u_h, [14.0, 16.0, 18.0])
+    names = op_table.OperatingPointTable.names
+
+    # At the grid points, the matrices of that wind speed
+    for k, ws in enumerate(lin_model.u_h):
+        op = table.interpolate(ws)
+        for name in names:
+            np.testing.assert_array_equal(op[name], lin_model.ops(name, k))
+
+    # Between them, linear in the wind speed
+    for ws, k0, k1, w in [(15.0, 1, 2, 0.5), (16.5, 2, 0, 0.25), (17.9, 2, 0, 0.95)]:
+        op = table.interpolate(ws)
+        for name in names:
+            expected = (1 - w) * lin_model.ops(name, k0) + w * lin_model.ops(name, k1)
+            np.testing.assert_allclose(op[name], expected, rtol=1e-12, atol=1e-12)
+
+    # Clipped to the linearized wind speeds outside of them
+    np.testing.assert_array_equal(table.interpolate(10.0)["A"], lin_model.ops("A", 1))
+    np.testing.assert_array_equal(table.interpolate(25.0)["A"], lin_model.ops("A", 0))
+
+
+def test_interpolation_of_arrays_and_single_operating_points():
+    lin_model = LinearModel([14.0, 16.0, 18.0])
+    table = op_table.OperatingPointTable(lin_model)
+    wind_speeds = np.array([[14.0, 15.0], [17.0, 20.0]])
+    op = table.interpolate(wind_speeds)
+    assert op["A"].shape == (2, 2, 4, 4) and op["y"].shape == (2, 2, 3)
+    for idx in np.ndindex(wind_speeds.shape):
+        np.testing.assert_allclose(op["B"][idx], table.interpolate(wind_speeds[idx])["B"], rtol=1e-14)
+
+    single = op_table.OperatingPointTable(LinearModel([16.0]))
+    np.testing.assert_array_equal(single.interpolate(12.0)["C"], single.interpolate(20.0)["C"])
+    assert single.interpolate(np.array([12.0, 20.0]))["C"].shape == (2, 3, 4)
+
+
+def test_tables_are_rebuilt_for_new_matrices():
+    lin_model = LinearModel([14.0, 16.0])
+    table = op_table.OperatingPointTable(lin_model)
+    assert table.matches(lin_model)
+    lin_model.A_ops = lin_model.A_ops.copy()
+    assert not table.matches(lin_model)
@@ -0,0 +1,34 @@
+import json
+import numpy as np
+import pytest
+from mf_utils.profiling import Profiler, profile_model, reset_peak_rss
+
+
+class AllocatingModel(object):
+    # Touches mb MB of memory on each call, then frees it
+    def __init__(self, mb):
+        self.mb = list(mb)
+
+    def compute(self, desvars):
+        work = np.ones(self.mb.pop(0) * 2 ** 17)
+        return {"f": float(work.sum())}
+
+
+def test_peak_memory_is_per_call(tmp_path):
+    if not reset_peak_rss():
+        pytest.skip("the peak resident memory can't be reset here")
+
+    profiler = Profiler(str(tmp_path / "events.jsonl"))
+    model = profile_model(AllocatingModel([400, 10, 200]), "low", profiler)
+    for x in range(3):
+        model.compute({"x": x})
+
+    events = profiler.events
+    assert [event["peak_rss_scope"] for event in events] == ["call"] * 3
+    # The first call's 400 MB don't carry over to the later, smaller calls
+    assert events[0]["peak_rss_mb"] > events[2]["peak_rss_mb"] + 150
+    assert events[2]["peak_rss_mb"] > events[1]["peak_rss_mb"] + 150
+    assert profiler.summary()["low"]["peak_rss_mb"] == events[0]["peak_rss_mb"]
+
+    with open(tmp_path / "events.jsonl") as f:
+        assert [json.loads(line) for line in f] == events
@@ -0,0 +1,47 @@
+import os
+import yaml
+from conftest import repo_dir
+from mf_utils.run_dirs import rebase_paths
+
+
+def test_rebase_paths(tmp_path):
+    (tmp_path / "airfoils").mkdir()
+    (tmp_path / "airfoils" / "FFA-W3-241.dat").write_text("")
+    (tmp_path / "wind").mkdir()
+    (tmp_path / "wind" / "seed_1.bts").write_text("")
+    (tmp_path / "turbine.yaml").write_text("")
+
+    options = {
+        "geometry": "turbine.yaml",
+        "polars": {"folder": "airfoils", "files": ["airfoils/FFA-W3-241.dat", "airfoils/missing.dat"]},
+        "DLCs": [{"wind_file": "./wind/../wind/seed_1.bts", "Seeds": [1, 2]}],
+        "exe": "/usr/bin/turbsim",
+        "FAST_namingOut": "iea_15_240_rwt",
+        "FAST_InputFile": "IEA-15-240-RWT-Monopile.fst",
+        "empty": "",
+        "flag": True,
+    }
+    rebase_paths(options, str(tmp_path))
+
+    assert options["geometry"] == str(tmp_path / "turbine.yaml")
+    assert options["polars"] == {
+        "folder": str(tmp_path / "airfoils"),
+        "files": [str(tmp_path / "airfoils" / "FFA-W3-241.dat"), "airfoils/missing.dat"],
+    }
+    assert options["DLCs"] == [{"wind_file": str(tmp_path / "wind" / "seed_1.bts"), "Seeds": [1, 2]}]
+    assert options["exe"] == "/usr/bin/turbsim"
+    assert options["FAST_namingOut"] == "iea_15_240_rwt"
+    assert options["FAST_InputFile"] == "IEA-15-240-RWT-Monopile.fst"
+    assert options["empty"] == "" and options["flag"] is True
+
+
+def test_rebase_paths_of_blade_modeling_options():
+    models_dir = os.path.join(repo_dir, "01_blade_design", "models")
+    with open(os.path.join(models_dir, "modeling_options_openfast.yaml")) as f:
+        options = yaml.safe_load(f)
+    rebase_paths(options, models_dir)
+
+    file_management = options["openfast"]["file_management"]
+    assert file_management["FAST_directory"] == os.path.join(models_dir, "IEA-15-240-RWT", "IEA-15-240-RWT-Monopile")
+    assert os.path.isfile(os.path.join(file_management["FAST_directory"], file_management["FAST_InputFile"]))
+    assert file_management["FAST_runDirectory"] == "prod_OF"
@@ -0,0 +1,68 @@
+import pickle
+import pytest
+from conftest import load_study_module
+
+
+@pytest.fixture
+def turbine_class(tmp_path):
+    pytest.importorskip("weis")
+    pytest.importorskip("ROSCO_toolbox")
+    mf_controls = load_study_module("02_controls_opt", "mf_controls")
+
+    (tmp_path / "model").mkdir()
+    (tmp_path / "model" / "IEA-15-240-RWT-UMaineSemi.fst").write_text("TMax 600")
+    (tmp_path / "tuning.yaml").write_text("omega_pc: 0.2")
+    (tmp_path / "wind.bts").write_text("")
+
+    class Turbine(mf_controls.MF_Turbine):
+        # MF_Turbine without the ROSCO tuning, linearization and case generation
+        built = 0
+
+        def __init__(self, level2_wind_speeds, level3_wind_speeds, level3_seeds):
+            Turbine.built += 1
+            self.parameter_filename = str(tmp_path / "tuning.yaml")
+            self.FAST_directory = str(tmp_path / "model")
+            self.case_list = [{("InflowWind", "FileName_BTS"): str(tmp_path / "wind.bts")}]
+            self.level2_pool = None
+            self.omega_pc = 0.2
+
+    return Turbine
+
+
+def test_snapshot_is_restored_while_its_sources_match(turbine_class, tmp_path):
+    fname = str(tmp_path / "snapshot.pkl")
+    turbine_class.from_snapshot(fname)
+    assert turbine_class.built == 1
+
+    mf_turb = turbine_class.from_snapshot(fname)
+    assert turbine_class.built == 1
+    assert mf_turb.omega_pc == 0.2 and mf_turb.level2_pool is None
+
+    # Other wind speeds need another snapshot
+    turbine_class.from_snapshot(fname, level2_wind_speeds=[12, 14])
+    assert turbine_class.built == 2
+
+
+@pytest.mark.parametrize("change", ["parameter_file", "fast_model", "code", "wind_files"])
+def test_snapshot_with_other_sources_is_rejected(turbine_class, tmp_path, change):
+    fname = str(tmp_path / "snapshot.pkl")
+    turbine_class.from_snapshot(fname)
+
+    if change == "parameter_file":
+        (tmp_path / "tuning.yaml").write_text("omega_pc: 0.3")
+    elif change == "fast_model":
+        (tmp_path / "model" / "IEA-15-240-RWT-UMaineSemi_ElastoDyn.dat").write_text("")
+    elif change == "wind_files":
+        (tmp_path / "wind.bts").unlink()
+    else:
+        # A snapshot written by other code of the models package
+        with open(fname, "rb") as f:
+            snapshot = pickle.load(f)
+        snapshot["sources"]["code"]["mf_controls.py"] = "0" * 64
+        with open(fname, "wb") as f:
+            pickle.dump(snapshot, f)
+
+    turbine_class.from_snapshot(fname)
+    assert turbine_class.built == 2
+    turbine_class.from_snapshot(fname)
+    assert turbine_class.built == 2